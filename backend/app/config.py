@@ -1,9 +1,10 @@
 from decouple import config
-import os
 
 # Database configuration
 
 DATABASE_URL = config("DATABASE_URL", default="sqlite:///./brocode.db")
+# Create missing tables at startup; turn off when migrations own the schema
+DB_CREATE_TABLES = config("DB_CREATE_TABLES", default=True, cast=bool)
 # JWT configuration
 SECRET_KEY = config("SECRET_KEY", default="your-secret-key-here")
 ALGORITHM = config("ALGORITHM", default="HS256")
@@ -17,9 +18,20 @@ CORS_ORIGINS = config("CORS_ORIGINS", default="http://localhost:5173,http://loca
 CHALLENGE_DURATION_MINUTES = int(config("CHALLENGE_DURATION_MINUTES", default=180))  # 3 hours
 MAX_QUESTIONS = int(config("MAX_QUESTIONS", default=30))
 
+# Execution admission control: concurrent judging overall and per team
+EXECUTE_MAX_INFLIGHT = int(config("EXECUTE_MAX_INFLIGHT", default=16))
+EXECUTE_MAX_PER_TEAM = int(config("EXECUTE_MAX_PER_TEAM", default=1))
+EXECUTE_MAX_QUEUED = int(config("EXECUTE_MAX_QUEUED", default=64))  # waiting for a slot before 429s
+EXECUTE_QUEUE_TIMEOUT_SECONDS = float(config("EXECUTE_QUEUE_TIMEOUT_SECONDS", default=20))
+# How long a finished execute is replayed for a retry with the same Idempotency-Key
+EXECUTE_IDEMPOTENCY_TTL_SECONDS = float(config("EXECUTE_IDEMPOTENCY_TTL_SECONDS", default=600))
+EXECUTE_IDEMPOTENCY_MAX_KEYS = int(config("EXECUTE_IDEMPOTENCY_MAX_KEYS", default=10000))
+
 # File upload configuration
 UPLOAD_DIR = config("UPLOAD_DIR", default="uploads")
 ALLOWED_EXTENSIONS = set(config("ALLOWED_EXTENSIONS", default=".homie").split(","))
+MAX_UPLOAD_BYTES = int(config("MAX_UPLOAD_BYTES", default=256 * 1024))  # 256 KB per .homie file
+UPLOAD_CHUNK_SIZE = int(config("UPLOAD_CHUNK_SIZE", default=64 * 1024))
 
 # Execute API (sandbox runner) configuration
 EXECUTE_API_BASE_URL = config("EXECUTE_API_BASE_URL", default="")
@@ -28,7 +40,68 @@ EXECUTE_API_TIMEOUT_SECONDS = float(config("EXECUTE_API_TIMEOUT_SECONDS", defaul
 
 # External Judge API configuration
 JUDGE_API_URL = config("JUDGE_API_URL", default="http://localhost:9000/judge")
+# Comma-separated judge nodes (e.g. several runner_service boxes); defaults to JUDGE_API_URL
+JUDGE_API_URLS = [url.strip() for url in config("JUDGE_API_URLS", default=JUDGE_API_URL).split(",") if url.strip()]
 JUDGE_API_TIMEOUT_SECONDS = float(config("JUDGE_API_TIMEOUT_SECONDS", default=30))
+# One node's share of that: a node that hangs is given up on after this, leaving time for the next
+JUDGE_NODE_TIMEOUT_SECONDS = float(config("JUDGE_NODE_TIMEOUT_SECONDS", default=JUDGE_API_TIMEOUT_SECONDS / 2))
+JUDGE_ROUTING = config("JUDGE_ROUTING", default="least_outstanding")  # least_outstanding | hash (by question)
+JUDGE_HEALTH_PATH = config("JUDGE_HEALTH_PATH", default="/health")
+JUDGE_HEALTH_INTERVAL_SECONDS = float(config("JUDGE_HEALTH_INTERVAL_SECONDS", default=5))
+JUDGE_EJECT_AFTER_FAILURES = int(config("JUDGE_EJECT_AFTER_FAILURES", default=3))
+# Circuit breaker per judge node: opens when, over the last WINDOW calls (at least MIN_CALLS),
+# ERROR_RATE of them failed or SLOW_RATE took SLOW_SECONDS or more; probes again after COOLDOWN
+JUDGE_BREAKER_WINDOW = int(config("JUDGE_BREAKER_WINDOW", default=20))
+JUDGE_BREAKER_MIN_CALLS = int(config("JUDGE_BREAKER_MIN_CALLS", default=5))
+JUDGE_BREAKER_ERROR_RATE = float(config("JUDGE_BREAKER_ERROR_RATE", default=0.5))
+JUDGE_BREAKER_SLOW_SECONDS = float(config("JUDGE_BREAKER_SLOW_SECONDS", default=10))
+JUDGE_BREAKER_SLOW_RATE = float(config("JUDGE_BREAKER_SLOW_RATE", default=0.5))
+JUDGE_BREAKER_COOLDOWN_SECONDS = float(config("JUDGE_BREAKER_COOLDOWN_SECONDS", default=15))
+# Hedged requests: duplicate a slow judge request to a second node after the recent p95 latency
+JUDGE_HEDGE_ENABLED = config("JUDGE_HEDGE_ENABLED", default=False, cast=bool)
+JUDGE_HEDGE_DELAY_SECONDS = float(config("JUDGE_HEDGE_DELAY_SECONDS", default=3))  # until there are enough samples
+
+# API worker processes (server.py; uvicorn and gunicorn read WEB_CONCURRENCY too)
+API_WORKERS = int(config("WEB_CONCURRENCY", default=1))
+# State every worker has to agree on (idempotent replays, per-team admission, test case and
+# leaderboard invalidation, judge nodes): memory:// (one process only), sqlite:///path or
+# redis://host:port/db. Defaults to memory:// with one worker and a SQLite file with more
+SHARED_STATE_URL = config(
+    "SHARED_STATE_URL", default="memory://" if API_WORKERS <= 1 else "sqlite:///./shared_state.db"
+)
+# How long a computed leaderboard is served before it's recomputed even without a change
+LEADERBOARD_CACHE_SECONDS = float(config("LEADERBOARD_CACHE_SECONDS", default=5))
+
+# Bulk team import (/api/admin/teams/bulk, provision_teams.py): processes hashing passwords
+# in parallel (0 = one per core) and the most rows one roster may have
+PASSWORD_HASH_WORKERS = int(config("PASSWORD_HASH_WORKERS", default=0))
+TEAM_ROSTER_MAX_ROWS = int(config("TEAM_ROSTER_MAX_ROWS", default=2000))
+
+# Response compression: gzip (or brotli, when the package is installed and the client takes it)
+# for responses of at least COMPRESSION_MIN_BYTES
+COMPRESSION_ENABLED = config("COMPRESSION_ENABLED", default=True, cast=bool)
+COMPRESSION_MIN_BYTES = int(config("COMPRESSION_MIN_BYTES", default=1024))
+COMPRESSION_GZIP_LEVEL = int(config("COMPRESSION_GZIP_LEVEL", default=6))
+COMPRESSION_BROTLI_QUALITY = int(config("COMPRESSION_BROTLI_QUALITY", default=4))  # cached payloads always use 11
+# Cache headers per route template: "route=Cache-Control value" pairs separated by ";". An "etag"
+# directive in the value is dropped from the header and turns on ETag / If-None-Match (304) instead
+HTTP_CACHE_POLICIES = config(
+    "HTTP_CACHE_POLICIES",
+    default="/api/questions/public/all=public, max-age=30, etag;"
+            "/api/questions/public/{question_id}=public, max-age=30, etag;"
+            "/api/leaderboard=no-cache, etag",
+)
+
+# Prometheus-style /metrics on the backend (per-route latency, SQL per request, judging)
+METRICS_ENABLED = config("METRICS_ENABLED", default=True, cast=bool)
 
-# Create upload directory if it doesn't exist
-os.makedirs(UPLOAD_DIR, exist_ok=True)
\ No newline at end of file
+# Slow-request capture: requests to PROFILE_ROUTES (route templates, comma-separated), or any
+# request with an "X-Profile: <admin token>" header, are profiled; the ones slower than
+# PROFILE_SLOW_MS get their SQL and stack samples (or cProfile stats) written to PROFILE_DIR
+PROFILE_ENABLED = config("PROFILE_ENABLED", default=True, cast=bool)
+PROFILE_ROUTES = [r for r in config("PROFILE_ROUTES", default="").split(",") if r.strip()]
+PROFILE_SLOW_MS = float(config("PROFILE_SLOW_MS", default=500))
+PROFILE_MODE = config("PROFILE_MODE", default="sample")  # sample | cprofile
+PROFILE_SAMPLE_INTERVAL_MS = float(config("PROFILE_SAMPLE_INTERVAL_MS", default=10))
+PROFILE_DIR = config("PROFILE_DIR", default="profiles")
+PROFILE_MAX_FILES = int(config("PROFILE_MAX_FILES", default=200))
\ No newline at end of file
@@ -17,4 +17,78 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+class SchemaError(RuntimeError):
+    """The database lacks tables or columns the models need."""
+
+def _add_missing_columns(inspector) -> list:
+    """
+    ALTER TABLE ... ADD COLUMN for every nullable or defaulted column a model
+    has gained since its table was created (create_all never alters an
+    existing table). Existing rows get the column's default. Idempotent;
+    returns "table.column" for each column it added.
+    """
+    from sqlalchemy import literal, text
+
+    quote = engine.dialect.identifier_preparer.quote
+    added = []
+    with engine.begin() as conn:
+        for name, table in Base.metadata.tables.items():
+            if not inspector.has_table(name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                default = column.default.arg if column.default is not None and column.default.is_scalar else None
+                if not column.nullable and default is None:
+                    continue  # can't be added to a table with rows; verify_db reports it
+                ddl = f"ALTER TABLE {quote(name)} ADD COLUMN {quote(column.name)} {column.type.compile(dialect=engine.dialect)}"
+                if default is not None:
+                    ddl += " DEFAULT " + str(literal(default).compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True}))
+                conn.execute(text(ddl))
+                added.append(f"{name}.{column.name}")
+    return added
+
+def verify_db():
+    """
+    Compare every table and column the models define with what the database
+    has (inspector queries only) and raise SchemaError naming whatever is
+    missing, so a stale schema stops startup instead of failing requests.
+    """
+    from sqlalchemy import inspect
+    from . import models  # noqa: F401  registers every table with Base.metadata
+
+    inspector = inspect(engine)
+    missing = []
+    for name, table in Base.metadata.tables.items():
+        if not inspector.has_table(name):
+            missing.append(name)
+            continue
+        existing = {column["name"] for column in inspector.get_columns(name)}
+        missing.extend(f"{name}.{column.name}" for column in table.columns if column.name not in existing)
+    if missing:
+        raise SchemaError(
+            f"Database schema is out of date, missing: {', '.join(missing)}. "
+            "Migrate it (or start once with DB_CREATE_TABLES=true for nullable/defaulted columns)."
+        )
+
+def init_db() -> list:
+    """
+    Create any tables the models define that the database doesn't have yet,
+    and add the columns existing tables are missing, then verify_db. Only
+    inspector queries when the schema is already there, which is every start
+    after the first; returns the names of the tables and "table.column"s it
+    created.
+    """
+    from sqlalchemy import inspect
+    from . import models  # noqa: F401  registers every table with Base.metadata
+
+    existing = set(inspect(engine).get_table_names())
+    missing = [table for name, table in Base.metadata.tables.items() if name not in existing]
+    if missing:
+        Base.metadata.create_all(bind=engine, tables=missing)
+    created = [table.name for table in missing] + _add_missing_columns(inspect(engine))
+    verify_db()
+    return created
@@ -1,22 +1,73 @@
+import os
+import time
+
+_import_started = time.perf_counter()
+
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from .database import engine, Base
+from fastapi.responses import PlainTextResponse
+import metrics
+from .database import engine, init_db, verify_db
+
+from .config import (
+    COMPRESSION_ENABLED,
+    CORS_ORIGINS,
+    DATABASE_URL,
+    DB_CREATE_TABLES,
+    DEBUG,
+    HTTP_CACHE_POLICIES,
+    METRICS_ENABLED,
+    PROFILE_ENABLED,
+)
+from .services import profiling_service
+from .services.http_cache import HttpCacheMiddleware
+from .services.upload_service import UploadSizeLimitMiddleware
+from .services.shared_state import shared_state
+
+STARTUP_SECONDS = metrics.Gauge("app_startup_seconds", "Time spent starting this process, by phase", ("phase",))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Everything that touches the disk or the database happens here, once per
+    process, instead of as a side effect of importing the app.
+    """
+    report = {"imports": time.perf_counter() - _import_started}
 
-from app.routers import leaderboard
-from app.routers.leaderboard import router as leaderboard_router
+    # first: several workers on one memory:// state would disagree silently (and race on the schema)
+    shared_state.claim(DATABASE_URL)
 
+    started = time.perf_counter()
+    if DB_CREATE_TABLES:
+        created = init_db()
+    else:
+        verify_db()  # someone else owns the schema; refuse to serve against a stale one
+        created = []
+    report["schema"] = time.perf_counter() - started
 
-from .config import CORS_ORIGINS, DEBUG
+    started = time.perf_counter()
+    from .services.upload_service import ensure_upload_dir
+    ensure_upload_dir()
+    report["upload_dir"] = time.perf_counter() - started
 
+    report["total"] = time.perf_counter() - _import_started
+    for phase, seconds in report.items():
+        STARTUP_SECONDS.labels(phase).set(seconds)
+    app.state.startup_report = {phase: round(seconds * 1000, 1) for phase, seconds in report.items()}
+    print("Startup: " + ", ".join(f"{phase} {ms:.0f}ms" for phase, ms in app.state.startup_report.items())
+          + f" (pid {os.getpid()}, shared state: {shared_state.describe()})")
+    if created:
+        print(f"Schema created: {', '.join(created)}")
 
-# Import all models so they register with Base.metadata
-from .models import Team, Question, ChallengeSession, Submission
+    yield
 
-# Create database tables (must be after model imports)
-Base.metadata.create_all(bind=engine)
+    from .services.judge_service import judge_service
+    await judge_service.close()
 
-app = FastAPI(title="BroCode Backend", version="1.0.0")
-app.include_router(leaderboard_router)
+
+app = FastAPI(title="BroCode Backend", version="1.0.0", lifespan=lifespan)
 
 # CORS middleware - allow ALL origins for LAN testing (IP changes)
 if DEBUG:
@@ -32,6 +83,9 @@ else:
     allow_credentials = True
     print(f"CORS: Configured with specific origins (production)")
 
+# Oversized uploads are refused on their Content-Length (inside CORS, so the 413 is readable)
+app.add_middleware(UploadSizeLimitMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
@@ -41,16 +95,31 @@ app.add_middleware(
     expose_headers=["*"],
 )
 
+# Compression and Cache-Control/ETag (inside profiling and metrics, so they time it too)
+if COMPRESSION_ENABLED or HTTP_CACHE_POLICIES.strip():
+    app.add_middleware(HttpCacheMiddleware, policies=HTTP_CACHE_POLICIES, compression=COMPRESSION_ENABLED)
+
+# Slow-request capture (inside metrics, so profiled time still shows up there)
+if PROFILE_ENABLED:
+    profiling_service.instrument_engine(engine)
+    app.add_middleware(profiling_service.ProfilingMiddleware)
+
+# Metrics: added last so it's outermost and times everything, CORS included
+if METRICS_ENABLED:
+    metrics.instrument_engine(engine)
+    app.add_middleware(metrics.MetricsMiddleware, track_queries=True)
+
 # Include routers
 try:
+    # the routing table has to exist before the first request, so these stay eager;
+    # what they pull in that only some requests need (httpx, test_runner) is imported on use
     from .routers import auth, questions, challenge, admin, admin_auth, leaderboard
     app.include_router(auth.router, prefix="/api/auth", tags=["Authentication"])
     app.include_router(questions.router, prefix="/api/questions", tags=["Questions"])
     app.include_router(challenge.router, prefix="/api/challenge", tags=["Challenge"])
     app.include_router(admin.router, prefix="/api/admin", tags=["Admin"])
     app.include_router(admin_auth.router, prefix="/api/admin/auth", tags=["Admin Auth"])
-    app.include_router(leaderboard.router, prefix="/api/leaderboard", tags=["Leaderboard"])
-    # app.include_router(leaderboard.router)
+    app.include_router(leaderboard.router)  # carries its own /api/leaderboard prefix
     print("Routers registered successfully")
 except ImportError as e:
     print(f"Warning: Could not import routers: {e}")
@@ -65,6 +134,12 @@ async def health_check():
     """Health check endpoint"""
     return {"status": "healthy", "message": "Backend is running"}
 
+if METRICS_ENABLED:
+    @app.get("/metrics", response_class=PlainTextResponse)
+    async def metrics_endpoint():
+        """Prometheus text format: route latency, SQL per request, execute admission and judging"""
+        return PlainTextResponse(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -4,5 +4,7 @@ from .challenge_session import ChallengeSession
 from .submission import Submission
 from .test_case import TestCase
 from .admin import Admin
+from .blob import Blob
+from .data_version import DataVersion
 
-__all__ = ["Team", "Question", "ChallengeSession", "Submission", "TestCase", "Admin"]
\ No newline at end of file
+__all__ = ["Team", "Question", "ChallengeSession", "Submission", "TestCase", "Admin", "Blob", "DataVersion"]
\ No newline at end of file
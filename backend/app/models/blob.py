@@ -0,0 +1,32 @@
+import zlib
+from sqlalchemy import Column, Integer, String, LargeBinary, DateTime, Boolean
+from sqlalchemy.sql import func
+from ..database import Base
+
+class Blob(Base):
+    __tablename__ = "blobs"
+
+    # Content-addressed: the primary key is the sha256 hex digest of the raw content
+    hash = Column(String(64), primary_key=True)
+    size = Column(Integer, nullable=False)  # uncompressed size in bytes
+    refcount = Column(Integer, default=0, nullable=False)
+    content = Column(LargeBinary, nullable=True)  # inline blobs (saved / judged code)
+    path = Column(String, nullable=True)  # file blobs (uploaded .homie files)
+    is_compressed = Column(Boolean, default=False, nullable=False)  # zlib, for cold inline blobs
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    last_used_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    def data(self) -> bytes:
+        """Raw (uncompressed) content of the blob."""
+        return self.decode(self.content, self.path, self.is_compressed)
+
+    @staticmethod
+    def decode(content: bytes, path: str, is_compressed: bool) -> bytes:
+        """data() for callers that selected the columns instead of loading the row."""
+        if content is None:
+            with open(path, "rb") as f:
+                return f.read()
+        return zlib.decompress(content) if is_compressed else content
+
+    def text(self) -> str:
+        return self.data().decode("utf-8")
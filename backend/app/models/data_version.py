@@ -0,0 +1,11 @@
+from sqlalchemy import Column, Integer, String
+from ..database import Base
+
+class DataVersion(Base):
+    __tablename__ = "data_versions"
+
+    # One counter per cached dataset (e.g. "test_cases"), bumped in the same
+    # transaction as the change, so a process that didn't make the change
+    # (a CLI script, another server) shows up as a version mismatch
+    name = Column(String, primary_key=True)
+    version = Column(Integer, default=0, nullable=False)
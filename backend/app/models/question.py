@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean
+from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, Float
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from ..database import Base
@@ -15,6 +15,8 @@ class Question(Base):
     reference_solution = Column(Text)  # Reference brocode solution from .homie files
     difficulty = Column(String, default="medium")  # easy, medium, hard
     points = Column(Integer, default=10)
+    compare_mode = Column(String, default="exact")  # exact, trailing, tokens (see comparator.py)
+    time_limit_seconds = Column(Float, nullable=True)  # per-case limit from calibrate.py; None = judge default
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
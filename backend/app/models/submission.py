@@ -16,7 +16,12 @@ class Submission(Base):
     id = Column(Integer, primary_key=True, index=True)
     challenge_session_id = Column(Integer, ForeignKey("challenge_sessions.id"), nullable=False)
     question_id = Column(Integer, ForeignKey("questions.id"), nullable=False)
-    code_answer = Column(Text)  # Code written in textarea
+    # Code lives in the blob store and is referenced by sha256; the inline
+    # column only holds answers saved before the blob store existed.
+    legacy_code_answer = Column("code_answer", Text)
+    code_hash = Column(String(64), ForeignKey("blobs.hash"), nullable=True)  # saved code
+    judged_hash = Column(String(64), ForeignKey("blobs.hash"), nullable=True)  # code last sent to the judge
+    file_hash = Column(String(64), ForeignKey("blobs.hash"), nullable=True)  # uploaded .homie file
     file_path = Column(String)  # Path to uploaded .homie file
     status = Column(Enum(SubmissionStatus), default=SubmissionStatus.not_attempted)
     submitted_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -30,4 +35,16 @@ class Submission(Base):
 
     # Relationships
     challenge_session = relationship("ChallengeSession")
-    question = relationship("Question")
\ No newline at end of file
+    question = relationship("Question")
+    # raise instead of a query per row: load it with selectinload(Submission.code_blob)
+    code_blob = relationship("Blob", foreign_keys=[code_hash], lazy="raise_on_sql")
+
+    @property
+    def code_answer(self):
+        """
+        Current saved code (from the blob store, or the legacy inline column).
+        Needs code_blob loaded up front; see the relationship.
+        """
+        if self.code_blob is not None:
+            return self.code_blob.text()
+        return self.legacy_code_answer
@@ -9,7 +9,11 @@ class TestCase(Base):
     id = Column(Integer, primary_key=True, index=True)
     question_id = Column(Integer, ForeignKey("questions.id"), nullable=False)
     input_data = Column(Text, default="")  # stdin input for the test case
-    expected_output = Column(Text, nullable=False)
+    expected_output = Column(Text, nullable=False, default="")
+    # Large cases: paths relative to the judge's test_data/ dir, memory-mapped
+    # at judge time instead of the inline columns above
+    input_file = Column(String, nullable=True)
+    expected_file = Column(String, nullable=True)
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
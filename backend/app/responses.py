@@ -0,0 +1,52 @@
+"""
+Fast JSON for hot, read-heavy endpoints.
+
+FastJSONResponse skips the response_model validation and jsonable_encoder
+pass that FastAPI gives a returned dict, and encodes with orjson when it's
+installed. Only hand it data the server built itself (rows it just read,
+dicts it just assembled); keep `response_model` on the route so the
+OpenAPI schema still describes the payload.
+
+Content that's already serialized (bytes) goes out as is, so cached
+payloads cost nothing to send again.
+"""
+
+import datetime
+import enum
+import json
+from typing import Any
+
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # plain json is slower but gives the same output
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is not None and value.utcoffset() == datetime.timedelta(0):
+            return value.replace(tzinfo=None).isoformat() + "Z"
+        return value.isoformat()
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, enum.Enum):
+        return value.value
+    raise TypeError(f"Object of type {value.__class__.__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """Compact JSON, with datetimes written the way Pydantic writes them (UTC as "Z")."""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=_default, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, (bytes, bytearray, memoryview)):
+            return bytes(content)
+        return dumps(content)
@@ -1,7 +1,10 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from typing import Any, Dict, List
+from fastapi import APIRouter, Depends, File, HTTPException, UploadFile, status
+from sqlalchemy.orm import Session, selectinload
+from starlette.concurrency import run_in_threadpool
+from tracing import judge_traces
 
+from ..config import DEBUG
 from ..database import get_db
 from ..models.team import Team
 from ..models.question import Question
@@ -12,7 +15,18 @@ from ..models.admin import Admin
 from ..schemas.team import TeamResponse, TeamCreate
 from ..schemas.question import QuestionCreate, QuestionUpdate, QuestionResponse, QuestionWithTestCases
 from ..schemas.test_case import TestCaseCreate, TestCaseUpdate, TestCaseResponse
+from ..schemas.challenge import SubmissionResponse
+from ..schemas.judge import JudgeNodeCreate
+from ..schemas.profiling import ProfilerSettingsUpdate
 from ..routers.admin_auth import get_current_admin
+from ..services.test_case_store import test_case_store
+from ..services.judge_service import judge_service
+from ..services.admission_service import admission_controller
+from ..services.idempotency_service import execute_deduplicator
+from ..services.shared_state import shared_state
+from ..services.question_catalog import question_catalog
+from ..services.team_provisioning import RosterError, parse_roster, team_provisioner
+from ..services.profiling_service import request_profiler
 
 router = APIRouter()
 
@@ -28,6 +42,7 @@ async def create_question(
     db_question = Question(**question.model_dump())
     db.add(db_question)
     db.commit()
+    question_catalog.invalidate()
     db.refresh(db_question)
     return db_question
 
@@ -69,6 +84,8 @@ async def update_question(
         setattr(db_question, field, value)
     
     db.commit()
+    test_case_store.invalidate(db_question.id)
+    question_catalog.invalidate()
     db.refresh(db_question)
     return db_question
 
@@ -85,6 +102,8 @@ async def delete_question(
     
     db.delete(db_question)
     db.commit()
+    test_case_store.invalidate(question_id)
+    question_catalog.invalidate()
     return None
 
 # ===== TEST CASE MANAGEMENT =====
@@ -105,6 +124,7 @@ async def create_test_case(
     db_test_case = TestCase(question_id=question_id, **test_case.model_dump())
     db.add(db_test_case)
     db.commit()
+    test_case_store.invalidate(question_id)
     db.refresh(db_test_case)
     return db_test_case
 
@@ -139,6 +159,7 @@ async def update_test_case(
         setattr(db_test_case, field, value)
     
     db.commit()
+    test_case_store.invalidate(db_test_case.question_id)
     db.refresh(db_test_case)
     return db_test_case
 
@@ -155,8 +176,30 @@ async def delete_test_case(
     
     db.delete(db_test_case)
     db.commit()
+    test_case_store.invalidate(db_test_case.question_id)
     return None
 
+@router.get("/testcases/export")
+async def export_test_cases(
+    db: Session = Depends(get_db),
+    current_admin: Admin = Depends(get_current_admin)
+):
+    """Export every active test case in the test_cases.json format."""
+    return test_case_store.export_json(db)
+
+@router.post("/testcases/import")
+async def import_test_cases(
+    test_cases: Dict[str, Any],
+    db: Session = Depends(get_db),
+    current_admin: Admin = Depends(get_current_admin)
+):
+    """Replace the test cases of the listed questions (test_cases.json format)."""
+    try:
+        return test_case_store.import_json(db, test_cases)
+    except (KeyError, TypeError, AttributeError, ValueError) as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=f"Malformed test case data: {e}")
+
 # ===== TEAM MANAGEMENT =====
 
 @router.get("/teams", response_model=List[TeamResponse])
@@ -197,8 +240,29 @@ async def create_team(
     db.add(db_team)
     db.commit()
     db.refresh(db_team)
+    shared_state.publish("leaderboard")
     return db_team
 
+@router.post("/teams/bulk")
+async def bulk_create_teams(
+    file: UploadFile = File(...),
+    dry_run: bool = False,
+    strict: bool = False,
+    db: Session = Depends(get_db),
+    current_admin: Admin = Depends(get_current_admin)
+):
+    """
+    Create every team in a CSV or JSON roster in one transaction. Rows that
+    can't be created are listed in "errors"; with strict=true any error
+    means nothing is created, and dry_run=true only validates.
+    """
+    try:
+        rows = parse_roster(await file.read(), file.filename or "")
+        # hashing blocks for seconds; keep it off the event loop
+        return await run_in_threadpool(team_provisioner.import_rows, db, rows, dry_run=dry_run, strict=strict)
+    except RosterError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @router.delete("/teams/{team_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_team(
     team_id: int,
@@ -212,6 +276,7 @@ async def delete_team(
     
     db.delete(db_team)
     db.commit()
+    shared_state.publish("leaderboard")
     return None
 
 # ===== SESSION MANAGEMENT =====
@@ -236,7 +301,7 @@ async def get_session_results(
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
 
-    submissions = db.query(Submission).filter(
+    submissions = db.query(Submission).options(selectinload(Submission.code_blob)).filter(
         Submission.challenge_session_id == session_id
     ).all()
 
@@ -247,7 +312,7 @@ async def get_session_results(
 
     return {
         "session": session,
-        "submissions": submissions,
+        "submissions": [SubmissionResponse.model_validate(s) for s in submissions],
         "statistics": {
             "saved": saved,
             "flagged": flagged,
@@ -255,6 +320,102 @@ async def get_session_results(
         }
     }
 
+# ===== JUDGE NODES =====
+
+@router.get("/judges")
+async def get_judge_nodes(
+    current_admin: Admin = Depends(get_current_admin)
+):
+    """Judge nodes with their health and outstanding requests."""
+    return await judge_service.status()
+
+@router.post("/judges", status_code=status.HTTP_201_CREATED)
+async def add_judge_node(
+    node: JudgeNodeCreate,
+    current_admin: Admin = Depends(get_current_admin)
+):
+    """Add a judge node (e.g. http://192.168.1.20:8001/run) and health-check it."""
+    judge_node = judge_service.add_node(node.url)
+    await judge_service.publish_nodes()
+    await judge_service.check_node(judge_node)
+    return judge_node.to_dict()
+
+@router.delete("/judges", status_code=status.HTTP_204_NO_CONTENT)
+async def remove_judge_node(
+    url: str,
+    current_admin: Admin = Depends(get_current_admin)
+):
+    """Stop routing to a judge node."""
+    if not judge_service.remove_node(url):
+        raise HTTPException(status_code=404, detail="Judge node not found")
+    await judge_service.publish_nodes()
+    return None
+
+@router.get("/admission")
+async def get_admission_stats(
+    current_admin: Admin = Depends(get_current_admin)
+):
+    """Executions in flight and waiting, plus duplicates that were coalesced or replayed."""
+    return {**admission_controller.stats(), "deduplication": execute_deduplicator.stats()}
+
+@router.get("/traces")
+async def get_judge_traces(
+    current_admin: Admin = Depends(get_current_admin)
+):
+    """
+    Per-question breakdown of execute latency: admission wait, judge round
+    trip, DB write and, when judging in-process (DEBUG), load / write /
+    spawn / run / compare with run split into interpreter startup and user
+    code. Runners report their own side on GET /traces.
+    """
+    startup_ms = None
+    if DEBUG:
+        from test_runner import interpreter_startup_ms
+        startup_ms = await run_in_threadpool(interpreter_startup_ms)
+    return {"interpreter_startup_ms": startup_ms, "questions": judge_traces.breakdown(startup_ms)}
+
+# ===== PROFILING =====
+
+@router.get("/profiles")
+async def list_profiles(
+    current_admin: Admin = Depends(get_current_admin)
+):
+    """Profiler settings and the slow-request captures on disk, newest first."""
+    captures = sorted(request_profiler.list_captures(), key=lambda c: c["name"], reverse=True)
+    return {"settings": request_profiler.settings(), "captures": captures}
+
+@router.put("/profiles/settings")
+async def update_profiler_settings(
+    update: ProfilerSettingsUpdate,
+    current_admin: Admin = Depends(get_current_admin)
+):
+    """Change which routes are profiled, the slow threshold or the mode, without a restart."""
+    if update.routes is not None:
+        request_profiler.set_routes(update.routes)
+    if update.slow_ms is not None:
+        request_profiler.slow_ms = update.slow_ms
+    if update.mode is not None:
+        request_profiler.mode = update.mode
+    return request_profiler.settings()
+
+@router.get("/profiles/{name}")
+async def get_profile(
+    name: str,
+    current_admin: Admin = Depends(get_current_admin)
+):
+    """One capture: timing, SQL statements, and stack samples or cProfile stats."""
+    capture = request_profiler.read_capture(name)
+    if capture is None:
+        raise HTTPException(status_code=404, detail="Capture not found")
+    return capture
+
+@router.delete("/profiles")
+async def clear_profiles(
+    current_admin: Admin = Depends(get_current_admin)
+):
+    """Delete every capture."""
+    return {"removed": request_profiler.clear()}
+
 # ===== CHALLENGE CONTROL =====
 
 @router.post("/challenge/enable")
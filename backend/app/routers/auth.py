@@ -10,6 +10,7 @@ from ..database import get_db
 from ..models.team import Team
 from ..schemas.auth import TeamLogin, Token, TokenData, TeamResponse
 from ..config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
+from ..services.shared_state import shared_state
 
 router = APIRouter()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
@@ -134,5 +135,6 @@ async def register_team(
     db.add(new_team)
     db.commit()
     db.refresh(new_team)
+    shared_state.publish("leaderboard")
 
     return {"message": "Team registered successfully", "team_id": new_team.id}
\ No newline at end of file
@@ -1,16 +1,21 @@
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from fastapi import APIRouter, Depends, Header, HTTPException, UploadFile, File
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from datetime import datetime, timedelta
+import math
 import os
-import httpx
-from test_runner import test_submission
+import time
+import metrics
+from tracing import judge_traces
 
 from ..database import get_db
+from ..responses import FastJSONResponse
 from ..models.team import Team
 from ..models.question import Question
 from ..models.challenge_session import ChallengeSession
 from ..models.submission import Submission, SubmissionStatus
+from ..models.blob import Blob
 from ..schemas.challenge import (
     ChallengeStartResponse, ChallengeStatusResponse,
     ChallengeSubmitRequest, ChallengeSubmitResponse,
@@ -20,17 +25,28 @@ from ..routers.auth import get_current_team
 from ..config import (
     CHALLENGE_DURATION_MINUTES,
     DEBUG,
-    UPLOAD_DIR,
     ALLOWED_EXTENSIONS,
     MAX_QUESTIONS,
     EXECUTE_API_BASE_URL,
     EXECUTE_API_TOKEN,
     EXECUTE_API_TIMEOUT_SECONDS,
 )
-from ..services.judge_service import judge_service
+from ..services.judge_service import judge_service, JudgeUnavailableError
+from ..services.upload_service import save_upload, UploadTooLargeError
+from ..services.revision_service import (
+    PatchError, apply_patch, get_revision, hash_code, set_submission_code
+)
+from ..services.blob_store import blob_store
+from ..services.test_case_store import test_case_store
+from ..services.shared_state import shared_state
+from ..services.admission_service import admission_controller, AdmissionRejected
+from ..services.idempotency_service import execute_deduplicator
+from ..services.attempt_service import MAX_ATTEMPTS, record_verdict, refund_attempt, reserve_attempt
 
 router = APIRouter()
 
+EXECUTE_RESULTS = metrics.Counter("execute_results_total", "Judged executes by result", ("result",))
+
 def get_active_challenge_session(team_id: int, db: Session) -> ChallengeSession:
     """Get active challenge session for a team."""
     return db.query(ChallengeSession).filter(
@@ -149,6 +165,7 @@ async def start_challenge(
 
     # Create submissions for all questions
     create_submissions_for_session(session.id, db)
+    shared_state.publish("leaderboard")  # the team's score starts over
 
     # Get questions for response
     questions = db.query(Question).filter(Question.is_active == True).limit(MAX_QUESTIONS).all()
@@ -192,14 +209,54 @@ async def get_challenge_status(
             session.ended_at = datetime.utcnow()
             db.commit()
 
-    submissions = db.query(Submission).filter(
+    # Polled by every team: select just the columns the response needs and
+    # serialize the rows directly instead of validating ORM objects
+    rows = db.query(*_STATUS_SUBMISSION_COLUMNS, Blob.content, Blob.path, Blob.is_compressed).outerjoin(
+        Blob, Blob.hash == Submission.code_hash
+    ).filter(
         Submission.challenge_session_id == session.id
-    ).all()
+    ).order_by(Submission.id).all()
 
-    return {
-        "session": session,
-        "submissions": submissions,
+    return FastJSONResponse({
+        "session": {field: getattr(session, field) for field in _STATUS_SESSION_FIELDS},
+        "submissions": [_status_submission(row) for row in rows],
         "time_remaining_seconds": session.time_remaining_seconds
+    })
+
+
+_STATUS_SESSION_FIELDS = (
+    "id", "team_id", "started_at", "ended_at", "is_active", "total_questions", "time_remaining_seconds",
+)
+_STATUS_SUBMISSION_COLUMNS = (
+    Submission.question_id, Submission.legacy_code_answer, Submission.code_hash, Submission.status,
+    Submission.attempts, Submission.is_correct, Submission.is_locked, Submission.last_result,
+    Submission.id, Submission.challenge_session_id, Submission.file_path,
+    Submission.submitted_at, Submission.last_executed_at,
+)
+
+
+def _status_submission(row) -> dict:
+    """One SubmissionResponse, from a row of _STATUS_SUBMISSION_COLUMNS plus the code blob's columns."""
+    (question_id, legacy_code_answer, code_hash, status, attempts, is_correct, is_locked, last_result,
+     submission_id, session_id, file_path, submitted_at, last_executed_at, content, path, is_compressed) = row
+    if code_hash is not None and (content is not None or path is not None):
+        code_answer = Blob.decode(content, path, is_compressed).decode("utf-8")
+    else:
+        code_answer = legacy_code_answer
+    return {
+        "question_id": question_id,
+        "code_answer": code_answer,
+        "code_hash": code_hash,
+        "status": getattr(status, "value", status),
+        "attempts": attempts,
+        "is_correct": is_correct,
+        "is_locked": is_locked,
+        "last_result": last_result,
+        "id": submission_id,
+        "challenge_session_id": session_id,
+        "file_path": file_path,
+        "submitted_at": submitted_at,
+        "last_executed_at": last_executed_at,
     }
 
 @router.put("/submission/{question_id}")
@@ -228,9 +285,33 @@ async def update_submission(
 
     # Update submission data
     update_data = submission_update.model_dump(exclude_unset=True)
+    base_hash = update_data.pop("base_hash", None)
+    patch = update_data.pop("patch", None)
+    expected_hash = update_data.pop("code_hash", None)
+
+    if patch is not None:
+        # Delta save: rebuild the full code from a known base revision
+        base = get_revision(db, base_hash) if base_hash else None
+        if base is None:
+            raise HTTPException(
+                status_code=409,
+                detail="Unknown base revision; resend the full code_answer"
+            )
+        try:
+            update_data["code_answer"] = apply_patch(base, patch)
+        except PatchError as e:
+            raise HTTPException(status_code=409, detail=f"Patch rejected: {str(e)}")
+        if expected_hash and hash_code(update_data["code_answer"]) != expected_hash:
+            raise HTTPException(
+                status_code=409,
+                detail="Patched code does not match code_hash; resend the full code_answer"
+            )
+
     for field, value in update_data.items():
         if field == "status":
             submission.status = SubmissionStatus(value)
+        elif field == "code_answer":
+            set_submission_code(db, submission, value)
         else:
             setattr(submission, field, value)
 
@@ -238,7 +319,60 @@ async def update_submission(
     db.commit()
     db.refresh(submission)
 
-    return {"message": "Submission updated successfully"}
+    return {"message": "Submission updated successfully", "code_hash": submission.code_hash}
+
+
+async def _judge(db: Session, question: Question, code_answer: str, trace: dict = None) -> bool:
+    """Judge code against a question; True if every test case passes. Fills in trace if given."""
+    try:
+        is_correct = await _run_judge(db, question, code_answer, {} if trace is None else trace)
+    except HTTPException as e:
+        EXECUTE_RESULTS.labels("unavailable" if e.status_code == 503 else "error").inc()
+        raise
+    EXECUTE_RESULTS.labels("PASS" if is_correct else "FAIL").inc()
+    return is_correct
+
+
+async def _run_judge(db: Session, question: Question, code_answer: str, trace: dict) -> bool:
+    # For LAN testing, use the test_runner directly instead of external judge service
+    if DEBUG:
+        # Use the test_runner module directly, off the event loop
+        try:
+            from test_runner import test_submission
+            started = time.perf_counter()
+            test_cases = (await test_case_store.snapshot_async(db)).questions
+            snapshot_ms = (time.perf_counter() - started) * 1000
+            result = await run_in_threadpool(
+                test_submission, question.question_id, code_answer, test_cases=test_cases
+            )
+            trace.update(result.get("trace", {}))
+            trace["load_ms"] = round(trace.get("load_ms", 0.0) + snapshot_ms, 3)
+            return result["status"] == "PASS"
+        except Exception as e:
+            print(f"Test runner error: {e}")
+            raise HTTPException(status_code=500, detail=f"Execution failed: {str(e)}")
+    else:
+        # Use external judge service for production. The node judges from our
+        # snapshot, not whatever test_cases.json it was deployed with
+        snapshot = await test_case_store.snapshot_async(db)
+        cases = snapshot.export_question(question.question_id)
+        if cases is None:
+            raise HTTPException(status_code=500, detail=f"No test cases configured for {question.question_id}")
+        try:
+            from ..services.judge_service import judge_service
+            result = await judge_service.judge_submission(
+                question.question_id, code_answer, question=cases, cases_version=snapshot.version
+            )
+            return result == 1
+        except JudgeUnavailableError as e:
+            # Nothing was judged and no attempt is used up, so the client can try again
+            raise HTTPException(
+                status_code=503,
+                detail=f"Judge service unavailable: {str(e)}",
+                headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))},
+            )
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Judge service error: {str(e)}")
 
 
 # @router.post("/execute/{question_id}", response_model=ExecuteResponse)
@@ -247,6 +381,7 @@ async def execute_submission(
     question_id: int,
     payload: ExecuteRequest,
     token: Optional[str] = Depends(oauth2_scheme_optional),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
     db: Session = Depends(get_db)
 ):
     #Verify Active Session
@@ -255,6 +390,23 @@ async def execute_submission(
     if not session:
         raise HTTPException(status_code=404, detail="No active challenge session found")
 
+    # A retry of the same request (Idempotency-Key) or the same code for the same
+    # question while it's still judging shares that run's verdict and attempt
+    code_hash = hash_code(payload.code_answer)
+    keys = [("code", session.id, question_id, code_hash)]
+    remember = None
+    if idempotency_key:
+        remember = ("key", session.id, question_id, idempotency_key)
+        keys.append(remember)
+    return await execute_deduplicator.run(
+        keys,
+        lambda: _execute(db, current_team, session, question_id, payload),
+        remember=remember,
+        fingerprint=code_hash,
+    )
+
+
+async def _execute(db: Session, current_team: Team, session: ChallengeSession, question_id: int, payload: ExecuteRequest) -> dict:
     #Get/Create Submission Record
     submission = db.query(Submission).filter(
         Submission.challenge_session_id == session.id,
@@ -264,64 +416,56 @@ async def execute_submission(
     if not submission:
         raise HTTPException(status_code=404, detail="Submission record not found")
 
-    
-    # Check max attempts
-    MAX_ATTEMPTS = 5
-    if (submission.attempts or 0) >= MAX_ATTEMPTS:
-        raise HTTPException(
-            status_code=400, 
-            detail=f"Max execution attempts ({MAX_ATTEMPTS}) reached for this question."
-        )
-
     if submission.is_locked:
-        return {
-            "question_id": question_id,
-            "result": submission.last_result,
-            "attempts": submission.attempts,
-            "is_correct": submission.is_correct,
-            "is_locked": True
-        }
+        return _execute_response(submission)
 
     # Fetch the question to get its question_id (E01, M04, H10, etc.)
     question = db.query(Question).filter(Question.id == question_id).first()
     if not question:
         raise HTTPException(status_code=404, detail="Question not found")
-    
-    # For LAN testing, use the test_runner directly instead of external judge service
-    if DEBUG:
-        # Use the test_runner module directly
-        try:
-            from test_runner import test_submission
-            result = test_submission(question.question_id, payload.code_answer)
-            is_correct = (result["status"] == "PASS")
-        except Exception as e:
-            print(f"Test runner error: {e}")
-            raise HTTPException(status_code=500, detail=f"Execution failed: {str(e)}")
-    else:
-        # Use external judge service for production
-        try:
-            from ..services.judge_service import judge_service
-            result = await judge_service.judge_submission(question.question_id, payload.code_answer)
-            is_correct = (result == 1)
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Judge service error: {str(e)}")
+
+    trace = {"question": question.question_id}
+    waiting_since = time.perf_counter()
+    try:
+        async with admission_controller.slot(current_team.id):
+            trace["admission_wait_ms"] = _ms_since(waiting_since)
+            # Claim the attempt atomically (and commit) before judging, so no
+            # transaction is held open while the code runs
+            if reserve_attempt(db, submission.id, MAX_ATTEMPTS) is None:
+                db.refresh(submission)
+                if submission.is_locked:
+                    return _execute_response(submission)
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Max execution attempts ({MAX_ATTEMPTS}) reached for this question."
+                )
+            judge_started = time.perf_counter()
+            try:
+                is_correct = await _judge(db, question, payload.code_answer, trace)
+                trace["judge_ms"] = _ms_since(judge_started)
+            except BaseException:
+                # No verdict, so the attempt doesn't count
+                refund_attempt(db, submission.id)
+                raise
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
 
     #Update Database
-    submission.code_answer = payload.code_answer
-    submission.attempts = (submission.attempts or 0) + 1
-    submission.last_result = 1 if is_correct else 0
-    submission.is_correct = is_correct
-    submission.is_locked = is_correct # Lock if fully correct
-    submission.last_executed_at = datetime.utcnow()
-    
-    if is_correct:
-        submission.status = "submitted"
+    write_started = time.perf_counter()
+    record_verdict(db, submission, payload.code_answer, is_correct)
+    trace["db_write_ms"] = _ms_since(write_started)
+    trace["total_ms"] = _ms_since(waiting_since)
+    judge_traces.record(trace)
+    return _execute_response(submission)
 
-    db.commit()
-    db.refresh(submission)
 
+def _ms_since(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 3)
+
+
+def _execute_response(submission: Submission) -> dict:
     return {
-        "question_id": question_id,
+        "question_id": submission.question_id,
         "result": submission.last_result,
         "attempts": submission.attempts,
         "is_correct": submission.is_correct,
@@ -352,28 +496,34 @@ async def upload_file(
             detail="Only .homie files are allowed"
         )
 
-    # Create unique filename
-    timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-    filename = f"{current_team.team_leader_usn}_{question_id}_{timestamp}.homie"
-    file_path = os.path.join(UPLOAD_DIR, filename)
-
-    # Save file
-    with open(file_path, "wb") as buffer:
-        content = await file.read()
-        buffer.write(content)
-
-    # Update submission with file path
+    # Look the submission up first: a file stored without one would never be refcounted or collected
     submission = db.query(Submission).filter(
         Submission.challenge_session_id == session.id,
         Submission.question_id == question_id
     ).first()
+    if not submission:
+        raise HTTPException(status_code=404, detail="Submission not found")
 
-    if submission:
-        submission.file_path = file_path
-        submission.submitted_at = datetime.utcnow()
-        db.commit()
+    # Stream to disk; stored by content hash so duplicate uploads share one file
+    try:
+        stored = await save_upload(file, extension=file_ext)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    file_path = stored["file_path"]
 
-    return {"message": "File uploaded successfully", "file_path": file_path}
+    # Update submission with file path
+    blob_store.put_file(db, stored["sha256"], stored["size"], file_path)
+    submission.file_hash = blob_store.repoint(db, submission.file_hash, stored["sha256"])
+    submission.file_path = file_path
+    submission.submitted_at = datetime.utcnow()
+    db.commit()
+
+    return {
+        "message": "File uploaded successfully",
+        "file_path": file_path,
+        "sha256": stored["sha256"],
+        "size": stored["size"],
+    }
 
 @router.post("/submit", response_model=ChallengeSubmitResponse)
 async def submit_challenge(
@@ -403,6 +553,8 @@ async def submit_challenge(
             for field, value in update_data.items():
                 if field == "status":
                     submission.status = SubmissionStatus(value)
+                elif field == "code_answer":
+                    set_submission_code(db, submission, value)
                 else:
                     setattr(submission, field, value)
             submission.submitted_at = datetime.utcnow()
@@ -1,13 +1,16 @@
-from typing import List, Optional
+from typing import List
 from fastapi import APIRouter, Depends, Request, HTTPException
+from sqlalchemy import and_, func
 from sqlalchemy.orm import Session
 
 from ..database import get_db
-from ..config import DEBUG
+from ..responses import FastJSONResponse, dumps
+from ..config import DEBUG, LEADERBOARD_CACHE_SECONDS
 from ..models.team import Team
 from ..models.challenge_session import ChallengeSession
 from ..models.submission import Submission
 from ..models.question import Question
+from ..services.shared_state import shared_state
 
 router = APIRouter(prefix="/api/leaderboard", tags=["Leaderboard"])
 
@@ -18,6 +21,9 @@ def get_leaderboard(request: Request, db: Session = Depends(get_db)):
     Simple leaderboard:
     - Uses the latest challenge session per team (highest session id).
     - Score = sum(question.points) for correct submissions in that session.
+    - Cached in shared state until the next "leaderboard" publish (a correct
+      verdict, a new session, a team added or removed) or for at most
+      LEADERBOARD_CACHE_SECONDS, so every worker serves the same board.
     """
     # In production, restrict to server machine only; in DEBUG (LAN) allow all
     if not DEBUG and request.client.host not in ("127.0.0.1", "localhost", "::1"):
@@ -26,54 +32,52 @@ def get_leaderboard(request: Request, db: Session = Depends(get_db)):
             detail="Access Denied: The leaderboard is only viewable from the server laptop.",
         )
 
-    teams = db.query(Team).filter(Team.is_active == True).all()
-    if not teams:
-        return []
+    cache_key = f"leaderboard:{shared_state.version('leaderboard')}"
+    if LEADERBOARD_CACHE_SECONDS > 0:
+        cached = shared_state.get(cache_key)
+        if cached is not None:
+            return FastJSONResponse(cached.encode("utf-8"))
 
-    leaderboard_rows = []
-
-    for team in teams:
-        latest_session: Optional[ChallengeSession] = (
-            db.query(ChallengeSession)
-            .filter(ChallengeSession.team_id == team.id)
-            .order_by(ChallengeSession.id.desc())
-            .first()
+    # One grouped query over every team instead of two per team
+    latest_session = (
+        db.query(ChallengeSession.team_id, func.max(ChallengeSession.id).label("session_id"))
+        .group_by(ChallengeSession.team_id)
+        .subquery()
+    )
+    rows = (
+        db.query(
+            Team.id,
+            Team.team_name,
+            Team.team_leader_usn,
+            latest_session.c.session_id,
+            func.coalesce(func.sum(Question.points), 0),
+            func.count(Question.id),
         )
-
-        if not latest_session:
-            leaderboard_rows.append(
-                {
-                    "team_id": team.id,
-                    "team_name": team.team_name,
-                    "team_leader_usn": team.team_leader_usn,
-                    "session_id": None,
-                    "score": 0,
-                    "solved": 0,
-                }
-            )
-            continue
-
-        correct_submissions = (
-            db.query(Submission, Question)
-            .join(Question, Question.id == Submission.question_id)
-            .filter(Submission.challenge_session_id == latest_session.id)
-            .filter(Submission.is_correct == True)
-            .all()
+        .outerjoin(latest_session, latest_session.c.team_id == Team.id)
+        .outerjoin(
+            Submission,
+            and_(
+                Submission.challenge_session_id == latest_session.c.session_id,
+                Submission.is_correct == True,
+            ),
         )
+        .outerjoin(Question, Question.id == Submission.question_id)
+        .filter(Team.is_active == True)
+        .group_by(Team.id, Team.team_name, Team.team_leader_usn, latest_session.c.session_id)
+        .all()
+    )
 
-        score = sum(q.points for _, q in correct_submissions)
-        solved = len(correct_submissions)
-
-        leaderboard_rows.append(
-            {
-                "team_id": team.id,
-                "team_name": team.team_name,
-                "team_leader_usn": team.team_leader_usn,
-                "session_id": latest_session.id,
-                "score": score,
-                "solved": solved,
-            }
-        )
+    leaderboard_rows = [
+        {
+            "team_id": team_id,
+            "team_name": team_name,
+            "team_leader_usn": team_leader_usn,
+            "session_id": session_id,
+            "score": score,
+            "solved": solved,
+        }
+        for team_id, team_name, team_leader_usn, session_id, score, solved in rows
+    ]
 
     # Sort by score desc, solved desc, then team id asc for stable ordering
     leaderboard_rows.sort(key=lambda r: (-r["score"], -r["solved"], r["team_id"]))
@@ -81,4 +85,7 @@ def get_leaderboard(request: Request, db: Session = Depends(get_db)):
     for idx, row in enumerate(leaderboard_rows, start=1):
         row["rank"] = idx
 
-    return leaderboard_rows
+    body = dumps(leaderboard_rows)
+    if LEADERBOARD_CACHE_SECONDS > 0:
+        shared_state.set(cache_key, body.decode("utf-8"), ttl=LEADERBOARD_CACHE_SECONDS)
+    return FastJSONResponse(body)
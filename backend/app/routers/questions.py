@@ -1,5 +1,5 @@
 from typing import List
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.orm import Session
 
 from ..database import get_db
@@ -8,6 +8,8 @@ from ..schemas.question import (
     QuestionCreate, QuestionUpdate, QuestionResponse, QuestionPublic
 )
 from ..routers.auth import get_current_team  # For admin authentication
+from ..services.test_case_store import test_case_store
+from ..services.question_catalog import question_catalog
 
 router = APIRouter()
 
@@ -32,6 +34,7 @@ async def create_question(
     db_question = Question(**question.model_dump())
     db.add(db_question)
     db.commit()
+    question_catalog.invalidate()
     db.refresh(db_question)
     return db_question
 
@@ -64,6 +67,8 @@ async def update_question(
         setattr(question, field, value)
 
     db.commit()
+    test_case_store.invalidate(question.id)
+    question_catalog.invalidate()
     db.refresh(question)
     return question
 
@@ -80,25 +85,25 @@ async def delete_question(
 
     db.delete(question)
     db.commit()
+    test_case_store.invalidate(question_id)
+    question_catalog.invalidate()
     return {"message": "Question deleted successfully"}
 
 # Public endpoints for challenge participants
 @router.get("/public/all", response_model=List[QuestionPublic])
-async def get_public_questions(db: Session = Depends(get_db)):
-    """Get all active questions for challenge participants."""
-    questions = db.query(Question).filter(Question.is_active == True).all()
-    return questions
+def get_public_questions(request: Request, db: Session = Depends(get_db)):
+    """Get all active questions for challenge participants (pre-serialized, see QuestionCatalog)."""
+    # plain def: the catalog's freshness check (DB + shared state) runs in the threadpool
+    return question_catalog.public_all(db).response(request)
 
 @router.get("/public/{question_id}", response_model=QuestionPublic)
-async def get_public_question(
+def get_public_question(
     question_id: int,
+    request: Request,
     db: Session = Depends(get_db)
 ):
     """Get a specific active question for challenge participants."""
-    question = db.query(Question).filter(
-        Question.id == question_id,
-        Question.is_active == True
-    ).first()
-    if not question:
+    question = question_catalog.public_question(db, question_id)
+    if question is None:
         raise HTTPException(status_code=404, detail="Question not found")
-    return question
\ No newline at end of file
+    return question.response(request)
\ No newline at end of file
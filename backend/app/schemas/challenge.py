@@ -5,6 +5,7 @@ from datetime import datetime
 class SubmissionBase(BaseModel):
     question_id: int
     code_answer: Optional[str] = None
+    code_hash: Optional[str] = None
     status: str = "not_attempted"  # not_attempted, saved, flagged, submitted
     attempts: int = 0
     is_correct: bool = False
@@ -14,9 +15,20 @@ class SubmissionBase(BaseModel):
 class SubmissionCreate(SubmissionBase):
     pass
 
+class CodeEdit(BaseModel):
+    """Replace base[start:end] with text (offsets in code points of the base revision)."""
+    start: int
+    end: int
+    text: str = ""
+
 class SubmissionUpdate(BaseModel):
     code_answer: Optional[str] = None
     status: Optional[str] = None
+    # Delta save: send `patch` against `base_hash` instead of the full code_answer.
+    # `code_hash` is the optional expected hash of the patched result.
+    base_hash: Optional[str] = None
+    patch: Optional[List[CodeEdit]] = None
+    code_hash: Optional[str] = None
 
 
 class SubmissionSubmitItem(BaseModel):
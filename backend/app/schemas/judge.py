@@ -0,0 +1,4 @@
+from pydantic import BaseModel
+
+class JudgeNodeCreate(BaseModel):
+    url: str  # full /run (or judge) URL, e.g. http://192.168.1.20:8001/run
@@ -0,0 +1,7 @@
+from typing import List, Literal, Optional
+from pydantic import BaseModel, Field
+
+class ProfilerSettingsUpdate(BaseModel):
+    routes: Optional[List[str]] = None  # route templates, e.g. /api/challenge/status
+    slow_ms: Optional[float] = Field(None, ge=0)
+    mode: Optional[Literal["sample", "cprofile"]] = None
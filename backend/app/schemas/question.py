@@ -1,7 +1,10 @@
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Literal, Optional, List
 from datetime import datetime
 
+# comparator.MODES; anything else would make every execute of the question a 500
+CompareMode = Literal["exact", "trailing", "tokens"]
+
 class QuestionBase(BaseModel):
     question_id: str  # E01, M04, H10, etc.
     title: str
@@ -10,6 +13,8 @@ class QuestionBase(BaseModel):
     sample_output: Optional[str] = None
     difficulty: str = "medium"
     points: int = 10
+    compare_mode: CompareMode = "exact"
+    time_limit_seconds: Optional[float] = None
 
 class QuestionCreate(QuestionBase):
     pass
@@ -22,6 +27,8 @@ class QuestionUpdate(BaseModel):
     sample_output: Optional[str] = None
     difficulty: Optional[str] = None
     points: Optional[int] = None
+    compare_mode: Optional[CompareMode] = None
+    time_limit_seconds: Optional[float] = None
     is_active: Optional[bool] = None
 
 class QuestionResponse(QuestionBase):
@@ -3,14 +3,20 @@ from datetime import datetime
 from typing import Optional
 
 class TestCaseBase(BaseModel):
-    expected_output: str
+    input_data: str = ""
+    expected_output: str = ""
+    input_file: Optional[str] = None  # relative to the judge's test_data/ dir
+    expected_file: Optional[str] = None
     is_active: bool = True
 
 class TestCaseCreate(TestCaseBase):
     pass
 
 class TestCaseUpdate(BaseModel):
+    input_data: Optional[str] = None
     expected_output: Optional[str] = None
+    input_file: Optional[str] = None
+    expected_file: Optional[str] = None
     is_active: Optional[bool] = None
 
 class TestCaseResponse(TestCaseBase):
@@ -0,0 +1,204 @@
+import asyncio
+import collections
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import Deque, Dict
+
+from ..config import (
+    EXECUTE_MAX_INFLIGHT,
+    EXECUTE_MAX_PER_TEAM,
+    EXECUTE_MAX_QUEUED,
+    EXECUTE_QUEUE_TIMEOUT_SECONDS,
+    JUDGE_API_TIMEOUT_SECONDS,
+)
+from .shared_state import SharedState, shared_state
+import metrics
+import logging
+
+logger = logging.getLogger(__name__)
+
+EXECUTE_REJECTED = metrics.Counter("execute_rejected_total", "Executions turned away with 429")
+
+
+class AdmissionRejected(Exception):
+    """Raised when an execution can't be admitted; retry_after is a hint in seconds."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Bounds concurrent judging: at most `max_inflight` executions overall and
+    `per_team` per team. When the global cap is reached, requests wait in a
+    per-team queue and free slots are handed out round-robin across teams,
+    so a team firing executes at every question only ever holds its own
+    share of the judge.
+
+    Runs entirely on the event loop, so no locks are needed. With several API
+    workers the per-team limit is also enforced across them through a lease
+    counter in shared state (read and written off the loop); `max_inflight`
+    and the queue stay per worker.
+    """
+
+    def __init__(
+        self,
+        max_inflight: int = EXECUTE_MAX_INFLIGHT,
+        per_team: int = EXECUTE_MAX_PER_TEAM,
+        max_queued: int = EXECUTE_MAX_QUEUED,
+        queue_timeout: float = EXECUTE_QUEUE_TIMEOUT_SECONDS,
+        shared: SharedState = shared_state,
+    ):
+        self.max_inflight = max_inflight
+        self.per_team = per_team
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self.shared = shared
+        # a worker that dies holding a lease can't give it back; it lapses after this
+        self.lease_ttl = queue_timeout + 2 * JUDGE_API_TIMEOUT_SECONDS
+        self.inflight = 0
+        self.rejected = 0
+        self._team_inflight: Dict[int, int] = collections.defaultdict(int)
+        self._waiting: Dict[int, Deque[asyncio.Future]] = {}
+        self._turns: Deque[int] = collections.deque()  # teams with waiters, in round-robin order
+        self._avg_seconds = 2.0  # EWMA of how long a slot is held, for Retry-After
+
+    @property
+    def queued(self) -> int:
+        return sum(len(waiters) for waiters in self._waiting.values())
+
+    def _retry_after(self) -> int:
+        backlog = (self.inflight + self.queued) / max(1, self.max_inflight)
+        return max(1, math.ceil(self._avg_seconds * max(1.0, backlog)))
+
+    def _reject(self, message: str):
+        self.rejected += 1
+        EXECUTE_REJECTED.inc()
+        raise AdmissionRejected(message, self._retry_after())
+
+    async def acquire(self, team_id: int):
+        waiting = len(self._waiting.get(team_id, ()))
+        if self._team_inflight[team_id] + waiting >= self.per_team:
+            self._reject(f"You already have {self.per_team} execution(s) running; wait for the result")
+
+        if self.inflight < self.max_inflight and not self._turns:
+            self._admit(team_id)
+            return
+
+        if self.queued >= self.max_queued:
+            self._reject("The judge is busy; try again shortly")
+
+        future = asyncio.get_running_loop().create_future()
+        if team_id not in self._waiting:
+            self._waiting[team_id] = collections.deque()
+            self._turns.append(team_id)
+        self._waiting[team_id].append(future)
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            if future.done() and not future.cancelled():
+                return  # admitted right as the timer went off; keep the slot
+            self._forget(team_id, future)
+            self._reject("The judge is busy; try again shortly")
+        except asyncio.CancelledError:
+            # client gone: give back the slot if we'd already been handed one
+            if future.done() and not future.cancelled():
+                self.release(team_id)
+            else:
+                self._forget(team_id, future)
+            raise
+
+    def release(self, team_id: int, held_seconds: float = None):
+        self.inflight -= 1
+        self._team_inflight[team_id] -= 1
+        if self._team_inflight[team_id] <= 0:
+            del self._team_inflight[team_id]
+        if held_seconds is not None:
+            self._avg_seconds = 0.8 * self._avg_seconds + 0.2 * held_seconds
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, team_id: int):
+        """`async with admission.slot(team.id):` around the judging itself."""
+        leased = await self._lease(team_id)
+        try:
+            await self.acquire(team_id)
+        except BaseException:
+            await self._unlease(team_id, leased)
+            raise
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(team_id, time.monotonic() - started)
+            await self._unlease(team_id, leased)
+
+    async def _lease(self, team_id: int) -> bool:
+        """Count this execution against the team in every worker; False when there's only this one."""
+        if not self.shared.distributed:
+            return False
+        key = f"admission:team:{team_id}"
+        if await self.shared.call(self.shared.incr, key, 1, ttl=self.lease_ttl) > self.per_team:
+            await self._unlease(team_id, True)
+            self._reject(f"You already have {self.per_team} execution(s) running; wait for the result")
+        return True
+
+    async def _unlease(self, team_id: int, leased: bool):
+        # floor=0: if the lease lapsed mid-run, the key restarts at 0, not -1 (which would let the team exceed per_team)
+        if leased:
+            await self.shared.call(self.shared.incr, f"admission:team:{team_id}", -1, ttl=self.lease_ttl, floor=0)
+
+    def _admit(self, team_id: int):
+        self.inflight += 1
+        self._team_inflight[team_id] += 1
+
+    def _forget(self, team_id: int, future: asyncio.Future):
+        future.cancel()
+        waiters = self._waiting.get(team_id)
+        if waiters and future in waiters:
+            waiters.remove(future)
+            if not waiters:
+                del self._waiting[team_id]
+                self._turns.remove(team_id)
+
+    def _dispatch(self):
+        """Hand free slots to waiting teams, one per team per turn."""
+        skipped = 0
+        while self._turns and self.inflight < self.max_inflight and skipped < len(self._turns):
+            team_id = self._turns[0]
+            self._turns.rotate(-1)
+            if self._team_inflight.get(team_id, 0) >= self.per_team:
+                skipped += 1
+                continue
+            skipped = 0
+            waiters = self._waiting[team_id]
+            future = waiters.popleft()
+            if not waiters:
+                del self._waiting[team_id]
+                self._turns.remove(team_id)
+            self._admit(team_id)
+            future.set_result(None)
+
+    def stats(self) -> dict:
+        return {
+            "inflight": self.inflight,
+            "max_inflight": self.max_inflight,
+            "per_team": self.per_team,
+            "queued": self.queued,
+            "max_queued": self.max_queued,
+            "teams_waiting": len(self._turns),
+            "rejected": self.rejected,
+            "avg_execution_seconds": round(self._avg_seconds, 3),
+        }
+
+# Singleton instance
+admission_controller = AdmissionController()
+
+metrics.Gauge("execute_inflight", "Executions holding an admission slot").set_function(
+    lambda: admission_controller.inflight
+)
+metrics.Gauge("execute_queue_depth", "Executions waiting for an admission slot").set_function(
+    lambda: admission_controller.queued
+)
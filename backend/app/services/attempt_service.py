@@ -0,0 +1,63 @@
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from ..models.submission import Submission
+from .revision_service import mark_judged, set_submission_code
+from .shared_state import shared_state
+
+MAX_ATTEMPTS = 5
+
+
+def reserve_attempt(db: Session, submission_id: int, max_attempts: int = MAX_ATTEMPTS) -> Optional[int]:
+    """
+    Claim one execute attempt with a single conditional UPDATE and commit.
+
+    Returns the new attempt count, or None if the submission is locked or
+    out of attempts. Two concurrent executes can never both take the last
+    attempt, and no transaction stays open while the code is judged.
+    """
+    claimed = db.query(Submission).filter(
+        Submission.id == submission_id,
+        Submission.attempts < max_attempts,
+        Submission.is_locked == False,
+    ).update({Submission.attempts: Submission.attempts + 1}, synchronize_session=False)
+    db.commit()
+    if not claimed:
+        return None
+    return db.query(Submission.attempts).filter(Submission.id == submission_id).scalar()
+
+
+def refund_attempt(db: Session, submission_id: int):
+    """Give back a reserved attempt when judging failed without a verdict."""
+    db.query(Submission).filter(
+        Submission.id == submission_id,
+        Submission.attempts > 0,
+    ).update({Submission.attempts: Submission.attempts - 1}, synchronize_session=False)
+    db.commit()
+
+
+def record_verdict(db: Session, submission: Submission, code: str, is_correct: bool) -> Submission:
+    """
+    Write a verdict in one short transaction.
+
+    A submission that another execute already locked as correct keeps that
+    verdict and its code; a late wrong answer doesn't unlock it.
+    """
+    db.refresh(submission)
+    submission.last_executed_at = datetime.utcnow()
+    newly_solved = is_correct and not submission.is_locked
+    if not submission.is_locked:
+        set_submission_code(db, submission, code)
+        mark_judged(db, submission)
+        submission.last_result = 1 if is_correct else 0
+        submission.is_correct = is_correct
+        submission.is_locked = is_correct # Lock if fully correct
+        if is_correct:
+            submission.status = "submitted"
+    db.commit()
+    if newly_solved:
+        shared_state.publish("leaderboard")
+    db.refresh(submission)
+    return submission
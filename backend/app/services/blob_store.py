@@ -0,0 +1,143 @@
+import hashlib
+import os
+import zlib
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import delete
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..models.blob import Blob
+
+
+class BlobStore:
+    """
+    Content-addressed store for uploaded files, saved code and judged code.
+
+    Blobs are keyed by the sha256 of their content and reference counted by
+    the rows that point at them (Submission.code_hash / judged_hash /
+    file_hash). Code is kept inline in the `blobs` table; uploads stay on
+    disk and the row only records their path.
+    """
+
+    @staticmethod
+    def hash_bytes(data: bytes) -> str:
+        return hashlib.sha256(data).hexdigest()
+
+    def get(self, db: Session, blob_hash: str) -> Optional[Blob]:
+        return db.query(Blob).filter(Blob.hash == blob_hash).first()
+
+    def read(self, db: Session, blob_hash: str) -> Optional[bytes]:
+        blob = self.get(db, blob_hash)
+        return blob.data() if blob else None
+
+    def _insert_if_missing(self, db: Session, **values):
+        """
+        INSERT ... ON CONFLICT DO NOTHING. Many teams saving the same starter
+        code at once all find no blob and all insert it; the losers of that
+        race just use the winner's row.
+        """
+        dialect = db.get_bind().dialect.name
+        if dialect in ("sqlite", "postgresql"):
+            insert = sqlite.insert if dialect == "sqlite" else postgresql.insert
+            db.execute(insert(Blob).values(**values).on_conflict_do_nothing(index_elements=[Blob.hash]))
+            return
+        try:
+            with db.begin_nested():
+                db.add(Blob(**values))
+        except IntegrityError:
+            pass
+
+    def _touch_or_insert(self, db: Session, blob_hash: str, **values):
+        """
+        Bump last_used_at with an UPDATE issued right now, not a pending ORM
+        change: the row is then locked (or, in SQLite, the database is) until
+        the caller's repoint commits, so collect_garbage can't delete it in
+        between. Insert the blob if there was nothing to touch.
+        """
+        touched = db.query(Blob).filter(Blob.hash == blob_hash).update(
+            {Blob.last_used_at: datetime.utcnow()}, synchronize_session=False
+        )
+        if not touched:
+            self._insert_if_missing(db, hash=blob_hash, refcount=0, **values)
+
+    def put(self, db: Session, data: bytes) -> str:
+        """Store inline content (if new) and return its hash. Does not take a reference."""
+        blob_hash = self.hash_bytes(data)
+        self._touch_or_insert(db, blob_hash, size=len(data), content=data)
+        return blob_hash
+
+    def put_file(self, db: Session, blob_hash: str, size: int, path: str) -> str:
+        """Register a file that is already on disk under its content hash."""
+        self._touch_or_insert(db, blob_hash, size=size, path=path)
+        return blob_hash
+
+    def repoint(self, db: Session, old_hash: Optional[str], new_hash: Optional[str]) -> Optional[str]:
+        """
+        Move one reference from old_hash to new_hash (either may be None).
+
+        An inline blob left with no references is deleted in the same
+        transaction, so a stream of autosaves keeps one revision per
+        submission instead of one per save. File blobs need an unlink and
+        are left to collect_garbage.
+        """
+        if old_hash == new_hash:
+            return new_hash
+        db.flush()  # make sure freshly added blobs exist before touching refcounts
+        if new_hash:
+            db.query(Blob).filter(Blob.hash == new_hash).update(
+                {Blob.refcount: Blob.refcount + 1}, synchronize_session=False
+            )
+        if old_hash:
+            db.query(Blob).filter(Blob.hash == old_hash).update(
+                {Blob.refcount: Blob.refcount - 1}, synchronize_session=False
+            )
+            db.query(Blob).filter(
+                Blob.hash == old_hash, Blob.refcount <= 0, Blob.content.isnot(None)
+            ).delete(synchronize_session=False)
+        return new_hash
+
+    def collect_garbage(self, db: Session, grace: timedelta = timedelta(minutes=10)) -> int:
+        """
+        Delete unreferenced blobs that have not been used for `grace`:
+        uploads that were replaced, and anything put() but never referenced.
+
+        The grace period covers saves that have put() a blob but not yet
+        repointed to it. The conditions
+        are checked by the DELETE itself, so a blob that a concurrent save
+        put (touched) or repointed to after we started is left alone.
+        """
+        cutoff = datetime.utcnow() - grace
+        deleted = db.execute(
+            delete(Blob)
+            .where(Blob.refcount <= 0, Blob.last_used_at < cutoff)
+            .returning(Blob.path)
+        ).all()
+        db.commit()
+        for (path,) in deleted:
+            if path and os.path.exists(path):
+                os.unlink(path)
+        return len(deleted)
+
+    def compress_cold(self, db: Session, older_than: timedelta = timedelta(hours=1)) -> int:
+        """zlib-compress inline blobs that have not been used for `older_than`."""
+        cutoff = datetime.utcnow() - older_than
+        cold = db.query(Blob).filter(
+            Blob.content.isnot(None),
+            Blob.is_compressed == False,
+            Blob.last_used_at < cutoff,
+        ).all()
+        compressed = 0
+        for blob in cold:
+            packed = zlib.compress(blob.content, 9)
+            if len(packed) < len(blob.content):
+                blob.content = packed
+                blob.is_compressed = True
+                compressed += 1
+        db.commit()
+        return compressed
+
+# Singleton instance
+blob_store = BlobStore()
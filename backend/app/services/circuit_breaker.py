@@ -0,0 +1,117 @@
+import collections
+import time
+from typing import Optional
+
+from ..config import (
+    JUDGE_BREAKER_WINDOW,
+    JUDGE_BREAKER_MIN_CALLS,
+    JUDGE_BREAKER_ERROR_RATE,
+    JUDGE_BREAKER_SLOW_SECONDS,
+    JUDGE_BREAKER_SLOW_RATE,
+    JUDGE_BREAKER_COOLDOWN_SECONDS,
+)
+import logging
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Tracks the last `window` calls to one dependency and opens when too many
+    of them failed or were slow. While open, calls are refused immediately;
+    after `cooldown` seconds a single probe call is let through, and its
+    outcome closes the breaker again or re-opens it.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        window: int = JUDGE_BREAKER_WINDOW,
+        min_calls: int = JUDGE_BREAKER_MIN_CALLS,
+        error_rate: float = JUDGE_BREAKER_ERROR_RATE,
+        slow_seconds: float = JUDGE_BREAKER_SLOW_SECONDS,
+        slow_rate: float = JUDGE_BREAKER_SLOW_RATE,
+        cooldown: float = JUDGE_BREAKER_COOLDOWN_SECONDS,
+    ):
+        self.name = name
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_seconds = slow_seconds
+        self.slow_rate = slow_rate
+        self.cooldown = cooldown
+        self.state = CLOSED
+        self.opened_at: Optional[float] = None
+        self.times_opened = 0
+        self._calls = collections.deque(maxlen=window)  # (ok, slow)
+
+    def available(self) -> bool:
+        """Would a call be let through right now? Does not change state."""
+        if self.state == CLOSED:
+            return True
+        return time.monotonic() - self.opened_at >= self.cooldown
+
+    def retry_after(self) -> float:
+        """Seconds until the next call would be let through."""
+        if self.state == CLOSED:
+            return 0.0
+        return max(0.0, self.cooldown - (time.monotonic() - self.opened_at))
+
+    def begin(self) -> bool:
+        """Claim permission for a call. An open breaker past its cooldown lets this one probe."""
+        if self.state == CLOSED:
+            return True
+        if not self.available():
+            return False
+        # Half-open: this call is the probe; the next one waits another cooldown
+        self.state = HALF_OPEN
+        self.opened_at = time.monotonic()
+        return True
+
+    def release(self):
+        """A call begin() let through was abandoned (a cancelled hedge) before it had an outcome."""
+        if self.state == HALF_OPEN:
+            # it proved nothing either way; let the next call probe straight away
+            self.state = OPEN
+            self.opened_at = time.monotonic() - self.cooldown
+
+    def record(self, ok: bool, elapsed: float = 0.0):
+        slow = elapsed >= self.slow_seconds
+        if self.state == HALF_OPEN:
+            if ok and not slow:
+                logger.info(f"Circuit for {self.name} closed after a successful probe")
+                self.state = CLOSED
+                self._calls.clear()
+            else:
+                self._open()
+            return
+
+        self._calls.append((ok, slow))
+        if self.state == CLOSED and len(self._calls) >= self.min_calls:
+            errors = sum(1 for call_ok, _ in self._calls if not call_ok) / len(self._calls)
+            slows = sum(1 for _, call_slow in self._calls if call_slow) / len(self._calls)
+            if errors >= self.error_rate or slows >= self.slow_rate:
+                logger.warning(
+                    f"Circuit for {self.name} opened: {errors:.0%} errors, {slows:.0%} slow "
+                    f"over the last {len(self._calls)} calls"
+                )
+                self._open()
+
+    def _open(self):
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self.times_opened += 1
+
+    def to_dict(self) -> dict:
+        calls = len(self._calls)
+        return {
+            "state": self.state,
+            "retry_after_seconds": round(self.retry_after(), 2),
+            "times_opened": self.times_opened,
+            "window_calls": calls,
+            "window_error_rate": round(sum(1 for ok, _ in self._calls if not ok) / calls, 3) if calls else 0.0,
+            "window_slow_rate": round(sum(1 for _, slow in self._calls if slow) / calls, 3) if calls else 0.0,
+        }
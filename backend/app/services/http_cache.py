@@ -0,0 +1,211 @@
+import gzip
+import hashlib
+from typing import Dict, Optional, Tuple
+
+from fastapi import Request
+
+from ..config import (
+    COMPRESSION_BROTLI_QUALITY,
+    COMPRESSION_GZIP_LEVEL,
+    COMPRESSION_MIN_BYTES,
+    HTTP_CACHE_POLICIES,
+)
+from ..responses import FastJSONResponse
+import metrics
+
+try:
+    import brotli
+except ImportError:
+    try:
+        import brotlicffi as brotli
+    except ImportError:  # gzip only
+        brotli = None
+
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "image/svg+xml")
+# where CachedBody.response leaves itself for the middleware
+SCOPE_KEY = "brocode.cached_body"
+# headers that describe the body, so they don't belong on a 304
+_BODY_HEADERS = {b"content-length", b"content-type", b"content-encoding"}
+
+COMPRESSED_BYTES = metrics.Counter(
+    "http_compression_bytes_total", "Response bytes before and after compression", ("encoding", "stage")
+)
+NOT_MODIFIED = metrics.Counter("http_not_modified_total", "Requests answered 304 from an ETag", ("route",))
+
+
+def parse_policies(spec: str) -> Dict[str, Tuple[str, bool]]:
+    """"/route=public, max-age=30, etag;..." -> {"/route": ("public, max-age=30", True)}"""
+    policies = {}
+    for entry in spec.split(";"):
+        route, _, value = entry.partition("=")
+        if not route.strip():
+            continue
+        directives = [d.strip() for d in value.split(",") if d.strip()]
+        etag = "etag" in (d.lower() for d in directives)
+        cache_control = ", ".join(d for d in directives if d.lower() != "etag")
+        policies[route.strip().rstrip("/") or "/"] = (cache_control, etag)
+    return policies
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """"br" or "gzip" if the client takes it (q > 0), preferring br; None for identity."""
+    accepted = set()
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        q = params.strip()
+        if q.startswith("q=") and q[2:].strip() in ("0", "0.0", "0.00", "0.000"):
+            continue
+        accepted.add(coding.strip())
+    if brotli is not None and ("br" in accepted or "*" in accepted):
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, encoding: str, best: bool = False) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=11 if best else COMPRESSION_BROTLI_QUALITY)
+    # mtime=0 so the same body always compresses to the same bytes
+    return gzip.compress(body, compresslevel=9 if best else COMPRESSION_GZIP_LEVEL, mtime=0)
+
+
+def etag_for(body: bytes) -> str:
+    # weak: the gzip and br variants of a body are the same resource
+    return f'W/"{hashlib.sha1(body).hexdigest()[:24]}"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
+
+
+class CachedBody:
+    """
+    A payload that doesn't change until it's rebuilt (the question catalog):
+    its ETag is computed once, and each compressed variant once, at the
+    best ratio, the first time a client asks for it.
+
+    The handler still returns the plain body; HttpCacheMiddleware decides,
+    by the route's policy and its compression setting like for any other
+    response, whether there's an ETag, a 304 or an encoding, and only
+    takes the precomputed values from here.
+    """
+
+    def __init__(self, body: bytes):
+        self.body = body
+        self.etag = etag_for(body)
+        self._variants: Dict[str, bytes] = {}
+
+    def variant(self, encoding: str) -> bytes:
+        compressed = self._variants.get(encoding)
+        if compressed is None:
+            compressed = self._variants[encoding] = compress(self.body, encoding, best=True)
+        return compressed
+
+    def response(self, request: Request) -> FastJSONResponse:
+        request.scope[SCOPE_KEY] = self
+        return FastJSONResponse(self.body)
+
+
+class HttpCacheMiddleware:
+    """
+    Pure ASGI. For every single-body response:
+    - routes with a policy in HTTP_CACHE_POLICIES get its Cache-Control and,
+      if it asks for one, an ETag; a GET whose If-None-Match matches gets a
+      304 with no body instead.
+    - bodies of at least COMPRESSION_MIN_BYTES of a text-like type are
+      compressed with the best encoding the client accepts, unless the
+      handler already encoded them.
+    A body the handler served from a CachedBody gets that one's ETag and
+    variants instead of hashing and compressing it again. Streamed
+    responses pass through untouched.
+    """
+
+    def __init__(self, app, policies: str = HTTP_CACHE_POLICIES, compression: bool = True):
+        self.app = app
+        self.policies = parse_policies(policies)
+        self.compression = compression
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        request_headers = dict(scope.get("headers", ()))
+        start = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start, passthrough
+            if passthrough:
+                return await send(message)
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body":
+                return await send(message)
+            if message.get("more_body", False):
+                passthrough = True
+                await send(start)
+                return await send(message)
+            for outgoing in self._finish(scope, request_headers, start, message.get("body", b"")):
+                await send(outgoing)
+
+        await self.app(scope, receive, send_wrapper)
+
+    def _finish(self, scope, request_headers: dict, start: dict, body: bytes):
+        status = start["status"]
+        headers = [(k, v) for k, v in start.get("headers", ()) if k != b"content-length"]
+        names = {k for k, _ in headers}
+        cached = scope.get(SCOPE_KEY)
+        if cached is not None and cached.body != body:
+            cached = None  # the handler answered with something else after all
+
+        policy = None
+        if status in (200, 304) and scope.get("method") == "GET":
+            policy = self.policies.get(metrics.route_template(scope).rstrip("/") or "/")
+        if policy is not None:
+            cache_control, wants_etag = policy
+            if cache_control and b"cache-control" not in names:
+                headers.append((b"cache-control", cache_control.encode("latin-1")))
+            etag = next((v.decode("latin-1") for k, v in headers if k == b"etag"), None)
+            if etag is None and wants_etag and status == 200:
+                etag = cached.etag if cached is not None else etag_for(body)
+                headers.append((b"etag", etag.encode("latin-1")))
+            if_none_match = request_headers.get(b"if-none-match", b"").decode("latin-1")
+            if status == 304 or (etag is not None and etag_matches(if_none_match, etag)):
+                NOT_MODIFIED.labels(metrics.route_template(scope)).inc()
+                status, body = 304, b""
+        if status == 304:
+            headers = [(k, v) for k, v in headers if k not in _BODY_HEADERS]
+            return [
+                {**start, "status": 304, "headers": headers},
+                {"type": "http.response.body", "body": b""},
+            ]
+
+        content_type = next((v.decode("latin-1") for k, v in headers if k == b"content-type"), "")
+        if (
+            self.compression
+            and len(body) >= COMPRESSION_MIN_BYTES
+            and b"content-encoding" not in names
+            and content_type.startswith(COMPRESSIBLE_TYPES)
+        ):
+            encoding = negotiate(request_headers.get(b"accept-encoding", b"").decode("latin-1"))
+            if encoding is not None:
+                compressed = cached.variant(encoding) if cached is not None else compress(body, encoding)
+                COMPRESSED_BYTES.labels(encoding, "in").inc(len(body))
+                COMPRESSED_BYTES.labels(encoding, "out").inc(len(compressed))
+                body = compressed
+                headers.append((b"content-encoding", encoding.encode("latin-1")))
+            if not any(k == b"vary" and b"accept-encoding" in v.lower() for k, v in headers):
+                headers.append((b"vary", b"Accept-Encoding"))
+
+        headers.append((b"content-length", str(len(body)).encode("latin-1")))
+        return [
+            {**start, "headers": headers},
+            {"type": "http.response.body", "body": body},
+        ]
@@ -0,0 +1,195 @@
+import asyncio
+import collections
+import hashlib
+import time
+from typing import Awaitable, Callable, Hashable, List, Optional
+
+from fastapi import HTTPException
+
+from ..config import (
+    EXECUTE_IDEMPOTENCY_TTL_SECONDS,
+    EXECUTE_IDEMPOTENCY_MAX_KEYS,
+    EXECUTE_QUEUE_TIMEOUT_SECONDS,
+    JUDGE_API_TIMEOUT_SECONDS,
+)
+from .shared_state import SharedState, shared_state
+
+SHARED_POLL_SECONDS = 0.2
+
+
+class RequestDeduplicator:
+    """
+    Collapses duplicate requests onto one execution.
+
+    Every call names one or more keys. While a call is running, any other
+    call sharing a key waits for it and gets the same result (or error)
+    instead of doing the work again. Results of calls that carried a
+    `remember` key are also kept for `ttl` seconds, so a retry with the same
+    Idempotency-Key after the first call finished gets the stored answer.
+    Failures are never remembered: retrying a 503 should actually retry.
+    A `fingerprint` of the payload is kept with the `remember` key; reusing
+    the key for a different payload is a 422, not a replay.
+
+    Runs on the event loop only, so no locks are needed. With several API
+    workers, `remember` keys also go through shared state (off the loop,
+    via shared.call): the worker that
+    runs the call holds a lock there and publishes the result, so a retry
+    landing on another worker waits for it or replays it. Coalescing on the
+    other keys stays per worker.
+    """
+
+    def __init__(
+        self,
+        ttl: float = EXECUTE_IDEMPOTENCY_TTL_SECONDS,
+        max_keys: int = EXECUTE_IDEMPOTENCY_MAX_KEYS,
+        shared: SharedState = shared_state,
+    ):
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self.shared = shared
+        self.lock_ttl = EXECUTE_QUEUE_TIMEOUT_SECONDS + 2 * JUDGE_API_TIMEOUT_SECONDS
+        self.coalesced = 0
+        self.replayed = 0
+        self._inflight = {}  # key -> asyncio.Future
+        self._fingerprints = {}  # remember key in flight -> fingerprint
+        self._completed = collections.OrderedDict()  # key -> (expires_at, fingerprint, result)
+
+    def _purge(self):
+        now = time.monotonic()
+        while self._completed:
+            key, (expires_at, _, _) = next(iter(self._completed.items()))
+            if expires_at > now and len(self._completed) <= self.max_keys:
+                break
+            self._completed.popitem(last=False)
+
+    async def run(
+        self,
+        keys: List[Hashable],
+        compute: Callable[[], Awaitable[dict]],
+        remember: Optional[Hashable] = None,
+        fingerprint: Optional[str] = None,
+    ) -> dict:
+        self._purge()
+        if remember is not None and remember in self._completed:
+            _, stored_fingerprint, result = self._completed[remember]
+            self._check_fingerprint(stored_fingerprint, fingerprint)
+            self.replayed += 1
+            return result
+        if remember is not None and remember in self._inflight:
+            self._check_fingerprint(self._fingerprints.get(remember), fingerprint)
+
+        for key in keys:
+            if key in self._inflight:
+                self.coalesced += 1
+                return await asyncio.shield(self._inflight[key])
+
+        shared_name = None
+        if remember is not None and self.shared.distributed:
+            shared_name = self._shared_name(remember)
+            stored = await self._claim(shared_name, fingerprint)
+            if stored is not None:
+                self.replayed += 1
+                return stored
+            # ours to run; another worker's retry waits on it (or one here coalesces above)
+            if any(key in self._inflight for key in keys):
+                await self.shared.call(self.shared.delete, f"idempotency:running:{shared_name}")
+                self.coalesced += 1
+                return await asyncio.shield(next(self._inflight[k] for k in keys if k in self._inflight))
+
+        future = asyncio.get_running_loop().create_future()
+        for key in keys:
+            self._inflight[key] = future
+        if remember is not None:
+            self._fingerprints[remember] = fingerprint
+        try:
+            result = await compute()
+        except asyncio.CancelledError:
+            # The caller went away mid-judge; whoever was waiting on it has to retry
+            future.set_exception(HTTPException(
+                status_code=503,
+                detail="The original request was cancelled; please retry",
+                headers={"Retry-After": "1"},
+            ))
+            future.exception()  # mark retrieved; waiters re-raise it themselves
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            if remember is not None:
+                self._completed[remember] = (time.monotonic() + self.ttl, fingerprint, result)
+            if shared_name is not None:
+                await self.shared.call(
+                    self.shared.set_json,
+                    f"idempotency:result:{shared_name}",
+                    {"fingerprint": fingerprint, "result": result},
+                    self.ttl,
+                )
+            return result
+        finally:
+            for key in keys:
+                if self._inflight.get(key) is future:
+                    del self._inflight[key]
+            if remember is not None and remember not in self._inflight:
+                self._fingerprints.pop(remember, None)
+            if shared_name is not None:
+                await self.shared.call(self.shared.delete, f"idempotency:running:{shared_name}")
+
+    @staticmethod
+    def _shared_name(key: Hashable) -> str:
+        return hashlib.sha256(repr(key).encode()).hexdigest()
+
+    @staticmethod
+    def _check_fingerprint(stored: Optional[str], fingerprint: Optional[str]):
+        if stored != fingerprint:
+            raise HTTPException(
+                status_code=422,
+                detail="Idempotency-Key was already used for a different request",
+            )
+
+    async def _stored_result(self, name: str, fingerprint: Optional[str]) -> Optional[dict]:
+        stored = await self.shared.call(self.shared.get_json, f"idempotency:result:{name}")
+        if stored is None:
+            return None
+        self._check_fingerprint(stored.get("fingerprint"), fingerprint)
+        return stored["result"]
+
+    async def _claim(self, name: str, fingerprint: Optional[str]) -> Optional[dict]:
+        """
+        The stored result for `name` if some worker already produced it;
+        otherwise wait until no other worker is running it, take the lock
+        and return None. The lock holds the running payload's fingerprint,
+        so a mismatched retry fails straight away instead of waiting.
+        """
+        running = f"idempotency:running:{name}"
+        while True:
+            stored = await self._stored_result(name, fingerprint)
+            if stored is not None:
+                return stored
+            if await self.shared.call(self.shared.add, running, fingerprint or "", ttl=self.lock_ttl):
+                # the previous holder may have finished between the two calls above
+                try:
+                    stored = await self._stored_result(name, fingerprint)
+                except HTTPException:
+                    await self.shared.call(self.shared.delete, running)
+                    raise
+                if stored is not None:
+                    await self.shared.call(self.shared.delete, running)
+                return stored
+            holder = await self.shared.call(self.shared.get, running)
+            if holder is not None:
+                self._check_fingerprint(holder or None, fingerprint)
+            await asyncio.sleep(SHARED_POLL_SECONDS)
+
+    def stats(self) -> dict:
+        return {
+            "inflight": len(set(map(id, self._inflight.values()))),
+            "remembered": len(self._completed),
+            "coalesced": self.coalesced,
+            "replayed": self.replayed,
+        }
+
+# Singleton instance for /execute
+execute_deduplicator = RequestDeduplicator()
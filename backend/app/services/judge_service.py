@@ -1,72 +1,441 @@
-import httpx
-from ..config import JUDGE_API_URL, JUDGE_API_TIMEOUT_SECONDS
+import asyncio
+import bisect
+import collections
+import hashlib
+import math
+import random
+import time
+from typing import TYPE_CHECKING, Dict, List, Optional
+from urllib.parse import urlsplit
+
+from ..config import (
+    JUDGE_API_URLS,
+    JUDGE_API_TIMEOUT_SECONDS,
+    JUDGE_NODE_TIMEOUT_SECONDS,
+    JUDGE_ROUTING,
+    JUDGE_HEALTH_PATH,
+    JUDGE_HEALTH_INTERVAL_SECONDS,
+    JUDGE_EJECT_AFTER_FAILURES,
+    JUDGE_HEDGE_ENABLED,
+    JUDGE_HEDGE_DELAY_SECONDS,
+)
+from .circuit_breaker import CircuitBreaker
+from .shared_state import SharedState, shared_state
+import metrics
 import logging
 
+if TYPE_CHECKING:
+    import httpx  # imported on first use; it's a good chunk of the app's import time
+
 logger = logging.getLogger(__name__)
 
+JUDGE_REQUESTS = metrics.Counter(
+    "judge_requests_total", "Requests to judge nodes by outcome", ("node", "outcome")
+)
+JUDGE_REQUEST_SECONDS = metrics.Histogram(
+    "judge_request_duration_seconds", "Round trip to a judge node", ("node",)
+)
+
+
+def _observe(node, outcome: str, started: float):
+    JUDGE_REQUESTS.labels(node.url, outcome).inc()
+    JUDGE_REQUEST_SECONDS.labels(node.url).observe(time.monotonic() - started)
+
+ROUTING_LEAST_OUTSTANDING = "least_outstanding"
+ROUTING_HASH = "hash"
+RING_REPLICAS = 64  # virtual nodes per judge on the hash ring
+HEDGE_MIN_SAMPLES = 20  # latencies needed before the hedge delay follows the p95
+
+
+class JudgeUnavailableError(Exception):
+    """Raised when no judge node could take the request. Safe to retry later."""
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class _RetryableJudgeError(Exception):
+    """One node failed in a way another node might not."""
+
+
+class JudgeNode:
+    """One judge endpoint and what we currently know about it."""
+
+    def __init__(self, url: str, health_path: str = JUDGE_HEALTH_PATH):
+        self.url = url
+        parts = urlsplit(url)
+        self.health_url = f"{parts.scheme}://{parts.netloc}{health_path}"
+        self.outstanding = 0
+        self.healthy = True
+        self.consecutive_failures = 0
+        self.total_requests = 0
+        self.total_failures = 0
+        self.last_error: Optional[str] = None
+        self.last_checked_at: Optional[float] = None
+        self.breaker = CircuitBreaker(url)
+
+    def record_success(self):
+        self.consecutive_failures = 0
+        if not self.healthy:
+            logger.info(f"Judge node {self.url} is healthy again")
+        self.healthy = True
+
+    def record_failure(self, error: str, eject_after: int = JUDGE_EJECT_AFTER_FAILURES):
+        self.consecutive_failures += 1
+        self.total_failures += 1
+        self.last_error = error
+        if self.healthy and self.consecutive_failures >= eject_after:
+            logger.warning(f"Ejecting judge node {self.url} after {self.consecutive_failures} failures: {error}")
+            self.healthy = False
+
+    def to_dict(self) -> dict:
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "outstanding": self.outstanding,
+            "consecutive_failures": self.consecutive_failures,
+            "total_requests": self.total_requests,
+            "total_failures": self.total_failures,
+            "last_error": self.last_error,
+            "last_checked_at": self.last_checked_at,
+            "circuit": self.breaker.to_dict(),
+        }
+
+
+class HashRing:
+    """Consistent hash ring, so each question keeps landing on the same judge."""
+
+    def __init__(self, urls: List[str], replicas: int = RING_REPLICAS):
+        points = sorted(
+            (self._hash(f"{url}#{i}"), url) for url in urls for i in range(replicas)
+        )
+        self._keys = [key for key, _ in points]
+        self._urls = [url for _, url in points]
+
+    @staticmethod
+    def _hash(value: str) -> int:
+        return int.from_bytes(hashlib.md5(value.encode()).digest()[:8], "big")
+
+    def preference(self, key: str) -> List[str]:
+        """Every node, in the order `key` should try them."""
+        if not self._urls:
+            return []
+        start = bisect.bisect(self._keys, self._hash(key)) % len(self._urls)
+        seen: List[str] = []
+        for i in range(len(self._urls)):
+            url = self._urls[(start + i) % len(self._urls)]
+            if url not in seen:
+                seen.append(url)
+        return seen
+
+
 class JudgeService:
-    def __init__(self):
-        self.api_url = JUDGE_API_URL
+    def __init__(self, urls: List[str] = JUDGE_API_URLS, routing: str = JUDGE_ROUTING,
+                 shared: SharedState = shared_state):
         self.timeout = JUDGE_API_TIMEOUT_SECONDS
+        self.node_timeout = min(JUDGE_NODE_TIMEOUT_SECONDS, self.timeout)
+        self.routing = routing
+        self.hedge_enabled = JUDGE_HEDGE_ENABLED
+        self.hedges_sent = 0
+        self.hedges_won = 0
+        self._latencies = collections.deque(maxlen=200)  # recent successful judge latencies
+        self.nodes: Dict[str, JudgeNode] = {}
+        self._ring = HashRing([])
+        self._client: Optional["httpx.AsyncClient"] = None
+        self._health_task: Optional[asyncio.Task] = None
+        self.shared = shared
+        self._nodes_seen = 0  # "judges" channel version the node list matches
+        for url in urls:
+            self.add_node(url)
+
+    @property
+    def api_url(self) -> Optional[str]:
+        """First configured judge (kept for callers that expect a single URL)."""
+        return next(iter(self.nodes), None)
+
+    # ===== NODE MANAGEMENT =====
+
+    def add_node(self, url: str) -> JudgeNode:
+        url = url.strip()
+        if url not in self.nodes:
+            self.nodes[url] = JudgeNode(url)
+            self._ring = HashRing(list(self.nodes))
+            logger.info(f"Added judge node {url}")
+        return self.nodes[url]
+
+    def remove_node(self, url: str) -> bool:
+        if self.nodes.pop(url.strip(), None) is None:
+            return False
+        self._ring = HashRing(list(self.nodes))
+        logger.info(f"Removed judge node {url}")
+        return True
+
+    async def publish_nodes(self):
+        """After an admin adds or removes a node: make the other API workers route the same way."""
+        if self.shared.distributed:
+            await self.shared.call(self.shared.set_json, "judges:nodes", list(self.nodes))
+            self._nodes_seen = await self.shared.call(self.shared.publish, "judges")
+
+    async def _sync_nodes(self):
+        # only the reads go to the threadpool; nodes are changed on the loop, like everywhere else
+        published = await self.shared.call(self.shared.version, "judges")
+        if published == self._nodes_seen:
+            return
+        urls = await self.shared.call(self.shared.get_json, "judges:nodes") or []
+        for url in set(self.nodes) - set(urls):
+            self.remove_node(url)
+        for url in urls:
+            self.add_node(url)
+        self._nodes_seen = published
+
+    async def status(self) -> dict:
+        if self.shared.distributed:
+            await self._sync_nodes()
+        return {
+            "routing": self.routing,
+            "hedging": {
+                "enabled": self.hedge_enabled,
+                "delay_seconds": round(self._hedge_delay(), 3),
+                "sent": self.hedges_sent,
+                "won": self.hedges_won,
+            },
+            "nodes": [node.to_dict() for node in self.nodes.values()],
+        }
+
+    def _candidates(self, question_id: str) -> List[JudgeNode]:
+        """Healthy nodes in the order this request should try them."""
+        if self.routing == ROUTING_HASH:
+            ordered = [self.nodes[url] for url in self._ring.preference(question_id.upper()) if url in self.nodes]
+        else:
+            ordered = list(self.nodes.values())
+            random.shuffle(ordered)  # break ties between equally idle nodes
+            ordered.sort(key=lambda node: node.outstanding)
+        # an open circuit means don't even ask; the health checks don't get a say in that
+        ordered = [node for node in ordered if node.breaker.available()]
+        healthy = [node for node in ordered if node.healthy]
+        # everyone ejected? try them anyway rather than fail without asking
+        return healthy or ordered
+
+    # ===== HTTP =====
 
-    async def judge_submission(self, question_id: str, code_answer: str) -> int:
+    def _get_client(self) -> "httpx.AsyncClient":
+        if self._client is None or self._client.is_closed:
+            import httpx
+
+            self._client = httpx.AsyncClient(headers={"Content-Type": "application/json"})
+        return self._client
+
+    def _ensure_health_checks(self):
+        if self._health_task is None or self._health_task.done():
+            self._health_task = asyncio.get_running_loop().create_task(self._health_loop())
+
+    async def close(self):
+        """Stop health checks and drop pooled connections (app shutdown)."""
+        if self._health_task is not None:
+            self._health_task.cancel()
+            self._health_task = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(JUDGE_HEALTH_INTERVAL_SECONDS)
+            await asyncio.gather(*(self.check_node(node) for node in list(self.nodes.values())))
+
+    async def check_node(self, node: JudgeNode) -> bool:
+        """Active health check; a 2xx brings an ejected node back."""
+        try:
+            response = await self._get_client().get(node.health_url, timeout=min(5.0, self.timeout))
+            response.raise_for_status()
+            node.record_success()
+        except Exception as e:
+            node.record_failure(f"health check: {e.__class__.__name__}")
+        node.last_checked_at = time.time()
+        return node.healthy
+
+    @staticmethod
+    def _parse_result(result_data: dict) -> int:
+        # External judges answer {"result": 0|1}; a local runner_service answers
+        # with test_runner's {"status": "PASS"|"FAIL", ...}
+        if "result" in result_data:
+            result = result_data["result"]
+        elif "status" in result_data:
+            result = 1 if result_data["status"] == "PASS" else 0
+        else:
+            logger.error(f"Invalid judge API response: {result_data}")
+            raise Exception("Invalid response from judge API: missing 'result' field")
+
+        # Ensure result is 0 or 1
+        if result not in [0, 1]:
+            logger.error(f"Invalid result value from judge API: {result}")
+            raise Exception(f"Invalid result value: {result}. Expected 0 or 1")
+        return result
+
+    async def _post(self, node: JudgeNode, payload: dict, timeout: float) -> int:
+        node.outstanding += 1
+        node.total_requests += 1
+        try:
+            response = await self._get_client().post(node.url, json=payload, timeout=timeout)
+        finally:
+            node.outstanding -= 1
+        response.raise_for_status()
+        return self._parse_result(response.json())
+
+    def _hedge_delay(self) -> float:
+        """p95 of recent successful judge latencies, or the configured delay until we have enough."""
+        if len(self._latencies) < HEDGE_MIN_SAMPLES:
+            return JUDGE_HEDGE_DELAY_SECONDS
+        ordered = sorted(self._latencies)
+        return ordered[max(0, math.ceil(0.95 * len(ordered)) - 1)]
+
+    async def _attempt(self, node: JudgeNode, payload: dict, deadline: float, question_id: str) -> int:
+        """
+        One request to one node. Raises _RetryableJudgeError when another node
+        might do better, a plain Exception when none would.
+        """
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise _RetryableJudgeError("Judge API request timed out")
+        if not node.breaker.begin():
+            raise _RetryableJudgeError(f"circuit open for {node.url}")
+        import httpx
+
+        started = time.monotonic()
+        try:
+            result = await self._post(node, payload, min(remaining, self.node_timeout))
+        except asyncio.CancelledError:
+            # the other hedge answered first (or the client left): no verdict on this node
+            node.breaker.release()
+            _observe(node, "cancelled", started)
+            raise
+        except httpx.TimeoutException:
+            logger.error(f"Judge API timeout for question {question_id} on {node.url}")
+            node.record_failure("timeout")
+            node.breaker.record(False, time.monotonic() - started)
+            _observe(node, "timeout", started)
+            raise _RetryableJudgeError("Judge API request timed out")
+        except httpx.HTTPStatusError as e:
+            logger.error(f"Judge API HTTP error from {node.url}: {e.response.status_code} - {e.response.text}")
+            if e.response.status_code < 500:
+                # the judge understood us and said no; another node won't say yes
+                node.record_success()
+                node.breaker.record(True, time.monotonic() - started)
+                _observe(node, "rejected", started)
+                raise Exception(f"Judge API error: {e.response.status_code}")
+            node.record_failure(f"HTTP {e.response.status_code}")
+            node.breaker.record(False, time.monotonic() - started)
+            _observe(node, "server_error", started)
+            raise _RetryableJudgeError(f"Judge API error: {e.response.status_code}")
+        except httpx.TransportError as e:
+            logger.error(f"Judge API call to {node.url} failed: {e.__class__.__name__}")
+            node.record_failure(e.__class__.__name__)
+            node.breaker.record(False, time.monotonic() - started)
+            _observe(node, "unreachable", started)
+            raise _RetryableJudgeError(f"Judge API unreachable: {e.__class__.__name__}")
+
+        elapsed = time.monotonic() - started
+        node.record_success()
+        node.breaker.record(True, elapsed)
+        self._latencies.append(elapsed)
+        _observe(node, "ok", started)
+        logger.info(f"Judge result for {question_id} from {node.url}: {result} ({elapsed:.2f}s)")
+        return result
+
+    async def judge_submission(self, question_id: str, code_answer: str,
+                               question: Optional[dict] = None, cases_version: Optional[int] = None) -> int:
         """
-        Send code to external judge API for evaluation.
-        
+        Send code to a judge node for evaluation.
+
+        The node is picked by JUDGE_ROUTING among nodes that are healthy and
+        whose circuit breaker is closed. If it fails (connection error, 5xx, or
+        no answer within JUDGE_NODE_TIMEOUT_SECONDS), the next candidate is
+        tried until JUDGE_API_TIMEOUT_SECONDS runs out.
+        With JUDGE_HEDGE_ENABLED, a duplicate goes to the next candidate once
+        the first has taken longer than the recent p95; the first answer wins.
+
         Args:
             question_id: Question identifier (e.g., "E01", "M04", "H10")
             code_answer: The brocode-lang code submitted by the user
-        
+            question: The question's compiled test cases (TestCaseSnapshot.export_question);
+                without them the node judges from its own test_cases.json
+            cases_version: Snapshot version the cases came from, for the node's logs and traces
+
         Returns:
             int: 1 if correct, 0 if wrong
-        
+
         Raises:
-            Exception: If API call fails or returns invalid response
+            JudgeUnavailableError: If no judge node could answer in time, or every circuit is open
+            Exception: If a judge rejects the request or returns an invalid response
         """
-        if not self.api_url:
+        if self.shared.distributed:
+            await self._sync_nodes()
+        if not self.nodes:
             raise Exception("JUDGE_API_URL is not configured")
+        self._ensure_health_checks()
+
+        candidates = self._candidates(question_id)
+        if not candidates:
+            # every breaker is open: fail now instead of waiting on a sick judge
+            retry_after = min(node.breaker.retry_after() for node in self.nodes.values())
+            raise JudgeUnavailableError("all judge nodes are failing (circuit open)", retry_after=retry_after)
 
         payload = {
             "question_id": question_id,
             "code_answer": code_answer
         }
+        if question is not None:
+            payload["question"] = question
+            payload["cases_version"] = cases_version
+
+        loop = asyncio.get_running_loop()
+        deadline = time.monotonic() + self.timeout
+        last_error = "no judge node available"
+        waiting = list(candidates)
+        running = set()
+        hedged = False
+        hedge_task = None
 
+        def launch():
+            node = waiting.pop(0)
+            task = loop.create_task(self._attempt(node, payload, deadline, question_id))
+            running.add(task)
+            return task
+
+        launch()
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.post(
-                    self.api_url,
-                    json=payload,
-                    headers={"Content-Type": "application/json"}
-                )
-                
-                response.raise_for_status()
-                
-                result_data = response.json()
-                
-                # Validate response format
-                if "result" not in result_data:
-                    logger.error(f"Invalid judge API response: {result_data}")
-                    raise Exception("Invalid response from judge API: missing 'result' field")
-                
-                result = result_data["result"]
-                
-                # Ensure result is 0 or 1
-                if result not in [0, 1]:
-                    logger.error(f"Invalid result value from judge API: {result}")
-                    raise Exception(f"Invalid result value: {result}. Expected 0 or 1")
-                
-                logger.info(f"Judge result for {question_id}: {result}")
-                return result
-                
-        except httpx.TimeoutException:
-            logger.error(f"Judge API timeout for question {question_id}")
-            raise Exception("Judge API request timed out")
-        except httpx.HTTPStatusError as e:
-            logger.error(f"Judge API HTTP error: {e.response.status_code} - {e.response.text}")
-            raise Exception(f"Judge API error: {e.response.status_code}")
-        except Exception as e:
-            logger.error(f"Judge API call failed: {str(e)}")
-            raise
+            while running:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                wait_for = remaining
+                if self.hedge_enabled and not hedged and waiting:
+                    wait_for = min(remaining, self._hedge_delay())
+                done, running = await asyncio.wait(running, timeout=wait_for, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    if self.hedge_enabled and not hedged and waiting:
+                        hedged = True
+                        self.hedges_sent += 1
+                        hedge_task = launch()
+                        continue
+                    break
+                for task in done:
+                    try:
+                        result = task.result()
+                    except _RetryableJudgeError as e:
+                        last_error = str(e)
+                    else:
+                        if task is hedge_task:
+                            self.hedges_won += 1
+                        return result
+                if not running and waiting:
+                    launch()
+        finally:
+            for task in running:
+                task.cancel()
+
+        raise JudgeUnavailableError(last_error)
 
 # Singleton instance
 judge_service = JudgeService()
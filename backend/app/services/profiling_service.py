@@ -0,0 +1,341 @@
+import collections
+import contextvars
+import cProfile
+import io
+import json
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from ..config import (
+    PROFILE_DIR,
+    PROFILE_MAX_FILES,
+    PROFILE_MODE,
+    PROFILE_ROUTES,
+    PROFILE_SAMPLE_INTERVAL_MS,
+    PROFILE_SLOW_MS,
+    SECRET_KEY,
+    ALGORITHM,
+)
+import metrics
+import logging
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = b"x-profile"  # value: an admin access token
+MODE_SAMPLE = "sample"
+MODE_CPROFILE = "cprofile"
+MAX_STATEMENTS = 500  # per capture; a request running more than this has other problems
+MAX_STACK_DEPTH = 60
+CAPTURE_NAME = re.compile(r"^[\w.-]+\.json$")
+
+
+class Capture:
+    """Everything recorded while one request ran."""
+
+    def __init__(self, method: str, path: str, forced: bool):
+        self.method = method
+        self.path = path
+        self.forced = forced  # asked for by header: written even when fast
+        self.started = time.perf_counter()
+        self.started_at = datetime.utcnow()
+        self.statements = []  # (statement, seconds)
+        self.statement_count = 0
+        self.statement_seconds = 0.0
+        self.stacks = collections.Counter()  # folded stack -> samples
+        self.profile: Optional[cProfile.Profile] = None
+
+
+_current_capture = contextvars.ContextVar("current_capture", default=None)
+
+
+def _route_pattern(template: str) -> re.Pattern:
+    """/api/challenge/execute/{question_id} -> a regex for the raw path."""
+    parts = re.split(r"(\{[^}]+\})", template.rstrip("/") or "/")
+    return re.compile("^" + "".join("[^/]+" if p.startswith("{") else re.escape(p) for p in parts) + "/?$")
+
+
+class StackSampler:
+    """
+    One background thread that, while any capture is open, samples every
+    thread's stack each PROFILE_SAMPLE_INTERVAL_MS and adds it to all open
+    captures. So a capture shows what the whole process was doing while its
+    request ran: handler code, threadpool DB work, or something else
+    hogging the event loop.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._captures = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def add(self, capture: Capture):
+        with self._lock:
+            self._captures.add(capture)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+                self._thread.start()
+
+    def remove(self, capture: Capture):
+        with self._lock:
+            self._captures.discard(capture)
+
+    def _run(self):
+        me = threading.get_ident()
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._captures:
+                    self._thread = None
+                    return
+            names = {t.ident: t.name for t in threading.enumerate()}
+            samples = []
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == me:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                samples.append(names.get(thread_id, str(thread_id)) + ";" + ";".join(reversed(stack)))
+            # under the lock, so a capture that was just removed is never written to again
+            with self._lock:
+                for capture in self._captures:
+                    capture.stacks.update(samples)
+
+
+class RequestProfiler:
+    """
+    Captures requests to the selected routes (or any request carrying an
+    X-Profile header with an admin token) and writes the slow ones, with
+    their SQL and stack samples or cProfile stats, to PROFILE_DIR. Only the
+    newest PROFILE_MAX_FILES captures are kept.
+    """
+
+    def __init__(self):
+        self.directory = PROFILE_DIR
+        self.max_files = PROFILE_MAX_FILES
+        self.mode = PROFILE_MODE
+        self.slow_ms = PROFILE_SLOW_MS
+        self.routes: List[str] = []
+        self._patterns: List[re.Pattern] = []
+        self._sampler = StackSampler(PROFILE_SAMPLE_INTERVAL_MS / 1000)
+        self._cprofile_busy = threading.Lock()  # one cProfile per thread at a time, and all requests share the loop's
+        self.captured = 0
+        self.written = 0
+        self.set_routes(PROFILE_ROUTES)
+
+    def set_routes(self, routes: List[str]):
+        self.routes = [r.strip() for r in routes if r.strip()]
+        self._patterns = [_route_pattern(r) for r in self.routes]
+
+    def settings(self) -> dict:
+        return {
+            "routes": self.routes,
+            "slow_ms": self.slow_ms,
+            "mode": self.mode,
+            "directory": os.path.abspath(self.directory),
+            "max_files": self.max_files,
+            "captured": self.captured,
+            "written": self.written,
+        }
+
+    # ----- selection -----
+
+    def wants(self, scope) -> Optional[bool]:
+        """None: leave this request alone. Otherwise whether it was forced by header."""
+        token = None
+        for name, value in scope.get("headers", ()):
+            if name == PROFILE_HEADER:
+                token = value.decode("latin-1")
+                break
+        if token is not None and self._is_admin_token(token):
+            return True
+        if self._patterns and any(p.match(scope.get("path", "")) for p in self._patterns):
+            return False
+        return None
+
+    @staticmethod
+    def _is_admin_token(token: str) -> bool:
+        from jose import JWTError, jwt
+
+        try:
+            payload = jwt.decode(token.removeprefix("Bearer "), SECRET_KEY, algorithms=[ALGORITHM])
+        except JWTError:
+            return False
+        return payload.get("type") == "admin" and bool(payload.get("sub"))
+
+    # ----- recording -----
+
+    def begin(self, scope, forced: bool) -> Capture:
+        capture = Capture(scope.get("method", ""), scope.get("path", ""), forced)
+        self.captured += 1
+        if self.mode == MODE_CPROFILE and self._cprofile_busy.acquire(blocking=False):
+            try:
+                capture.profile = cProfile.Profile()
+                capture.profile.enable()
+            except ValueError:
+                # another profiler owns this thread (a debugger, say)
+                capture.profile = None
+                self._cprofile_busy.release()
+        if capture.profile is None:
+            self._sampler.add(capture)
+        return capture
+
+    def end(self, capture: Capture, scope, status: int):
+        elapsed_ms = (time.perf_counter() - capture.started) * 1000
+        if capture.profile is not None:
+            capture.profile.disable()
+            self._cprofile_busy.release()
+        else:
+            self._sampler.remove(capture)
+        if capture.forced or elapsed_ms >= self.slow_ms:
+            try:
+                self._write(capture, metrics.route_template(scope), status, elapsed_ms)
+            except OSError as e:
+                logger.warning(f"could not write profile capture: {e}")
+
+    @staticmethod
+    def record_statement(statement: str, seconds: float):
+        capture = _current_capture.get()
+        if capture is None:
+            return
+        capture.statement_count += 1
+        capture.statement_seconds += seconds
+        if len(capture.statements) < MAX_STATEMENTS:
+            capture.statements.append((statement, seconds))
+
+    def _write(self, capture: Capture, route: str, status: int, elapsed_ms: float):
+        report = {
+            "method": capture.method,
+            "path": capture.path,
+            "route": route,
+            "status": status,
+            "elapsed_ms": round(elapsed_ms, 2),
+            "started_at": capture.started_at.isoformat() + "Z",
+            "trigger": "header" if capture.forced else "slow",
+            "sql": {
+                "count": capture.statement_count,
+                "total_ms": round(capture.statement_seconds * 1000, 2),
+                "statements": [
+                    {"ms": round(seconds * 1000, 3), "statement": statement}
+                    for statement, seconds in capture.statements
+                ],
+            },
+        }
+        if capture.profile is not None:
+            out = io.StringIO()
+            pstats.Stats(capture.profile, stream=out).sort_stats("cumulative").print_stats(60)
+            report["cprofile"] = out.getvalue()
+        else:
+            report["samples"] = {
+                "interval_ms": self._sampler.interval * 1000,
+                "total": sum(capture.stacks.values()),
+                "folded": dict(capture.stacks.most_common()),  # flamegraph.pl / speedscope input
+            }
+
+        os.makedirs(self.directory, exist_ok=True)
+        slug = re.sub(r"[^\w]+", "_", route).strip("_") or "root"
+        name = f"{capture.started_at:%Y%m%d-%H%M%S-%f}_{capture.method}_{slug}_{int(elapsed_ms)}ms.json"
+        with open(os.path.join(self.directory, name), "w") as f:
+            json.dump(report, f, indent=1)
+        self.written += 1
+        self._rotate()
+
+    def _rotate(self):
+        captures = sorted(self.list_captures(), key=lambda c: c["name"])
+        for old in captures[:max(0, len(captures) - self.max_files)]:
+            try:
+                os.remove(os.path.join(self.directory, old["name"]))
+            except OSError:
+                pass
+
+    # ----- reading back -----
+
+    def list_captures(self) -> List[Dict]:
+        try:
+            entries = os.scandir(self.directory)
+        except FileNotFoundError:
+            return []
+        with entries:
+            return [
+                {"name": e.name, "bytes": e.stat().st_size}
+                for e in entries
+                if e.is_file() and CAPTURE_NAME.match(e.name)
+            ]
+
+    def read_capture(self, name: str) -> Optional[dict]:
+        if not CAPTURE_NAME.match(name):
+            return None
+        try:
+            with open(os.path.join(self.directory, name)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def clear(self) -> int:
+        removed = 0
+        for capture in self.list_captures():
+            try:
+                os.remove(os.path.join(self.directory, capture["name"]))
+                removed += 1
+            except OSError:
+                pass
+        return removed
+
+
+def instrument_engine(engine):
+    """Hand every statement to the capture of the request that ran it."""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if _current_capture.get() is not None:
+            context._profile_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_profile_started", None)
+        if started is not None:
+            RequestProfiler.record_statement(statement, time.perf_counter() - started)
+
+
+class ProfilingMiddleware:
+    """Pure ASGI; requests nobody asked to profile only pay for a header scan."""
+
+    def __init__(self, app, profiler: "RequestProfiler" = None):
+        self.app = app
+        self.profiler = profiler or request_profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        forced = self.profiler.wants(scope)
+        if forced is None:
+            return await self.app(scope, receive, send)
+
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        capture = self.profiler.begin(scope, forced)
+        token = _current_capture.set(capture)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_capture.reset(token)
+            self.profiler.end(capture, scope, status)
+
+# Singleton instance
+request_profiler = RequestProfiler()
@@ -0,0 +1,82 @@
+import threading
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from ..models.question import Question
+from ..responses import dumps
+from .http_cache import CachedBody
+from .shared_state import SharedState, shared_state
+
+# QuestionPublic, in order
+PUBLIC_COLUMNS = (
+    Question.id,
+    Question.question_id,
+    Question.title,
+    Question.description,
+    Question.sample_input,
+    Question.sample_output,
+    Question.difficulty,
+    Question.points,
+)
+PUBLIC_FIELDS = tuple(column.key for column in PUBLIC_COLUMNS)
+
+
+class QuestionCatalog:
+    """
+    The public question list (/api/questions/public/all) and each public
+    question (/api/questions/public/{id}), serialized once and served as
+    CachedBody (bytes, ETag, compressed variants) until they change.
+
+    It counts as changed when the app publishes on the "questions" channel
+    (admin create/update/delete, in any worker) or when a one-row aggregate
+    of the active questions (count, max id, latest timestamps) moves, which
+    also catches scripts like qs.py editing the table behind the app's back.
+    """
+
+    def __init__(self, shared: SharedState = shared_state):
+        self.shared = shared
+        self._lock = threading.Lock()
+        self._key: Optional[Tuple] = None
+        self._all: Optional[CachedBody] = None
+        self._by_id: Dict[int, CachedBody] = {}
+        self.builds = 0
+
+    def invalidate(self):
+        """Call after committing any change to a question."""
+        self.shared.publish("questions")
+
+    def _fingerprint(self, db: Session) -> Tuple:
+        return tuple(
+            db.query(
+                func.count(Question.id),
+                func.max(Question.id),
+                func.max(Question.created_at),
+                func.max(Question.updated_at),
+            ).filter(Question.is_active == True).one()
+        )
+
+    def _current(self, db: Session) -> Tuple[CachedBody, Dict[int, CachedBody]]:
+        key = (self.shared.version("questions"), self._fingerprint(db))
+        with self._lock:
+            if self._all is not None and key == self._key:
+                return self._all, self._by_id
+        rows = db.query(*PUBLIC_COLUMNS).filter(Question.is_active == True).order_by(Question.id).all()
+        questions = [dict(zip(PUBLIC_FIELDS, row)) for row in rows]
+        everything = CachedBody(dumps(questions))
+        by_id = {question["id"]: CachedBody(dumps(question)) for question in questions}
+        with self._lock:
+            self._key, self._all, self._by_id = key, everything, by_id
+            self.builds += 1
+        return everything, by_id
+
+    def public_all(self, db: Session) -> CachedBody:
+        return self._current(db)[0]
+
+    def public_question(self, db: Session, question_id: int) -> Optional[CachedBody]:
+        """None if there's no active question with that id."""
+        return self._current(db)[1].get(question_id)
+
+# Singleton instance
+question_catalog = QuestionCatalog()
@@ -0,0 +1,61 @@
+from typing import List, Optional
+
+from sqlalchemy.orm import Session
+
+from ..models.submission import Submission
+from .blob_store import blob_store
+
+
+class PatchError(ValueError):
+    """Raised when a patch cannot be applied to its base revision."""
+
+
+def hash_code(code: str) -> str:
+    """Content address of a piece of code (sha256 hex digest of its UTF-8 bytes)."""
+    return blob_store.hash_bytes(code.encode("utf-8"))
+
+
+def get_revision(db: Session, code_hash: str) -> Optional[str]:
+    """Return the stored code for a revision hash, or None if unknown."""
+    data = blob_store.read(db, code_hash)
+    return data.decode("utf-8") if data is not None else None
+
+
+def apply_patch(base: str, edits: List[dict]) -> str:
+    """
+    Apply a list of edits to a base revision.
+
+    Each edit is {"start": int, "end": int, "text": str} and replaces
+    base[start:end] with text. Offsets are in Unicode code points and refer
+    to the *base* revision; edits must be sorted and must not overlap.
+    """
+    pieces = []
+    cursor = 0
+    for edit in edits:
+        start, end, text = edit["start"], edit["end"], edit["text"]
+        if start < cursor or end < start or end > len(base):
+            raise PatchError(f"Invalid edit range [{start}, {end}) for base of length {len(base)}")
+        pieces.append(base[cursor:start])
+        pieces.append(text)
+        cursor = end
+    pieces.append(base[cursor:])
+    return "".join(pieces)
+
+
+def set_submission_code(db: Session, submission: Submission, code: Optional[str]) -> Optional[str]:
+    """
+    Point a submission at a new code revision in the blob store.
+
+    Identical code is stored once, and repeated autosaves of unchanged code
+    only touch the blob's last_used_at.
+    """
+    code_hash = blob_store.put(db, code.encode("utf-8")) if code is not None else None
+    submission.code_hash = blob_store.repoint(db, submission.code_hash, code_hash)
+    submission.legacy_code_answer = None
+    return code_hash
+
+
+def mark_judged(db: Session, submission: Submission) -> Optional[str]:
+    """Record the submission's current code as the code that was judged."""
+    submission.judged_hash = blob_store.repoint(db, submission.judged_hash, submission.code_hash)
+    return submission.judged_hash
@@ -0,0 +1,348 @@
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from ..config import SHARED_STATE_URL
+import logging
+
+logger = logging.getLogger(__name__)
+
+try:
+    import fcntl
+except ImportError:  # Windows: no flock, and no multi-worker deployments to guard either
+    fcntl = None
+
+
+class SharedStateError(RuntimeError):
+    """The configured store can't give this deployment one consistent state."""
+
+
+class SharedState:
+    """
+    Small key-value store for state that every API worker has to see:
+    string values with optional TTLs, atomic counters, set-if-absent for
+    cross-worker locks, and versioned channels (publish bumps a counter,
+    subscribers compare it with the version they last saw).
+
+    `distributed` is False for the in-process store, so callers can skip
+    work that only matters with more than one process. Every method blocks;
+    async code goes through call().
+    """
+
+    distributed = True
+
+    async def call(self, fn: Callable, *args, **kwargs):
+        """
+        `await shared.call(shared.get, key)` from the event loop. A distributed
+        store waits on a file lock or the network, so `fn` runs in the
+        threadpool; the in-process store is a dict and runs it inline.
+        """
+        if not self.distributed:
+            return fn(*args, **kwargs)
+        return await run_in_threadpool(fn, *args, **kwargs)
+
+    def get(self, key: str) -> Optional[str]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None):
+        raise NotImplementedError
+
+    def add(self, key: str, value: str, ttl: Optional[float] = None) -> bool:
+        """Set only if the key doesn't exist (or has expired); True if this call set it."""
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None, floor: Optional[int] = None) -> int:
+        """
+        Add to an integer counter (missing counts as 0) and return the new
+        value; ttl restarts on every call. With `floor`, the counter never
+        goes below it, so a decrement after the key lapsed can't go negative.
+        """
+        raise NotImplementedError
+
+    def publish(self, channel: str) -> int:
+        """Announce that `channel` changed; returns its new version."""
+        return self.incr(f"channel:{channel}")
+
+    def version(self, channel: str) -> int:
+        return int(self.get(f"channel:{channel}") or 0)
+
+    def get_json(self, key: str) -> Any:
+        value = self.get(key)
+        return None if value is None else json.loads(value)
+
+    def set_json(self, key: str, value: Any, ttl: Optional[float] = None):
+        self.set(key, json.dumps(value, separators=(",", ":")), ttl)
+
+    def describe(self) -> str:
+        return self.__class__.__name__
+
+    def claim(self, scope: str):
+        """
+        Called once per server process at startup with the database it serves.
+        Raises SharedStateError if the store can't be shared the way this
+        deployment needs; the distributed stores always can.
+        """
+
+
+class MemoryState(SharedState):
+    """Plain dict; correct only while the API runs as a single process."""
+
+    distributed = False
+
+    def __init__(self):
+        self._data = {}  # key -> (value, expires_at or None)
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._claim = None  # the locked file, held until the process exits
+
+    def claim(self, scope: str):
+        """
+        Refuse to be one of several processes serving the same database:
+        `uvicorn --workers 4` or `gunicorn -w 4` without WEB_CONCURRENCY set
+        would otherwise give every worker its own leases, idempotency keys
+        and invalidations. The first process takes an flock on a file named
+        after `scope`; the OS drops it when that process exits.
+        """
+        if fcntl is None or self._claim is not None:
+            return
+        name = hashlib.sha256(scope.encode()).hexdigest()[:16]
+        handle = open(os.path.join(tempfile.gettempdir(), f"brocode-memory-state-{name}.lock"), "a+")
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            handle.seek(0)
+            holder = handle.read().strip()  # empty if it has only just taken the lock
+            handle.close()
+            raise SharedStateError(
+                f"another process{f' (pid {holder})' if holder else ''} already serves this database "
+                "with SHARED_STATE_URL=memory://. "
+                "More than one API worker needs SHARED_STATE_URL=sqlite:///./shared_state.db or redis://..."
+            )
+        handle.truncate(0)
+        handle.write(str(os.getpid()))
+        handle.flush()
+        self._claim = handle
+
+    def _live(self, key: str, now: float):
+        entry = self._data.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= now:
+            del self._data[key]
+            return None
+        return entry
+
+    def _put(self, key: str, value: str, ttl: Optional[float], now: float):
+        self._data[key] = (value, now + ttl if ttl else None)
+        self._writes += 1
+        if self._writes % 1000 == 0:
+            for stale in [k for k, (_, expires_at) in self._data.items() if expires_at is not None and expires_at <= now]:
+                del self._data[stale]
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._live(key, time.time())
+            return entry[0] if entry else None
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None):
+        with self._lock:
+            self._put(key, value, ttl, time.time())
+
+    def add(self, key: str, value: str, ttl: Optional[float] = None) -> bool:
+        with self._lock:
+            now = time.time()
+            if self._live(key, now) is not None:
+                return False
+            self._put(key, value, ttl, now)
+            return True
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None, floor: Optional[int] = None) -> int:
+        with self._lock:
+            now = time.time()
+            entry = self._live(key, now)
+            value = (int(entry[0]) if entry else 0) + amount
+            if floor is not None:
+                value = max(floor, value)
+            self._put(key, str(value), ttl, now)
+            return value
+
+
+class SQLiteState(SharedState):
+    """
+    One table in a SQLite file next to the app. Every worker on the box opens
+    it; SQLite's file locking keeps the counters and set-if-absent atomic.
+    WAL mode, so reads never wait for a writer.
+    """
+
+    PURGE_EVERY = 500  # writes between sweeps of expired keys
+
+    def __init__(self, path: str):
+        self.path = path  # opened on first use, not on import
+        self._local = threading.local()  # sqlite3 connections can't be shared across threads
+        self._writes = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute("CREATE TABLE IF NOT EXISTS shared_state (key TEXT PRIMARY KEY, value TEXT, expires_at REAL)")
+            self._local.db = db
+        return db
+
+    def _wrote(self, db: sqlite3.Connection, now: float):
+        self._writes += 1
+        if self._writes % self.PURGE_EVERY == 0:
+            db.execute("DELETE FROM shared_state WHERE expires_at <= ?", (now,))
+
+    def get(self, key: str) -> Optional[str]:
+        row = self._connection().execute(
+            "SELECT value FROM shared_state WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (key, time.time()),
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None):
+        now = time.time()
+        db = self._connection()
+        db.execute(
+            "INSERT OR REPLACE INTO shared_state (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, value, now + ttl if ttl else None),
+        )
+        self._wrote(db, now)
+
+    def add(self, key: str, value: str, ttl: Optional[float] = None) -> bool:
+        now = time.time()
+        db = self._connection()
+        # one statement, so no other worker can slip in between the expiry check and the write
+        cursor = db.execute(
+            """
+            INSERT INTO shared_state (key, value, expires_at) VALUES (?, ?, ?)
+            ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at
+            WHERE shared_state.expires_at IS NOT NULL AND shared_state.expires_at <= ?
+            """,
+            (key, value, now + ttl if ttl else None, now),
+        )
+        self._wrote(db, now)
+        return cursor.rowcount == 1
+
+    def delete(self, key: str):
+        self._connection().execute("DELETE FROM shared_state WHERE key = ?", (key,))
+
+    def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None, floor: Optional[int] = None) -> int:
+        now = time.time()
+        db = self._connection()
+        initial = amount if floor is None else max(floor, amount)
+        # NULL floor: COALESCE leaves the sum alone (SQLite's MAX() of NULL is NULL)
+        row = db.execute(
+            """
+            INSERT INTO shared_state (key, value, expires_at) VALUES (?, ?, ?)
+            ON CONFLICT (key) DO UPDATE SET
+                value = CASE
+                    WHEN shared_state.expires_at IS NOT NULL AND shared_state.expires_at <= ? THEN excluded.value
+                    ELSE MAX(COALESCE(?, CAST(shared_state.value AS INTEGER) + ?), CAST(shared_state.value AS INTEGER) + ?)
+                END,
+                expires_at = excluded.expires_at
+            RETURNING value
+            """,
+            (key, str(initial), now + ttl if ttl else None, now, floor, amount, amount),
+        ).fetchone()
+        self._wrote(db, now)
+        return int(row[0])
+
+    def describe(self) -> str:
+        return f"sqlite ({self.path})"
+
+
+class RedisState(SharedState):
+    """
+    Redis, or anything that speaks its protocol (KeyDB, Valkey, a local
+    stand-in in tests: pass its client). Needs the `redis` package.
+    publish() also sends the new version on a pub/sub channel of the same
+    name, for listeners outside the API.
+    """
+
+    def __init__(self, url: str = None, client=None, prefix: str = "brocode:"):
+        if client is None:
+            try:
+                import redis
+            except ImportError as e:
+                raise RuntimeError("SHARED_STATE_URL is redis:// but the redis package isn't installed") from e
+            client = redis.Redis.from_url(url, decode_responses=True)
+        self.url = url
+        self.client = client
+        self.prefix = prefix
+
+    @staticmethod
+    def _ms(ttl: Optional[float]) -> Optional[int]:
+        return max(1, int(ttl * 1000)) if ttl else None
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.client.get(self.prefix + key)
+        return value.decode() if isinstance(value, bytes) else value
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None):
+        self.client.set(self.prefix + key, value, px=self._ms(ttl))
+
+    def add(self, key: str, value: str, ttl: Optional[float] = None) -> bool:
+        return bool(self.client.set(self.prefix + key, value, px=self._ms(ttl), nx=True))
+
+    def delete(self, key: str):
+        self.client.delete(self.prefix + key)
+
+    # INCRBY, then clamp, then PEXPIRE, in one atomic step
+    _INCR_FLOOR = """
+    local value = redis.call('INCRBY', KEYS[1], ARGV[1])
+    if value < tonumber(ARGV[2]) then
+        value = tonumber(ARGV[2])
+        redis.call('SET', KEYS[1], value)
+    end
+    if ARGV[3] ~= '' then
+        redis.call('PEXPIRE', KEYS[1], ARGV[3])
+    end
+    return value
+    """
+
+    def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None, floor: Optional[int] = None) -> int:
+        if floor is not None:
+            return int(self.client.eval(self._INCR_FLOOR, 1, self.prefix + key, amount, floor, self._ms(ttl) or ""))
+        pipe = self.client.pipeline()
+        pipe.incrby(self.prefix + key, amount)
+        if ttl:
+            pipe.pexpire(self.prefix + key, self._ms(ttl))
+        return int(pipe.execute()[0])
+
+    def publish(self, channel: str) -> int:
+        version = super().publish(channel)
+        self.client.publish(self.prefix + channel, version)
+        return version
+
+    def describe(self) -> str:
+        return f"redis ({self.url or 'client'})"
+
+
+def create_state(url: str) -> SharedState:
+    if url.startswith("memory://"):
+        return MemoryState()
+    if url.startswith("sqlite:///"):
+        return SQLiteState(url[len("sqlite:///"):])
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisState(url)
+    raise ValueError(f"Unsupported SHARED_STATE_URL: {url}")
+
+
+# Singleton instance
+shared_state = create_state(SHARED_STATE_URL)
@@ -0,0 +1,189 @@
+import csv
+import io
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+
+import bcrypt
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..config import PASSWORD_HASH_WORKERS, TEAM_ROSTER_MAX_ROWS
+from ..models.team import Team
+from ..schemas.team import TeamCreate
+from .shared_state import SharedState, shared_state
+
+# bcrypt ignores (5.x: rejects) anything past 72 bytes
+MAX_PASSWORD_BYTES = 72
+# below this many passwords a pool costs more to start than it saves
+POOL_MIN_PASSWORDS = 8
+# SQLite caps bound parameters per statement
+_IN_CHUNK = 500
+
+_ctx = multiprocessing.get_context("spawn")
+
+
+class RosterError(Exception):
+    """The roster as a whole can't be used (unreadable, too long, or the insert failed)."""
+
+
+def hash_password(password: str) -> str:
+    """Same hash as admin_auth.get_password_hash; top-level so pool workers can pickle it."""
+    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+
+
+def hash_passwords(passwords: List[str], workers: int = 0) -> List[str]:
+    """
+    bcrypt is deliberately slow (a quarter second or more per hash), so a
+    roster's worth is spread over a process pool, one worker per core
+    unless `workers` says otherwise. Order is preserved.
+    """
+    workers = min(workers or os.cpu_count() or 1, len(passwords))
+    if workers <= 1 or len(passwords) < POOL_MIN_PASSWORDS:
+        return [hash_password(password) for password in passwords]
+    with ProcessPoolExecutor(max_workers=workers, mp_context=_ctx) as pool:
+        return list(pool.map(hash_password, passwords, chunksize=max(1, len(passwords) // (workers * 4))))
+
+
+def parse_roster(content: bytes, filename: str = "") -> List[dict]:
+    """
+    Rows of a CSV (header: team_leader_usn,password[,team_name][,is_active])
+    or JSON (a list of objects, or {"teams": [...]}) roster. Blank values
+    count as missing.
+    """
+    try:
+        text = content.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise RosterError("Roster must be UTF-8 text")
+
+    if filename.lower().endswith(".json") or text.lstrip()[:1] in ("[", "{"):
+        try:
+            data = json.loads(text)
+        except json.JSONDecodeError as e:
+            raise RosterError(f"Invalid JSON roster: {e}")
+        if isinstance(data, dict):
+            data = data.get("teams")
+        if not isinstance(data, list) or not all(isinstance(row, dict) for row in data):
+            raise RosterError('JSON roster must be a list of team objects or {"teams": [...]}')
+        rows = data
+    else:
+        reader = csv.DictReader(io.StringIO(text))
+        if not reader.fieldnames:
+            raise RosterError("CSV roster is empty")
+        reader.fieldnames = [name.strip().lower() for name in reader.fieldnames]
+        missing = {"team_leader_usn", "password"} - set(reader.fieldnames)
+        if missing:
+            raise RosterError(f"CSV roster is missing columns: {', '.join(sorted(missing))}")
+        rows = list(reader)
+
+    if len(rows) > TEAM_ROSTER_MAX_ROWS:
+        raise RosterError(f"Roster has {len(rows)} rows, the limit is {TEAM_ROSTER_MAX_ROWS}")
+    return [
+        {key: value.strip() if isinstance(value, str) else value
+         for key, value in row.items()
+         if key is not None and value not in (None, "")}
+        for row in rows
+    ]
+
+
+class TeamProvisioner:
+    """
+    Bulk team creation from a roster: validates every row, hashes the good
+    ones in parallel and inserts them in one transaction. Rows that can't
+    be created are reported, with their 1-based row number, instead of
+    failing the whole import (unless strict).
+    """
+
+    def __init__(self, shared: SharedState = shared_state):
+        self.shared = shared
+
+    def _existing_usns(self, db: Session, usns: List[str]) -> set:
+        existing = set()
+        for i in range(0, len(usns), _IN_CHUNK):
+            chunk = usns[i:i + _IN_CHUNK]
+            existing.update(usn for (usn,) in db.query(Team.team_leader_usn).filter(Team.team_leader_usn.in_(chunk)))
+        return existing
+
+    def import_rows(
+        self,
+        db: Session,
+        rows: List[dict],
+        dry_run: bool = False,
+        strict: bool = False,
+        workers: Optional[int] = None,
+    ) -> dict:
+        """
+        Returns:
+            dict: {"rows", "created", "errors": [{"row", "team_leader_usn", "error"}],
+                   "dry_run", "hash_seconds", "insert_seconds"}
+        """
+        errors, valid, seen = [], [], set()
+        for number, row in enumerate(rows, start=1):
+            usn = str(row.get("team_leader_usn", "")).upper()
+            try:
+                team = TeamCreate(**row)
+            except ValidationError as e:
+                problems = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+                errors.append({"row": number, "team_leader_usn": usn or None, "error": problems})
+                continue
+            if len(team.password.encode("utf-8")) > MAX_PASSWORD_BYTES:
+                errors.append({"row": number, "team_leader_usn": usn, "error": f"Password longer than {MAX_PASSWORD_BYTES} bytes"})
+            elif usn in seen:
+                errors.append({"row": number, "team_leader_usn": usn, "error": "Duplicate USN in roster"})
+            else:
+                seen.add(usn)
+                valid.append((number, usn, team))
+
+        existing = self._existing_usns(db, [usn for _, usn, _ in valid])
+        for number, usn, _ in valid:
+            if usn in existing:
+                errors.append({"row": number, "team_leader_usn": usn, "error": "Team with this USN already exists"})
+        valid = [entry for entry in valid if entry[1] not in existing]
+        errors.sort(key=lambda error: error["row"])
+
+        report = {
+            "rows": len(rows), "created": 0, "errors": errors, "dry_run": dry_run,
+            "hash_seconds": 0.0, "insert_seconds": 0.0,
+        }
+        if dry_run or not valid or (strict and errors):
+            return report
+
+        started = time.perf_counter()
+        hashes = hash_passwords(
+            [team.password for _, _, team in valid],
+            PASSWORD_HASH_WORKERS if workers is None else workers,
+        )
+        report["hash_seconds"] = round(time.perf_counter() - started, 3)
+
+        started = time.perf_counter()
+        try:
+            db.execute(insert(Team), [
+                {
+                    "team_leader_usn": usn,
+                    "password": hashed,
+                    "team_name": team.team_name,
+                    "is_active": team.is_active,
+                }
+                for (_, usn, team), hashed in zip(valid, hashes)
+            ])
+            db.commit()
+        except IntegrityError:
+            # someone created one of these teams while we were hashing
+            db.rollback()
+            raise RosterError("A team in the roster was created concurrently; nothing was imported, try again")
+        report["insert_seconds"] = round(time.perf_counter() - started, 3)
+        report["created"] = len(valid)
+        self.shared.publish("leaderboard")
+        return report
+
+    def import_file(self, db: Session, path: str, **options) -> dict:
+        with open(path, "rb") as f:
+            return self.import_rows(db, parse_roster(f.read(), path), **options)
+
+# Singleton instance
+team_provisioner = TeamProvisioner()
@@ -0,0 +1,255 @@
+import json
+import logging
+import threading
+from types import MappingProxyType
+from typing import Dict, Mapping, Optional
+
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from ..models.data_version import DataVersion
+from ..models.question import Question
+from ..models.test_case import TestCase
+from .shared_state import SharedState, shared_state
+import comparator
+
+logger = logging.getLogger(__name__)
+
+
+class TestCaseSnapshot:
+    """
+    Immutable, versioned view of every question's test cases.
+
+    `questions` has the same shape as test_cases.json
+    ({"E01": {"name", "points", "compare", "time_limit", "test_cases": [...]}}),
+    so it can be handed straight to test_runner.test_submission.
+    """
+
+    def __init__(self, version: int, questions: Dict[str, Mapping], keys: Dict[int, str]):
+        self.version = version
+        self.questions = MappingProxyType(questions)
+        self._keys = keys  # question primary key -> question_id, for partial rebuilds
+
+    def export_question(self, question_id: str) -> Optional[dict]:
+        """One question as plain dicts and lists, ready to send to a judge node with the code."""
+        question = self.questions.get(question_id.upper())
+        if question is None:
+            return None
+        exported = dict(question)
+        exported["test_cases"] = [dict(case) for case in question["test_cases"]]
+        return exported
+
+
+def _compile_case(case: TestCase) -> dict:
+    # file-backed sides are left as paths; test_runner mmaps them per run
+    compiled = {}
+    if case.input_file:
+        compiled["input_file"] = case.input_file
+    else:
+        compiled["input"] = case.input_data or ""
+    if case.expected_file:
+        compiled["expected_file"] = case.expected_file
+    else:
+        compiled["expected"] = case.expected_output or ""
+    return compiled
+
+
+def _compile_question(question: Question, cases) -> Mapping:
+    compiled = {
+        "name": question.title,
+        "points": question.points,
+        "compare": question.compare_mode or "exact",
+        "test_cases": tuple(MappingProxyType(_compile_case(case)) for case in cases),
+    }
+    if question.time_limit_seconds:
+        compiled["time_limit"] = question.time_limit_seconds
+    return MappingProxyType(compiled)
+
+
+class TestCaseStore:
+    """
+    The judge's source of truth for test cases: the `test_cases` table,
+    compiled into a TestCaseSnapshot that is only rebuilt when admin CRUD
+    invalidates a question. The in-process judge reads the snapshot
+    directly; judge nodes get the question's compiled cases, and the
+    snapshot version, with every /run.
+
+    With several API workers, invalidations are also published on the
+    "test_cases" channel; a worker that sees someone else's rebuilds its
+    whole snapshot on the next call. Writers outside the app (the
+    test_cases_sync.py and calibrate.py CLIs) call touch() instead, which
+    bumps the "test_cases" row of `data_versions` in their own transaction;
+    every snapshot() reads that row, so their changes show up on the next
+    judgement whatever SHARED_STATE_URL says.
+    """
+
+    def __init__(self, shared: SharedState = shared_state):
+        self._snapshot: Optional[TestCaseSnapshot] = None
+        self._stale = set()  # primary keys of questions to recompile
+        self._version = 0
+        self._lock = threading.Lock()
+        self.shared = shared
+        self._seen = None  # last "test_cases" channel version this worker has caught up with
+        self._seen_db = None  # last data_versions "test_cases" row this worker has caught up with
+
+    def invalidate(self, question_pk: Optional[int] = None):
+        """Mark one question (or, with no argument, everything) for recompilation."""
+        with self._lock:
+            if question_pk is None:
+                self._snapshot = None
+            else:
+                self._stale.add(question_pk)
+            if self.shared.distributed:
+                published = self.shared.publish("test_cases")
+                if self._seen == published - 1:
+                    self._seen = published  # only our own change: the partial rebuild covers it
+
+    def touch(self, db: Session):
+        """
+        Bump the DB-side version in the caller's transaction. For code that
+        changes test cases, compare modes or time limits from another
+        process; commit, then invalidate() as usual.
+        """
+        bumped = db.query(DataVersion).filter(DataVersion.name == "test_cases").update(
+            {DataVersion.version: DataVersion.version + 1}, synchronize_session=False
+        )
+        if not bumped:
+            db.add(DataVersion(name="test_cases", version=1))
+
+    def _catch_up(self, db: Session):
+        """Drop the snapshot if another worker or process has changed anything since we built it."""
+        published = self.shared.version("test_cases") if self.shared.distributed else None
+        # a column query, so it's never answered from the session's identity map
+        touched = db.query(DataVersion.version).filter(DataVersion.name == "test_cases").scalar() or 0
+        if published != self._seen or touched != self._seen_db:
+            with self._lock:
+                if self._seen_db is not None:
+                    self._snapshot = None
+                self._seen, self._seen_db = published, touched
+
+    def snapshot(self, db: Session) -> TestCaseSnapshot:
+        self._catch_up(db)
+        return self._current(db)
+
+    async def snapshot_async(self, db: Session) -> TestCaseSnapshot:
+        """snapshot() for the event loop: the version checks and any rebuild run in the threadpool."""
+        return await run_in_threadpool(self.snapshot, db)
+
+    def _current(self, db: Session) -> TestCaseSnapshot:
+        snapshot = self._snapshot
+        if snapshot is not None and not self._stale:
+            return snapshot
+        with self._lock:
+            if self._snapshot is None:
+                self._stale.clear()
+                self._version += 1
+                self._snapshot = self._build(db, self._version)
+            elif self._stale:
+                stale, self._stale = self._stale, set()
+                self._version += 1
+                self._snapshot = self._rebuild(db, self._snapshot, stale, self._version)
+            return self._snapshot
+
+    def _cases_by_question(self, db: Session, question_pks=None) -> Dict[int, list]:
+        query = db.query(TestCase).filter(TestCase.is_active == True)
+        if question_pks is not None:
+            query = query.filter(TestCase.question_id.in_(question_pks))
+        grouped: Dict[int, list] = {}
+        for case in query.order_by(TestCase.question_id, TestCase.id).all():
+            grouped.setdefault(case.question_id, []).append(case)
+        return grouped
+
+    def _build(self, db: Session, version: int) -> TestCaseSnapshot:
+        grouped = self._cases_by_question(db)
+        questions = db.query(Question).all()
+        compiled, keys = {}, {}
+        for q in questions:
+            if q.id in grouped:
+                keys[q.id] = q.question_id.upper()
+                compiled[keys[q.id]] = _compile_question(q, grouped[q.id])
+        logger.info(f"Compiled test case snapshot v{version}: {len(compiled)} questions")
+        return TestCaseSnapshot(version, compiled, keys)
+
+    def _rebuild(self, db: Session, current: TestCaseSnapshot, question_pks: set, version: int) -> TestCaseSnapshot:
+        # question_id strings can change on update, so drop every entry these pks used to own
+        questions = db.query(Question).filter(Question.id.in_(question_pks)).all()
+        grouped = self._cases_by_question(db, question_pks)
+        compiled, keys = dict(current.questions), dict(current._keys)
+        for pk in question_pks:
+            if pk in keys:
+                compiled.pop(keys.pop(pk), None)
+        for q in questions:
+            if q.id in grouped:
+                keys[q.id] = q.question_id.upper()
+                compiled[keys[q.id]] = _compile_question(q, grouped[q.id])
+        logger.info(f"Recompiled test case snapshot v{version}: questions {sorted(question_pks)}")
+        return TestCaseSnapshot(version, compiled, keys)
+
+    def export_json(self, db: Session) -> dict:
+        """Dump the current test cases in the test_cases.json format."""
+        exported = {}
+        for question_id, question in sorted(self.snapshot(db).questions.items()):
+            entry = {
+                "name": question["name"],
+                "points": question["points"],
+                "test_cases": [dict(case) for case in question["test_cases"]],
+            }
+            if question["compare"] != "exact":
+                entry["compare"] = question["compare"]
+            if "time_limit" in question:
+                entry["time_limit"] = question["time_limit"]
+            exported[question_id] = entry
+        return exported
+
+    def import_json(self, db: Session, data: dict) -> dict:
+        """
+        Replace the test cases of every question listed in `data`
+        (test_cases.json format). Questions must already exist.
+
+        Returns:
+            dict: {"imported": [...], "missing": [...]}
+        """
+        imported, missing = [], []
+        for question_id, entry in data.items():
+            if "compare" in entry and entry["compare"] not in comparator.MODES:
+                raise ValueError(
+                    f"{question_id}: unknown compare mode {entry['compare']!r} "
+                    f"(expected one of {', '.join(comparator.MODES)})"
+                )
+            question = db.query(Question).filter(Question.question_id == question_id.upper()).first()
+            if not question:
+                missing.append(question_id)
+                continue
+            db.query(TestCase).filter(TestCase.question_id == question.id).delete(synchronize_session=False)
+            for case in entry.get("test_cases", []):
+                if "expected" not in case and "expected_file" not in case:
+                    raise KeyError(f"{question_id}: test case without 'expected' or 'expected_file'")
+                db.add(TestCase(
+                    question_id=question.id,
+                    input_data=case.get("input", ""),
+                    expected_output=case.get("expected", ""),
+                    input_file=case.get("input_file"),
+                    expected_file=case.get("expected_file"),
+                ))
+            if "compare" in entry:
+                question.compare_mode = entry["compare"]
+            if "time_limit" in entry:
+                question.time_limit_seconds = entry["time_limit"]
+            imported.append(question_id)
+        self.touch(db)
+        db.commit()
+        self.invalidate()
+        return {"imported": imported, "missing": missing}
+
+    def import_file(self, db: Session, path: str) -> dict:
+        with open(path, "r") as f:
+            return self.import_json(db, json.load(f))
+
+    def export_file(self, db: Session, path: str) -> int:
+        exported = self.export_json(db)
+        with open(path, "w") as f:
+            json.dump(exported, f, indent=4)
+        return len(exported)
+
+# Singleton instance
+test_case_store = TestCaseStore()
@@ -0,0 +1,123 @@
+import hashlib
+import os
+import uuid
+
+from fastapi import UploadFile
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+
+from ..config import UPLOAD_DIR, MAX_UPLOAD_BYTES, UPLOAD_CHUNK_SIZE
+
+
+# multipart boundaries and part headers around the file itself
+MULTIPART_OVERHEAD_BYTES = 16 * 1024
+
+
+class UploadTooLargeError(Exception):
+    """Raised when an upload exceeds MAX_UPLOAD_BYTES."""
+
+
+def _write_chunk(handle, chunk: bytes):
+    handle.write(chunk)
+
+
+def _finish(handle):
+    handle.flush()
+    os.fsync(handle.fileno())
+    handle.close()
+
+
+def _discard(handle, path: str):
+    handle.close()
+    if os.path.exists(path):
+        os.unlink(path)
+
+
+def _commit(temp_path: str, final_path: str) -> bool:
+    """Atomically move the temp file into place; returns False if it was a duplicate."""
+    if os.path.exists(final_path):
+        os.unlink(temp_path)
+        return False
+    os.replace(temp_path, final_path)
+    return True
+
+
+async def save_upload(upload: UploadFile, extension: str = ".homie", max_bytes: int = MAX_UPLOAD_BYTES) -> dict:
+    """
+    Stream an upload to disk in chunks, hashing it on the way.
+
+    The file is written to a temp name in UPLOAD_DIR and atomically renamed to
+    `<sha256><extension>`, so identical uploads share a single stored file.
+    Disk I/O runs in the threadpool to keep the event loop free.
+
+    Returns:
+        dict: {"file_path", "sha256", "size", "deduplicated"}
+
+    Raises:
+        UploadTooLargeError: If the upload is bigger than max_bytes
+    """
+    # Starlette already knows the size of spooled uploads - reject early when it can
+    if upload.size is not None and upload.size > max_bytes:
+        raise UploadTooLargeError(f"File exceeds the {max_bytes} byte limit")
+
+    temp_path = os.path.join(UPLOAD_DIR, f".{uuid.uuid4().hex}.part")
+    handle = await run_in_threadpool(open, temp_path, "wb")
+    hasher = hashlib.sha256()
+    size = 0
+
+    try:
+        while True:
+            chunk = await upload.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadTooLargeError(f"File exceeds the {max_bytes} byte limit")
+            hasher.update(chunk)
+            await run_in_threadpool(_write_chunk, handle, chunk)
+        await run_in_threadpool(_finish, handle)
+    except BaseException:
+        await run_in_threadpool(_discard, handle, temp_path)
+        raise
+
+    digest = hasher.hexdigest()
+    final_path = os.path.join(UPLOAD_DIR, f"{digest}{extension}")
+    created = await run_in_threadpool(_commit, temp_path, final_path)
+
+    return {
+        "file_path": final_path,
+        "sha256": digest,
+        "size": size,
+        "deduplicated": not created,
+    }
+
+
+class UploadSizeLimitMiddleware:
+    """
+    Pure ASGI. save_upload's cap only applies once Starlette has received
+    and spooled the whole multipart body, so it bounds memory but not disk
+    or time. This turns away upload requests whose Content-Length is
+    already over the limit before any of the body is read. Chunked
+    requests, which have no Content-Length, still rely on save_upload.
+    """
+
+    def __init__(self, app, path_prefix: str = "/api/challenge/upload/",
+                 max_bytes: int = MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES):
+        self.app = app
+        self.path_prefix = path_prefix
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"].startswith(self.path_prefix):
+            declared = dict(scope.get("headers", ())).get(b"content-length", b"")
+            if declared.isdigit() and int(declared) > self.max_bytes:
+                response = JSONResponse(
+                    status_code=413, content={"detail": f"File exceeds the {MAX_UPLOAD_BYTES} byte limit"}
+                )
+                return await response(scope, receive, send)
+        await self.app(scope, receive, send)
+
+
+def ensure_upload_dir():
+    """Called once at startup (the app's lifespan), not on import."""
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
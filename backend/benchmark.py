@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+times the judge so we stop tuning it blind.
+
+every benchmarked question gets four submissions - correct, wrong answer,
+time limit (infinite loop) and runtime error - and each one is judged in
+every mode:
+
+    serial / parallel      test_submission(workers=1) vs workers=--workers
+    full / fail-fast       every case vs stopping at the first failure
+    cold / warm            a fresh `python test_runner.py` per submission vs
+                           a judge_pool.JudgePool that's already up
+
+on top of that every case is timed on its own. you get median / p95 /
+throughput for cases, submissions and whole questions as json, and with
+--baseline it compares against an earlier run and exits 1 if anything got
+slower than --threshold.
+
+test cases come from test_cases.json (that's what the pool workers and the
+cold runner read too). correct submissions are the built-in references
+below plus whatever --solutions has; questions without one skip "correct".
+
+usage:
+    python benchmark.py                                   # E01, M02, H01
+    python benchmark.py --questions E01,E03 --repeat 5 --json before.json
+    python benchmark.py --json after.json --baseline before.json --threshold 0.15
+"""
+
+import argparse
+import asyncio
+import copy
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+import comparator
+from test_runner import judge_case, load_test_cases, scratch_source, test_submission
+
+# known-good answers so a fresh checkout has something correct to time
+REFERENCES = {
+    "E01": "sup {\nvar a = int(listen());\nvar b = int(listen());\nspit(a + b);\n}\n",
+    "E03": "sup {\nvar a = int(listen());\nvar b = int(listen());\nfr (a > b) { spit(a); } nah { spit(b); }\n}\n",
+    "M02": (
+        "sup {\nvar n = int(listen());\nvar f = 1;\nvar i = 2;\n"
+        "hold_up (i <= n) { f = f * i; i = i + 1; }\nspit(f);\n}\n"
+    ),
+    "H01": (
+        "sup {\nvar n = int(listen());\nvar k = 2;\nvar prime = n > 1;\n"
+        "hold_up (k * k <= n) { fr (n % k == 0) { prime = cap; } k = k + 1; }\n"
+        "fr (prime) { spit(\"Prime\"); } nah { spit(\"Not Prime\"); }\n}\n"
+    ),
+}
+
+# the same for every question. the judge doesn't care what you meant.
+WRONG_CODE = "sup {\nspit(\"nope\");\n}\n"
+TLE_CODE = "sup {\nhold_up (no_cap) {\nvar x = 1;\n}\n}\n"
+RE_CODE = "sup {\nspit(ghosted);\n}\n"
+
+KINDS = ("correct", "wrong", "tle", "re")
+# a tle is just --time-limit per case; timing it cold/warm would only time the limit
+POOL_KINDS = ("correct", "wrong", "re")
+
+
+def percentile(samples: list, q: float) -> float:
+    """nearest-rank, same as calibrate.py."""
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+
+def summarize(samples: list, units: int, unit: str) -> dict:
+    """samples are seconds per run, each run doing `units` of work."""
+    median = statistics.median(samples)
+    return {
+        "runs": len(samples),
+        "median_s": round(median, 5),
+        "p95_s": round(percentile(samples, 0.95), 5),
+        "min_s": round(min(samples), 5),
+        "throughput": round(units / median, 2) if median else None,
+        "unit": unit,
+    }
+
+
+def load_submissions(question_ids: list, solutions_dir: str = None) -> dict:
+    """question_id -> {kind: code}."""
+    references = dict(REFERENCES)
+    if solutions_dir:
+        references.update({p.stem.upper(): p.read_text() for p in Path(solutions_dir).glob("*.homie")})
+    submissions = {}
+    for question_id in question_ids:
+        kinds = {"wrong": WRONG_CODE, "tle": TLE_CODE, "re": RE_CODE}
+        if question_id in references:
+            kinds["correct"] = references[question_id]
+        submissions[question_id] = {kind: kinds[kind] for kind in KINDS if kind in kinds}
+    return submissions
+
+
+def timed(fn, *args, **kwargs):
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return time.perf_counter() - started, result
+
+
+# ----- the benchmarks -----
+
+def bench_cases(test_cases: dict, submissions: dict, repeat: int) -> dict:
+    """every case on its own: one sandboxed run plus the comparison."""
+    samples = {kind: [] for kind in KINDS}
+    for question_id, kinds in submissions.items():
+        question = test_cases[question_id]
+        mode = question.get("compare", comparator.EXACT)
+        for kind, code in kinds.items():
+            with scratch_source(code) as source_path:
+                for case in question["test_cases"]:
+                    for _ in range(repeat):
+                        seconds, _ = timed(judge_case, source_path, case, mode, question["time_limit"])
+                        samples[kind].append(seconds)
+    return {f"case/{kind}": summarize(s, 1, "cases/s") for kind, s in samples.items() if s}
+
+
+def bench_submissions(test_cases: dict, submissions: dict, repeat: int, workers: int) -> dict:
+    """
+    test_submission in all four serial/parallel x full/fail-fast combos.
+    also checks every verdict, a benchmark of a broken judge is worthless.
+    """
+    modes = {
+        "serial-full": {"workers": 1, "fail_fast": False},
+        "serial-failfast": {"workers": 1, "fail_fast": True},
+        "parallel-full": {"workers": workers, "fail_fast": False},
+        "parallel-failfast": {"workers": workers, "fail_fast": True},
+    }
+    results = {}
+    per_question = {}
+    for question_id, kinds in submissions.items():
+        cases = len(test_cases[question_id]["test_cases"])
+        tier = question_id[0]
+        for mode, options in modes.items():
+            question_seconds = []
+            for _ in range(repeat):
+                total = 0.0
+                for kind, code in kinds.items():
+                    seconds, verdict = timed(test_submission, question_id, code, test_cases, **options)
+                    if (verdict["status"] == "PASS") != (kind == "correct"):
+                        raise SystemExit(f"{question_id} {kind} came back {verdict['status']}, fix the judge first")
+                    results.setdefault(f"submission/{tier}/{kind}/{mode}", []).append(seconds)
+                    total += seconds
+                question_seconds.append(total)
+            per_question[f"question/{question_id}/{mode}"] = summarize(
+                question_seconds, cases * len(kinds), "cases/s"
+            )
+    report = {name: summarize(s, 1, "submissions/s") for name, s in sorted(results.items())}
+    report.update(per_question)
+    return report
+
+
+def bench_cold(submissions: dict, repeat: int) -> dict:
+    """a brand new interpreter per submission: python startup + imports + json + judging."""
+    samples = []
+    for question_id, kinds in submissions.items():
+        for kind in POOL_KINDS:
+            if kind not in kinds:
+                continue
+            for _ in range(repeat):
+                seconds, _ = timed(
+                    subprocess.run,
+                    [sys.executable, str(BACKEND_DIR / "test_runner.py"), question_id, "--stdin"],
+                    input=kinds[kind], capture_output=True, text=True, cwd=BACKEND_DIR,
+                )
+                samples.append(seconds)
+    return {"submission/cold": summarize(samples, 1, "submissions/s")}
+
+
+async def bench_warm(submissions: dict, repeat: int, workers: int) -> dict:
+    """the same submissions through a JudgePool that's already running, one at a time and then all at once."""
+    from judge_pool import JudgePool
+
+    jobs = [
+        (question_id, kinds[kind])
+        for question_id, kinds in submissions.items()
+        for kind in POOL_KINDS if kind in kinds
+    ]
+    pool = JudgePool(workers=workers, queue_max=len(jobs) * repeat + 1)
+    started = time.perf_counter()
+    pool.start()
+    await pool.submit(*jobs[0])  # the first one pays for spawning the workers
+    spawn = time.perf_counter() - started
+    try:
+        samples = []
+        for _ in range(repeat):
+            for job in jobs:
+                job_started = time.perf_counter()
+                await pool.submit(*job)
+                samples.append(time.perf_counter() - job_started)
+
+        batch_started = time.perf_counter()
+        await asyncio.gather(*(pool.submit(*job) for job in jobs * repeat))
+        batch = time.perf_counter() - batch_started
+    finally:
+        await pool.drain(timeout=10)
+
+    return {
+        "pool/startup": summarize([spawn], 1, "pools/s"),
+        "submission/warm": summarize(samples, 1, "submissions/s"),
+        "pool/batch": summarize([batch], len(jobs) * repeat, "submissions/s"),
+    }
+
+
+# ----- regressions -----
+
+def compare(current: dict, baseline: dict, threshold: float) -> list:
+    """names of benchmarks whose median got more than `threshold` slower than the baseline."""
+    regressions = []
+    for name, result in current["results"].items():
+        before = baseline.get("results", {}).get(name)
+        if not before or not before["median_s"]:
+            continue
+        change = result["median_s"] / before["median_s"] - 1
+        result["vs_baseline"] = round(change, 4)
+        if change > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def print_report(report: dict, regressions: list):
+    print(f"\n{'benchmark':<40}{'runs':>6}{'median':>10}{'p95':>10}{'throughput':>13}  {'vs base':>8}")
+    for name, r in report["results"].items():
+        change = f"{r['vs_baseline']:+.1%}" if "vs_baseline" in r else ""
+        flag = "  <-- slower" if name in regressions else ""
+        print(f"{name:<40}{r['runs']:>6}{r['median_s'] * 1000:>9.1f}ms{r['p95_s'] * 1000:>8.1f}ms"
+              f"{r['throughput']:>8} {r['unit'].split('/')[0][:4]}/s  {change:>8}{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the judge (test_runner / judge_pool)")
+    parser.add_argument("--questions", default="E01,M02,H01", help="comma-separated question ids")
+    parser.add_argument("--solutions", help="directory of <QUESTION_ID>.homie correct submissions")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement")
+    parser.add_argument("--workers", type=int, default=max(2, os.cpu_count() or 1),
+                        help="parallel cases per submission, and pool workers")
+    parser.add_argument("--time-limit", type=float, default=0.5,
+                        help="per-case limit while benchmarking (it's what every tle costs)")
+    parser.add_argument("--skip-pool", action="store_true", help="skip the cold vs warm comparison")
+    parser.add_argument("--json", help="write the results here")
+    parser.add_argument("--baseline", help="earlier --json output to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="fail when a median is this much slower than the baseline (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    test_cases = copy.deepcopy(load_test_cases())
+    question_ids = [q.strip().upper() for q in args.questions.split(",") if q.strip()]
+    unknown = [q for q in question_ids if q not in test_cases]
+    if unknown:
+        raise SystemExit(f"no test cases for {', '.join(unknown)}")
+    for question_id in question_ids:
+        test_cases[question_id]["time_limit"] = args.time_limit
+    submissions = load_submissions(question_ids, args.solutions)
+    missing = [q for q in question_ids if "correct" not in submissions[q]]
+    if missing:
+        print(f"no correct submission for {', '.join(missing)}, timing the failures only")
+
+    started = time.perf_counter()
+    results = {}
+    print("timing cases...")
+    results.update(bench_cases(test_cases, submissions, args.repeat))
+    print("timing submissions (serial/parallel x full/fail-fast)...")
+    results.update(bench_submissions(test_cases, submissions, args.repeat, args.workers))
+    if not args.skip_pool:
+        print("timing cold runner vs warm pool...")
+        results.update(bench_cold(submissions, args.repeat))
+        results.update(asyncio.run(bench_warm(submissions, args.repeat, args.workers)))
+
+    report = {
+        "meta": {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "questions": question_ids,
+            "repeat": args.repeat,
+            "workers": args.workers,
+            "time_limit": args.time_limit,
+            "wall_seconds": round(time.perf_counter() - started, 2),
+        },
+        "results": results,
+    }
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        report["regressions"] = regressions
+        report["threshold"] = args.threshold
+    print_report(report, regressions)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nwrote {args.json}")
+
+    if regressions:
+        print(f"\n{len(regressions)} benchmark(s) more than {args.threshold:.0%} slower than {args.baseline}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Blob Store Maintenance for BroCode
+Garbage-collects unreferenced blobs and compresses cold code revisions.
+
+Usage:
+    python blob_maintenance.py gc [--grace-minutes 10]
+    python blob_maintenance.py compress [--older-than-minutes 60]
+"""
+
+import argparse
+import os
+import sys
+from datetime import timedelta
+
+# Add the current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.database import SessionLocal
+from app.services.blob_store import blob_store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="BroCode blob store maintenance")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    gc = sub.add_parser("gc", help="delete unreferenced blobs")
+    gc.add_argument("--grace-minutes", type=int, default=10)
+
+    compress = sub.add_parser("compress", help="zlib-compress cold inline blobs")
+    compress.add_argument("--older-than-minutes", type=int, default=60)
+
+    args = parser.parse_args()
+    db = SessionLocal()
+    try:
+        if args.command == "gc":
+            removed = blob_store.collect_garbage(db, grace=timedelta(minutes=args.grace_minutes))
+            print(f"🧹 Removed {removed} unreferenced blobs")
+        else:
+            packed = blob_store.compress_cold(db, older_than=timedelta(minutes=args.older_than_minutes))
+            print(f"📦 Compressed {packed} cold blobs")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
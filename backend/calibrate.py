@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+times the reference solutions and hands every question its own time limit.
+
+each reference solution runs against its question's test cases a few times;
+the p95 runtime times a multiplier (never below a floor) becomes the
+question's time limit, which test_runner then uses instead of the flat 5 seconds.
+
+test cases come from the database and the limits go back into
+questions.time_limit_seconds; --json uses test_cases.json for both instead.
+
+usage:
+    python calibrate.py                         # reference solutions and test cases from the DB
+    python calibrate.py --json                  # read and write test_cases.json instead
+    python calibrate.py --solutions refs/       # refs/E01.homie, refs/M04.homie, ...
+    python calibrate.py --questions E01,H10 --runs 10 --dry-run
+"""
+
+import argparse
+import dataclasses
+import json
+import math
+import os
+import sys
+from pathlib import Path
+
+import comparator
+import sandbox
+from test_runner import TEST_CASES_FILE, DEFAULT_TIMEOUT, case_data, load_test_cases, scratch_source
+
+# the reference gets this long per case while we measure it. it's the reference, it better be fast.
+CALIBRATION_TIMEOUT = 15
+
+
+def p95(samples: list) -> float:
+    """nearest-rank p95. no numpy for one percentile."""
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(0.95 * len(ordered)) - 1)]
+
+
+def _db_session():
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from app.database import SessionLocal
+    return SessionLocal()
+
+
+def load_reference_solutions(solutions_dir: str = None) -> dict:
+    """question_id -> reference code, from a directory of .homie files or the questions table."""
+    if solutions_dir:
+        return {
+            path.stem.upper(): path.read_text()
+            for path in Path(solutions_dir).glob("*.homie")
+        }
+
+    from app.models import Question
+
+    db = _db_session()
+    try:
+        rows = db.query(Question.question_id, Question.reference_solution).filter(
+            Question.reference_solution.isnot(None)
+        ).all()
+        return {qid.upper(): code for qid, code in rows if code and code.strip()}
+    finally:
+        db.close()
+
+
+def load_db_test_cases() -> dict:
+    """the judge's own view of the test cases, as plain dicts we can scribble limits on."""
+    from app.services.test_case_store import test_case_store
+
+    db = _db_session()
+    try:
+        return test_case_store.export_json(db)
+    finally:
+        db.close()
+
+
+def save_db_limits(limits: dict):
+    """question_id -> seconds, into questions.time_limit_seconds. a running server sees them on its next judgement."""
+    from app.models import Question
+    from app.services.question_catalog import question_catalog
+    from app.services.test_case_store import test_case_store
+
+    db = _db_session()
+    try:
+        for question_id, limit in limits.items():
+            db.query(Question).filter(Question.question_id == question_id).update(
+                {Question.time_limit_seconds: limit}
+            )
+        test_case_store.touch(db)
+        db.commit()
+    finally:
+        db.close()
+    test_case_store.invalidate()
+    question_catalog.invalidate()
+
+
+def measure(code: str, question: dict, runs: int) -> list:
+    """
+    runs the reference on every case `runs` times and returns the wall times.
+    raises ValueError if the reference itself gets a case wrong.
+    """
+    mode = question.get("compare", comparator.EXACT)
+    samples = []
+    with scratch_source(code) as source_path:
+        for i, case in enumerate(question["test_cases"]):
+            with case_data(case) as (input_data, expected_data):
+                for _ in range(runs):
+                    checker = comparator.make_comparator(expected_data, mode)
+                    limits = dataclasses.replace(
+                        sandbox.DEFAULT_LIMITS,
+                        output_bytes=max(sandbox.DEFAULT_LIMITS.output_bytes, checker.limit),
+                    )
+                    run = sandbox.execute(
+                        ["brocode", source_path],
+                        input_data,
+                        timeout=CALIBRATION_TIMEOUT,
+                        limits=limits,
+                        on_stdout=checker.feed,
+                        keep_stdout=0,
+                    )
+                    if run.verdict or not checker.finish():
+                        raise ValueError(f"reference fails case {i + 1} ({run.verdict or sandbox.WRONG_ANSWER})")
+                    samples.append(run.elapsed)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibrate per-question time limits from reference solutions")
+    parser.add_argument("--solutions", help="directory of <QUESTION_ID>.homie reference solutions (default: DB)")
+    parser.add_argument("--questions", help="comma-separated question ids (default: all with a reference)")
+    parser.add_argument("--runs", type=int, default=5, help="runs per test case")
+    parser.add_argument("--multiplier", type=float, default=3.0, help="limit = p95 * multiplier")
+    parser.add_argument("--floor", type=float, default=1.0, help="minimum limit in seconds")
+    parser.add_argument("--ceiling", type=float, default=10.0, help="maximum limit in seconds")
+    parser.add_argument("--json", action="store_true", help=f"use {TEST_CASES_FILE.name} instead of the database")
+    parser.add_argument("--dry-run", action="store_true", help="print the limits without writing them anywhere")
+    args = parser.parse_args()
+
+    test_cases = load_test_cases() if args.json else load_db_test_cases()
+    source = TEST_CASES_FILE.name if args.json else "the database"
+    references = load_reference_solutions(args.solutions)
+    wanted = [q.strip().upper() for q in args.questions.split(",")] if args.questions else sorted(references)
+
+    print(f"{'question':<10}{'cases':>6}{'p95 (s)':>10}{'limit (s)':>11}")
+    for question_id in wanted:
+        if question_id not in test_cases:
+            print(f"{question_id:<10} no test cases in {source}, skipped")
+            continue
+        if question_id not in references:
+            print(f"{question_id:<10} no reference solution, keeps {test_cases[question_id].get('time_limit', DEFAULT_TIMEOUT)}s")
+            continue
+
+        question = test_cases[question_id]
+        try:
+            samples = measure(references[question_id], question, args.runs)
+        except ValueError as e:
+            print(f"{question_id:<10} {e}, skipped")
+            continue
+
+        reference_p95 = p95(samples)
+        limit = min(args.ceiling, max(args.floor, reference_p95 * args.multiplier))
+        question["reference_p95"] = round(reference_p95, 4)
+        question["time_limit"] = round(limit, 2)
+        print(f"{question_id:<10}{len(question['test_cases']):>6}{reference_p95:>10.3f}{limit:>11.2f}")
+
+    if args.dry_run:
+        print("\ndry run, nothing written")
+        return
+
+    if args.json:
+        with open(TEST_CASES_FILE, "w") as f:
+            json.dump(test_cases, f, indent=4)
+    else:
+        save_db_limits({
+            question_id: question["time_limit"]
+            for question_id, question in test_cases.items()
+            if "reference_p95" in question
+        })
+    print(f"\nwrote limits to {source}")
+
+
+if __name__ == "__main__":
+    main()
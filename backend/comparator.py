@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+compares your output to the answer while it's still being printed.
+the moment it's wrong, we stop listening.
+
+modes (set "compare" on a question in test_cases.json):
+    exact     - whole output must match, ignoring leading/trailing whitespace (default)
+    trailing  - line by line, trailing spaces and trailing blank lines don't count
+    tokens    - whitespace-separated tokens must match, spacing doesn't matter at all
+
+expected can be bytes or anything bytes-like with find() (an mmap works),
+it's only ever sliced a chunk at a time.
+"""
+
+import re
+
+EXACT = "exact"
+TRAILING = "trailing"
+TOKENS = "tokens"
+MODES = (EXACT, TRAILING, TOKENS)
+
+# how much more than the expected output we tolerate before calling it
+DEFAULT_SLACK = 4096
+
+WHITESPACE = b" \t\n\r\x0b\x0c"
+_TOKEN = re.compile(rb"\S+")
+_NON_SPACE = re.compile(rb"\S")
+
+
+class Comparator:
+    """feed() it chunks, then finish(). either returning False means wrong answer."""
+
+    def __init__(self, expected, slack: int = DEFAULT_SLACK):
+        self.expected = expected
+        self.limit = len(expected) + slack
+        self.seen = 0
+        self.ok = True
+
+    def feed(self, chunk: bytes) -> bool:
+        if not self.ok:
+            return False
+        self.seen += len(chunk)
+        if self.seen > self.limit:
+            # way more output than the answer. not reading the rest.
+            self.ok = False
+            return False
+        self.ok = self._feed(chunk)
+        return self.ok
+
+    def finish(self) -> bool:
+        if self.ok:
+            self.ok = self._finish()
+        return self.ok
+
+    def _feed(self, chunk: bytes) -> bool:
+        raise NotImplementedError
+
+    def _finish(self) -> bool:
+        raise NotImplementedError
+
+
+class ExactComparator(Comparator):
+    """the original rule: output.strip() == expected.strip(), just incremental."""
+
+    def __init__(self, expected, slack: int = DEFAULT_SLACK):
+        super().__init__(expected, slack)
+        first = _NON_SPACE.search(expected)
+        self.pos = first.start() if first else len(expected)
+        end = len(expected)
+        while end > self.pos and expected[end - 1] in WHITESPACE:
+            end -= 1
+        self.end = end
+        self.started = False
+
+    def _feed(self, chunk: bytes) -> bool:
+        if not self.started:
+            chunk = chunk.lstrip(WHITESPACE)
+            if not chunk:
+                return True
+            self.started = True
+        take = min(len(chunk), self.end - self.pos)
+        if take and chunk[:take] != self.expected[self.pos:self.pos + take]:
+            return False
+        self.pos += take
+        # past the end of the answer, only whitespace is allowed
+        return not chunk[take:].strip(WHITESPACE)
+
+    def _finish(self) -> bool:
+        return self.pos == self.end
+
+
+class TrailingComparator(Comparator):
+    """line by line, with trailing whitespace on each line (and at the end) ignored."""
+
+    def __init__(self, expected, slack: int = DEFAULT_SLACK):
+        super().__init__(expected, slack)
+        self.pending = b""
+        self.exp_pos = 0
+        self.exp_len = len(expected)
+        while self.exp_len and expected[self.exp_len - 1] in WHITESPACE:
+            self.exp_len -= 1
+
+    def _next_expected_line(self):
+        if self.exp_pos >= self.exp_len:
+            return None
+        newline = self.expected.find(b"\n", self.exp_pos, self.exp_len)
+        end = self.exp_len if newline == -1 else newline
+        line = self.expected[self.exp_pos:end]
+        self.exp_pos = end + 1
+        return bytes(line).rstrip(WHITESPACE)
+
+    def _check_line(self, line: bytes) -> bool:
+        line = line.rstrip(WHITESPACE)
+        expected = self._next_expected_line()
+        if expected is None:
+            return not line  # blank lines after the answer are fine
+        return line == expected
+
+    def _feed(self, chunk: bytes) -> bool:
+        lines = (self.pending + chunk).split(b"\n")
+        self.pending = lines.pop()
+        return all(self._check_line(line) for line in lines)
+
+    def _finish(self) -> bool:
+        if self.pending and not self._check_line(self.pending):
+            return False
+        return self.exp_pos >= self.exp_len
+
+
+class TokenComparator(Comparator):
+    """only the tokens matter. spaces, newlines, tabs - all the same to us."""
+
+    def __init__(self, expected, slack: int = DEFAULT_SLACK):
+        super().__init__(expected, slack)
+        self.exp_pos = 0
+        self.pending = b""
+
+    def _next_expected_token(self):
+        # one search per token, not a finditer: a half-consumed iterator holds a
+        # buffer export on the expected mmap, and then nobody can close it
+        match = _TOKEN.search(self.expected, self.exp_pos)
+        if match is None:
+            return None
+        self.exp_pos = match.end()
+        return match.group()
+
+    def _check_token(self, token: bytes) -> bool:
+        return self._next_expected_token() == token
+
+    def _feed(self, chunk: bytes) -> bool:
+        data = self.pending + chunk
+        tokens = data.split()
+        # a token touching the end of the chunk might continue in the next one
+        self.pending = tokens.pop() if tokens and data[-1:] not in WHITESPACE else b""
+        return all(self._check_token(token) for token in tokens)
+
+    def _finish(self) -> bool:
+        if self.pending and not self._check_token(self.pending):
+            return False
+        return self._next_expected_token() is None
+
+
+_COMPARATORS = {
+    EXACT: ExactComparator,
+    TRAILING: TrailingComparator,
+    TOKENS: TokenComparator,
+}
+
+
+def make_comparator(expected, mode: str = EXACT, slack: int = DEFAULT_SLACK) -> Comparator:
+    """expected: str, bytes or an mmap. mode: one of MODES."""
+    if isinstance(expected, str):
+        expected = expected.encode()
+    if mode not in _COMPARATORS:
+        raise ValueError(f"Unknown compare mode: {mode!r} (expected one of {', '.join(MODES)})")
+    return _COMPARATORS[mode](expected, slack)
@@ -13,7 +13,7 @@ from sqlalchemy import text
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from app.database import SessionLocal
-from app.models import Submission, ChallengeSession, Team
+from app.models import Submission, ChallengeSession, Team, Blob
 
 def erase_data():
     print("🧹 Starting Data Cleanup...")
@@ -30,7 +30,16 @@ def erase_data():
         num_sessions = db.query(ChallengeSession).delete()
         print(f"   ✅ Deleted {num_sessions} sessions")
 
-        # 3. Reset Team Scores
+        # 3. Delete stored code and uploads (nothing references them anymore)
+        print("   Removing stored code and uploaded files...")
+        blobs = db.query(Blob).all()
+        for blob in blobs:
+            if blob.path and os.path.exists(blob.path):
+                os.unlink(blob.path)
+            db.delete(blob)
+        print(f"   ✅ Deleted {len(blobs)} blobs")
+
+        # 4. Reset Team Scores
         print("   Resetting team scores to 0...")
         # Update all teams to score 0
         teams = db.query(Team).all()
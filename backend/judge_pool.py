@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+a pool of judge processes behind one queue. one box, all the cores.
+
+the supervisor owns N worker processes and a local backlog of jobs. it hands
+each worker at most `concurrency` jobs at a time (the worker judges them on
+threads - the real work happens in brocode child processes anyway), always
+to whoever is least busy. dead workers get replaced and their in-flight jobs
+get one more try somewhere else.
+
+every worker talks to the supervisor over its own pipe, never a shared queue:
+a worker that gets SIGKILLed mid-read can't take a shared lock down with it.
+"""
+
+import asyncio
+import collections
+import itertools
+import logging
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.connection import wait
+
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.environ.get(name)
+    return int(value) if value not in (None, "") else default
+
+
+WORKERS = _env_int("BROCODE_JUDGE_WORKERS", os.cpu_count() or 1)
+CONCURRENCY = _env_int("BROCODE_WORKER_CONCURRENCY", 2)
+# jobs allowed to wait for a slot. 0 means 4x what the workers can hold.
+QUEUE_MAX = _env_int("BROCODE_JUDGE_QUEUE_MAX", 0)
+DRAIN_SECONDS = _env_int("BROCODE_DRAIN_SECONDS", 60)
+# a job whose worker died twice under it is probably the reason. stop feeding it workers.
+MAX_JOB_ATTEMPTS = 2
+
+_ctx = multiprocessing.get_context("spawn")
+
+
+class PoolBusy(Exception):
+    """the backlog is full. come back later."""
+
+
+class PoolClosed(Exception):
+    """the pool is draining or stopped. not taking new work."""
+
+
+class WorkerCrashed(Exception):
+    """the job killed every worker it touched."""
+
+
+class JobFailed(RuntimeError):
+    """test_runner raised on the job. same job, same exception, on any node."""
+
+
+def _worker_main(conn, concurrency: int):
+    """one judge process. jobs come in on conn, results go out on conn."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # ctrl+c is the supervisor's problem
+    from test_runner import test_submission
+
+    send_lock = threading.Lock()
+
+    def run(job_id, question_id, code, queued_at, question=None):
+        queue_ms = round((time.time() - queued_at) * 1000, 3)  # same box, so wall clocks agree
+        # the backend sends the question's cases along; without them it's test_cases.json
+        test_cases = {question_id.upper(): question} if question is not None else None
+        try:
+            result = test_submission(question_id, code, test_cases=test_cases)
+            if "trace" in result:
+                result["trace"]["queue_ms"] = queue_ms
+            message = ("done", job_id, result)
+        except Exception as e:
+            message = ("failed", job_id, f"{type(e).__name__}: {e}")
+        with send_lock:
+            # our metrics ride along, the supervisor serves them on /metrics
+            conn.send(message + (REGISTRY.snapshot(),))
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        while True:
+            try:
+                job = conn.recv()
+            except EOFError:
+                break  # supervisor's gone. so are we.
+            if job is None:
+                break
+            executor.submit(run, *job)
+    # leaving the with block waits for the in-flight jobs, that's the drain
+
+
+class _Worker:
+    def __init__(self, worker_id: int, concurrency: int):
+        self.id = worker_id
+        self.conn, child_conn = _ctx.Pipe()
+        self.process = _ctx.Process(
+            target=_worker_main, args=(child_conn, concurrency),
+            name=f"judge-worker-{worker_id}", daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+        self.inflight = {}  # job_id -> job
+        self.started_at = time.time()
+        self.metrics = {}  # latest metrics.REGISTRY snapshot from the process
+
+
+class JudgePool:
+    """
+    usage:
+        pool = JudgePool()
+        pool.start()
+        result = await pool.submit("E01", code)
+        await pool.drain()
+    """
+
+    def __init__(self, workers: int = WORKERS, concurrency: int = CONCURRENCY, queue_max: int = QUEUE_MAX):
+        self.size = max(1, workers)
+        self.concurrency = max(1, concurrency)
+        self.queue_max = queue_max or self.size * self.concurrency * 4
+        self.accepting = False
+        self.restarts = 0
+        self._workers = {}  # worker_id -> _Worker
+        self._backlog = collections.deque()  # (job_id, question_id, code, queued_at, question)
+        self._pending = {}  # job_id -> [future, loop, attempts]
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._wake_recv, self._wake_send = _ctx.Pipe(duplex=False)
+        self._stopping = False
+        self._dispatcher = None
+        self._retired_metrics = {}
+
+    # ----- lifecycle -----
+
+    def start(self):
+        for worker_id in range(self.size):
+            self._workers[worker_id] = _Worker(worker_id, self.concurrency)
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, name="judge-dispatcher", daemon=True)
+        self._dispatcher.start()
+        self.accepting = True
+        logger.info(f"judge pool up: {self.size} workers x {self.concurrency} slots")
+
+    def resume(self):
+        """take jobs again after pausing (accepting = False). a stopped pool stays stopped."""
+        if self._stopping or self._dispatcher is None:
+            raise PoolClosed("judge pool is stopped")
+        self.accepting = True
+
+    async def drain(self, timeout: float = DRAIN_SECONDS):
+        """stop taking jobs, let the queued and running ones finish (up to timeout), then stop."""
+        self.accepting = False
+        deadline = time.monotonic() + timeout
+        while self.outstanding() and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        if self.outstanding():
+            logger.warning(f"judge pool drain timed out with {self.outstanding()} jobs left")
+        await asyncio.get_running_loop().run_in_executor(None, self.stop)
+
+    def stop(self):
+        """stop right now. whatever is still pending fails with PoolClosed."""
+        self.accepting = False
+        self._stopping = True
+        self._wake()
+        if self._dispatcher is not None:
+            self._dispatcher.join(timeout=5)
+        # the dispatcher is done, so nothing else is writing to the worker pipes now
+        for worker in list(self._workers.values()):
+            try:
+                worker.conn.send(None)
+            except OSError:
+                pass
+        for worker in list(self._workers.values()):
+            worker.process.join(timeout=5)
+            if worker.process.is_alive():
+                worker.process.kill()
+                worker.process.join()
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._backlog.clear()
+        for job_id in pending:
+            self._resolve(pending, job_id, error=PoolClosed("judge pool stopped"))
+
+    # ----- submitting -----
+
+    async def submit(self, question_id: str, code: str, question: dict = None) -> dict:
+        """
+        judge one submission on whichever worker frees up first. question is
+        its compiled test cases (test_cases.json shape); None reads the json.
+        raises PoolClosed while draining, PoolBusy when the backlog is full.
+        """
+        if not self.accepting:
+            raise PoolClosed("judge pool is draining")
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._lock:
+            if len(self._backlog) >= self.queue_max:
+                raise PoolBusy(f"judge queue is full ({self.queue_max} waiting)")
+            job_id = next(self._ids)
+            self._pending[job_id] = [future, loop, 0]
+            self._backlog.append((job_id, question_id, code, time.time(), question))
+        self._wake()
+        try:
+            return await future
+        finally:
+            # client went away? then nobody wants this result
+            with self._lock:
+                self._pending.pop(job_id, None)
+
+    def outstanding(self) -> int:
+        with self._lock:
+            return len(self._backlog) + sum(len(w.inflight) for w in self._workers.values())
+
+    def stats(self) -> dict:
+        with self._lock:
+            workers = [
+                {
+                    "id": w.id,
+                    "pid": w.process.pid,
+                    "alive": w.process.is_alive(),
+                    "inflight": len(w.inflight),
+                    "uptime_seconds": round(time.time() - w.started_at, 1),
+                }
+                for w in self._workers.values()
+            ]
+            return {
+                "accepting": self.accepting,
+                "workers": workers,
+                "concurrency": self.concurrency,
+                "capacity": self.size * self.concurrency,
+                "inflight": sum(w["inflight"] for w in workers),
+                "queued": len(self._backlog),
+                "queue_max": self.queue_max,
+                "restarts": self.restarts,
+            }
+
+    def metric_snapshots(self) -> list:
+        """every worker's metrics, plus whatever crashed workers had counted. for REGISTRY.render(merge=...)."""
+        with self._lock:
+            return [self._retired_metrics] + [w.metrics for w in self._workers.values()]
+
+    # ----- the dispatcher thread -----
+
+    def _wake(self):
+        try:
+            self._wake_send.send_bytes(b"")
+        except OSError:
+            pass
+
+    def _dispatch_loop(self):
+        while not self._stopping:
+            conns = {w.conn: w for w in self._workers.values()}
+            ready = wait(list(conns) + [self._wake_recv], timeout=0.5)
+            for conn in ready:
+                if conn is self._wake_recv:
+                    while self._wake_recv.poll():
+                        self._wake_recv.recv_bytes()
+                    continue
+                worker = conns[conn]
+                try:
+                    while conn.poll():
+                        self._handle_message(worker, conn.recv())
+                except (EOFError, OSError):
+                    self._handle_crash(worker)
+            if self._stopping:
+                break
+            for worker in list(self._workers.values()):
+                if not worker.process.is_alive():
+                    self._handle_crash(worker)
+            self._dispatch()
+
+    def _handle_message(self, worker: _Worker, message):
+        kind, job_id, payload, metrics = message
+        with self._lock:
+            worker.inflight.pop(job_id, None)
+            worker.metrics = metrics
+        if kind == "done":
+            self._resolve(self._pending, job_id, result=payload)
+        else:
+            self._resolve(self._pending, job_id, error=JobFailed(payload))
+
+    def _handle_crash(self, worker: _Worker):
+        if self._stopping or self._workers.get(worker.id) is not worker:
+            return
+        worker.process.join(timeout=1)
+        logger.error(f"judge worker {worker.id} (pid {worker.process.pid}) died "
+                     f"with exit code {worker.process.exitcode}, restarting")
+        worker.conn.close()
+        replacement = _Worker(worker.id, self.concurrency)
+        with self._lock:
+            retry, given_up = [], []
+            for job_id, job in worker.inflight.items():
+                entry = self._pending.get(job_id)
+                if entry is None:
+                    continue
+                entry[2] += 1
+                (retry if entry[2] < MAX_JOB_ATTEMPTS else given_up).append(job)
+            # retries go to the front, they've waited long enough
+            self._backlog.extendleft(reversed(retry))
+            self.restarts += 1
+            self._workers[worker.id] = replacement
+            # keep what the dead one counted, or the totals on /metrics would go backwards
+            self._retired_metrics = REGISTRY.combine(self._retired_metrics, worker.metrics)
+        for job_id, *_ in given_up:
+            self._resolve(self._pending, job_id, error=WorkerCrashed("judge worker crashed while running this submission"))
+
+    def _dispatch(self):
+        with self._lock:
+            while self._backlog:
+                worker = min(self._workers.values(), key=lambda w: len(w.inflight))
+                if len(worker.inflight) >= self.concurrency:
+                    return  # everyone's full
+                job = self._backlog.popleft()
+                if job[0] not in self._pending:
+                    continue  # caller gave up while it was queued
+                try:
+                    worker.conn.send(job)
+                except OSError:
+                    self._backlog.appendleft(job)
+                    return  # the crash check picks this worker up next round
+                worker.inflight[job[0]] = job
+
+    def _resolve(self, pending: dict, job_id: int, result=None, error: Exception = None):
+        entry = pending.get(job_id)
+        if entry is None:
+            return
+        future, loop, _ = entry
+
+        def settle():
+            if future.done():
+                return
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+        try:
+            loop.call_soon_threadsafe(settle)
+        except RuntimeError:
+            pass  # that event loop is closed. nobody's listening.
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+simulates a contest against the real backend and tells you how it held up.
+
+N teams log in, start the challenge, poll /status, autosave, execute and
+submit, while a few projectors keep refreshing the leaderboard. every
+request is timed per endpoint; you get throughput and p50/p95/p99 at the end.
+
+by default the app runs in-process (app.main:app over ASGI) on a throwaway
+sqlite db, judged by a stub judge with a fixed latency or by the real
+test_runner, so two runs with the same seed do the same work.
+--base-url points it at a live server instead (teams get registered there).
+
+usage:
+    python loadtest.py --teams 50
+    python loadtest.py --teams 100 --judge runner --questions 3 --json before.json
+    python loadtest.py --base-url http://192.168.1.10:8000 --teams 30
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import socket
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+PASSWORD = "loadtest"
+
+# what teams "write". the stub judge only cares which one it got;
+# test_runner actually runs them (this one is right for E01, wrong elsewhere)
+CORRECT_CODE = "sup {\nvar a = int(listen());\nvar b = int(listen());\nspit(a + b);\n}\n"
+WRONG_CODE = "sup {\nspit(0);\n}\n"
+
+
+def percentile(samples: list, q: float) -> float:
+    """nearest-rank, same as calibrate.py."""
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+
+class Recorder:
+    """latencies and status codes per endpoint."""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+
+    async def call(self, client: httpx.AsyncClient, label: str, method: str, url: str, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+            status = response.status_code
+        except httpx.HTTPError as e:
+            response, status = None, type(e).__name__
+        self.latencies[label].append(time.perf_counter() - started)
+        self.statuses[label][status] += 1
+        return response
+
+    def report(self, wall_seconds: float) -> dict:
+        endpoints = {}
+        for label, samples in sorted(self.latencies.items()):
+            statuses = self.statuses[label]
+            endpoints[label] = {
+                "count": len(samples),
+                "errors": sum(n for s, n in statuses.items() if not isinstance(s, int) or s >= 400),
+                "statuses": {str(s): n for s, n in sorted(statuses.items(), key=str)},
+                "rps": round(len(samples) / wall_seconds, 2),
+                "p50_ms": round(percentile(samples, 0.50) * 1000, 2),
+                "p95_ms": round(percentile(samples, 0.95) * 1000, 2),
+                "p99_ms": round(percentile(samples, 0.99) * 1000, 2),
+                "max_ms": round(max(samples) * 1000, 2),
+            }
+        total = sum(e["count"] for e in endpoints.values())
+        return {
+            "wall_seconds": round(wall_seconds, 3),
+            "requests": total,
+            "throughput_rps": round(total / wall_seconds, 2),
+            "endpoints": endpoints,
+        }
+
+
+# ----- the in-process setup -----
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_stub_judge(latency: float) -> str:
+    """a judge that sleeps `latency` and says 1 for CORRECT_CODE. runs on its own thread."""
+    import uvicorn
+    from fastapi import FastAPI
+    from pydantic import BaseModel
+
+    stub = FastAPI()
+
+    class RunRequest(BaseModel):
+        question_id: str
+        code_answer: str
+
+    @stub.post("/run")
+    async def run(payload: RunRequest):
+        await asyncio.sleep(latency)
+        return {"result": 1 if payload.code_answer == CORRECT_CODE else 0}
+
+    @stub.get("/health")
+    async def health():
+        return {"status": "ok"}
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(stub, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}/run"
+
+
+def setup_in_process(args):
+    """throwaway db + env, then import the real app. has to happen before anything imports app.config."""
+    workdir = tempfile.mkdtemp(prefix="brocode-loadtest-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{workdir}/loadtest.db"
+    os.environ["UPLOAD_DIR"] = os.path.join(workdir, "uploads")
+    if args.judge == "stub":
+        os.environ["DEBUG"] = "False"
+        os.environ["JUDGE_API_URLS"] = start_stub_judge(args.stub_latency)
+    else:
+        os.environ["DEBUG"] = "True"  # /execute runs test_runner in-process
+
+    sys.path.insert(0, BACKEND_DIR)
+    os.chdir(BACKEND_DIR)
+    from app.main import app
+    from app.database import SessionLocal, init_db
+    from app.models import Team
+    from app.services.upload_service import ensure_upload_dir
+    import qs
+
+    # ASGITransport never runs the lifespan, so do its startup work here
+    init_db()
+    ensure_upload_dir()
+    qs.populate_questions()
+    db = SessionLocal()
+    try:
+        # sha256 like setup_database.py; bcrypt for 100 teams would be the whole benchmark
+        password_hash = hashlib.sha256(PASSWORD.encode()).hexdigest()
+        for usn in team_usns(args):
+            db.add(Team(team_leader_usn=usn, password=password_hash, team_name=usn))
+        db.commit()
+    finally:
+        db.close()
+    print(f"in-process app on {os.environ['DATABASE_URL']} (judge: {args.judge})")
+    return httpx.ASGITransport(app=app), "http://loadtest"
+
+
+async def register_remote(args, base_url: str):
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+        for usn in team_usns(args):
+            await client.post("/api/auth/register", params={"team_leader_usn": usn, "password": PASSWORD})
+
+
+def team_usns(args) -> list:
+    return [f"{args.usn_prefix}{i:03d}" for i in range(args.teams)]
+
+
+# ----- the simulated people -----
+
+async def think(rng: random.Random, mean: float):
+    if mean > 0:
+        await asyncio.sleep(rng.expovariate(1 / mean))
+
+
+async def run_team(index: int, usn: str, args, make_client, recorder: Recorder):
+    rng = random.Random(args.seed * 100003 + index)
+    async with make_client() as client:
+        response = await recorder.call(client, "POST /api/auth/login", "POST", "/api/auth/login",
+                                       json={"team_leader_usn": usn, "password": PASSWORD})
+        if response is None or response.status_code != 200:
+            return
+        client.headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+
+        response = await recorder.call(client, "POST /api/challenge/start", "POST", "/api/challenge/start")
+        if response is None or response.status_code != 200:
+            return
+        questions = response.json()["questions"]
+        await recorder.call(client, "GET /api/challenge/status", "GET", "/api/challenge/status")
+
+        picked = rng.sample(questions, min(args.questions, len(questions)))
+        final = []
+        for question in picked:
+            qid = question["id"]
+            code = ""
+            for _ in range(args.saves):
+                await think(rng, args.think)
+                code = WRONG_CODE[:rng.randint(1, len(WRONG_CODE))]
+                await recorder.call(client, "PUT /api/challenge/submission/{id}", "PUT",
+                                    f"/api/challenge/submission/{qid}", json={"code_answer": code, "status": "saved"})
+            # one wrong execute, then most teams get it right
+            attempts = [WRONG_CODE] + ([CORRECT_CODE] if rng.random() < args.solve_rate else [])
+            for code in attempts:
+                await think(rng, args.think)
+                await recorder.call(client, "POST /api/challenge/execute/{id}", "POST",
+                                    f"/api/challenge/execute/{qid}", json={"code_answer": code})
+            final.append({"question_id": qid, "code_answer": code, "status": "saved"})
+            await recorder.call(client, "GET /api/challenge/status", "GET", "/api/challenge/status")
+
+        await think(rng, args.think)
+        await recorder.call(client, "POST /api/challenge/submit", "POST", "/api/challenge/submit",
+                            json={"submissions": final})
+
+
+async def run_projector(args, make_client, recorder: Recorder, done: asyncio.Event):
+    async with make_client() as client:
+        while not done.is_set():
+            await recorder.call(client, "GET /api/leaderboard", "GET", "/api/leaderboard")
+            try:
+                await asyncio.wait_for(done.wait(), timeout=args.projector_interval)
+            except asyncio.TimeoutError:
+                pass
+
+
+async def run(args, transport, base_url) -> dict:
+    recorder = Recorder()
+
+    def make_client():
+        return httpx.AsyncClient(transport=transport, base_url=base_url, timeout=args.timeout)
+
+    done = asyncio.Event()
+    projectors = [asyncio.create_task(run_projector(args, make_client, recorder, done)) for _ in range(args.projectors)]
+    started = time.perf_counter()
+    await asyncio.gather(*(run_team(i, usn, args, make_client, recorder) for i, usn in enumerate(team_usns(args))))
+    wall = time.perf_counter() - started
+    done.set()
+    await asyncio.gather(*projectors)
+    return recorder.report(wall)
+
+
+def print_report(report: dict):
+    print(f"\n{'endpoint':<38}{'count':>7}{'err':>6}{'rps':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}  (ms)")
+    for label, e in report["endpoints"].items():
+        print(f"{label:<38}{e['count']:>7}{e['errors']:>6}{e['rps']:>8}"
+              f"{e['p50_ms']:>9}{e['p95_ms']:>9}{e['p99_ms']:>9}{e['max_ms']:>9}")
+    print(f"\n{report['requests']} requests in {report['wall_seconds']}s = {report['throughput_rps']} req/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate a contest against the BroCode backend")
+    parser.add_argument("--teams", type=int, default=20)
+    parser.add_argument("--projectors", type=int, default=2, help="leaderboard pollers")
+    parser.add_argument("--projector-interval", type=float, default=1.0, help="seconds between leaderboard polls")
+    parser.add_argument("--questions", type=int, default=5, help="questions each team attempts")
+    parser.add_argument("--saves", type=int, default=3, help="autosaves per question")
+    parser.add_argument("--solve-rate", type=float, default=0.8, help="chance a team gets a question right")
+    parser.add_argument("--think", type=float, default=0.05, help="mean think time between actions (s)")
+    parser.add_argument("--judge", choices=["stub", "runner"], default="stub", help="in-process judge")
+    parser.add_argument("--stub-latency", type=float, default=0.2, help="stub judge seconds per execute")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--timeout", type=float, default=120, help="per-request client timeout (s)")
+    parser.add_argument("--base-url", help="drive a running server instead of the in-process app")
+    parser.add_argument("--usn-prefix", help="team USN prefix (default: LT + a run id)")
+    parser.add_argument("--json", help="write the report here")
+    args = parser.parse_args()
+    if args.json:
+        args.json = os.path.abspath(args.json)  # setup_in_process chdirs
+    if not args.usn_prefix:
+        args.usn_prefix = f"LT{int(time.time()) % 100000:05d}-" if args.base_url else "LT"
+
+    if args.base_url:
+        transport, base_url = None, args.base_url.rstrip("/")
+        asyncio.run(register_remote(args, base_url))
+    else:
+        transport, base_url = setup_in_process(args)
+
+    print(f"{args.teams} teams x {args.questions} questions, {args.projectors} projectors, seed {args.seed}")
+    report = asyncio.run(run(args, transport, base_url))
+    report["config"] = {k: v for k, v in vars(args).items() if k != "json"}
+    print_report(report)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"wrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,390 @@
+"""
+prometheus-style metrics without the prometheus_client dependency.
+
+counters, gauges and histograms that render in the text exposition format
+(`GET /metrics` on the backend and the runner). recording is a lock and a
+couple of additions, so it's fine on every request and every test case.
+
+judge pool workers are separate processes with their own copies of these.
+they ship snapshot() back with every result and the runner adds them up
+(merge), so /metrics on the runner covers the whole pool.
+"""
+
+import bisect
+import contextvars
+import threading
+import time
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SPAWN_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250)
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}  # name -> metric, in registration order
+
+    def register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"metric {metric.name} registered twice")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def snapshot(self) -> dict:
+        """counters and histograms as plain data, cheap to pickle across a pipe."""
+        return {
+            name: metric.state()
+            for name, metric in self._metrics.items()
+            if metric.kind != "gauge"
+        }
+
+    def combine(self, a: dict, b: dict) -> dict:
+        """two snapshots added together."""
+        merged = dict(a)
+        for name, state in b.items():
+            metric = self._metrics.get(name)
+            if metric is not None:
+                merged[name] = metric.combine(merged[name], state) if name in merged else state
+        return merged
+
+    def render(self, merge: list = ()) -> str:
+        """the whole registry, plus any snapshots from other processes added on top."""
+        lines = []
+        for name, metric in self._metrics.items():
+            state = metric.state()
+            for other in merge:
+                if name in other:
+                    state = metric.combine(state, other[name])
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            lines.extend(metric.render(state))
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), registry: Registry = REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children = {}  # label values -> child
+        registry.register(self)
+
+    def labels(self, *values):
+        values = tuple(str(v) for v in values)
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} takes labels {self.labelnames}, got {values}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def state(self) -> dict:
+        with self._lock:
+            return {values: child.state() for values, child in self._children.items()}
+
+    def combine(self, state: dict, other: dict) -> dict:
+        merged = dict(state)
+        for values, value in other.items():
+            merged[values] = self._add(merged[values], value) if values in merged else value
+        return merged
+
+
+class _CounterChild:
+    __slots__ = ("_lock", "value")
+
+    def __init__(self, lock):
+        self._lock = lock
+        self.value = 0.0
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+    def state(self):
+        return self.value
+
+
+class Counter(_Metric):
+    """only goes up. name it *_total."""
+
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild(self._lock)
+
+    def inc(self, amount: float = 1):
+        self.labels().inc(amount)
+
+    @staticmethod
+    def _add(a, b):
+        return a + b
+
+    def render(self, state: dict) -> list:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(value)}"
+            for values, value in sorted(state.items())
+        ]
+
+
+class _GaugeChild:
+    __slots__ = ("_lock", "value", "function")
+
+    def __init__(self, lock):
+        self._lock = lock
+        self.value = 0.0
+        self.function = None
+
+    def set(self, value: float):
+        self.value = value
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1):
+        self.inc(-amount)
+
+    def set_function(self, function):
+        """read the value from function() at scrape time instead."""
+        self.function = function
+
+    def state(self):
+        if self.function is not None:
+            try:
+                return float(self.function())
+            except Exception:
+                return float("nan")
+        return self.value
+
+
+class Gauge(Counter):
+    """goes up and down. not merged across processes."""
+
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild(self._lock)
+
+    def set(self, value: float):
+        self.labels().set(value)
+
+    def set_function(self, function):
+        self.labels().set_function(function)
+
+
+class _HistogramChild:
+    __slots__ = ("_lock", "_bounds", "counts", "sum")
+
+    def __init__(self, lock, bounds):
+        self._lock = lock
+        self._bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # per bucket, not cumulative; last one is +Inf
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self._bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def time(self):
+        return _Timer(self)
+
+    def state(self):
+        return (list(self.counts), self.sum)
+
+
+class _Timer:
+    """`with histogram.labels(...).time():`"""
+
+    __slots__ = ("_child", "_started")
+
+    def __init__(self, child):
+        self._child = child
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._child.observe(time.perf_counter() - self._started)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (),
+                 buckets: tuple = LATENCY_BUCKETS, registry: Registry = REGISTRY):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self._lock, self.buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def time(self):
+        return self.labels().time()
+
+    @staticmethod
+    def _add(a, b):
+        return ([x + y for x, y in zip(a[0], b[0])], a[1] + b[1])
+
+    def render(self, state: dict) -> list:
+        lines = []
+        for values, (counts, total) in sorted(state.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, values, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, values)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+# ----- the judge's own metrics. recorded wherever test_runner / sandbox run. -----
+
+JUDGE_CASES = Counter("judge_cases_total", "Test cases judged, by verdict", ("verdict",))
+JUDGE_SUBMISSIONS = Counter(
+    "judge_submissions_total", "Submissions judged, by verdict (PASS or the first failing case's)", ("verdict",)
+)
+JUDGE_CASE_SECONDS = Histogram("judge_case_duration_seconds", "Wall time of one test case, spawn to verdict")
+SUBPROCESS_SPAWN_SECONDS = Histogram(
+    "judge_subprocess_spawn_seconds", "Time for Popen to fork/exec the interpreter", buckets=SPAWN_BUCKETS
+)
+
+
+# ----- database -----
+
+class QueryStats:
+    """queries run while handling one request."""
+
+    __slots__ = ("count", "seconds")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+
+# set by MetricsMiddleware; threadpool handlers get a copy of the context, so they see it too
+current_queries = contextvars.ContextVar("current_queries", default=None)
+
+
+def instrument_engine(engine, registry: Registry = REGISTRY):
+    """count and time every statement the engine runs, and charge it to the current request."""
+    from sqlalchemy import event
+
+    queries = Counter("db_queries_total", "SQL statements executed", registry=registry)
+    duration = Histogram("db_query_duration_seconds", "SQL statement latency", registry=registry)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        context._metrics_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context._metrics_started
+        queries.inc()
+        duration.observe(elapsed)
+        stats = current_queries.get()
+        if stats is not None:
+            stats.count += 1
+            stats.seconds += elapsed
+
+
+# ----- HTTP -----
+
+def route_template(scope) -> str:
+    """the matched route's path template, prefix included, or "unmatched"."""
+    # newer FastAPI leaves the router-relative route in scope["route"] and the full path here
+    context = (scope.get("fastapi") or {}).get("effective_route_context")
+    return getattr(context, "path", None) or getattr(scope.get("route"), "path", None) or "unmatched"
+
+
+# module level, like the judge's: an app built twice (tests, the backend and
+# runner in one process) shares them instead of registering them again
+HTTP_REQUESTS = Counter("http_requests_total", "HTTP requests by route and status", ("method", "route", "status"))
+HTTP_REQUEST_SECONDS = Histogram("http_request_duration_seconds", "HTTP request latency by route", ("method", "route"))
+HTTP_INFLIGHT = Gauge("http_requests_in_progress", "HTTP requests being handled")
+HTTP_REQUEST_QUERIES = Histogram(
+    "http_request_db_queries", "SQL statements per request by route", ("method", "route"), buckets=COUNT_BUCKETS
+)
+HTTP_REQUEST_DB_SECONDS = Histogram("http_request_db_seconds", "Time in SQL per request by route", ("method", "route"))
+
+
+class MetricsMiddleware:
+    """
+    pure ASGI middleware: per-route latency histograms and status counters,
+    plus per-request query counts when the app's engine is instrumented.
+    routes are labelled by their template (/api/challenge/execute/{question_id}),
+    never the raw path, so the label set stays small.
+    """
+
+    def __init__(self, app, track_queries: bool = False):
+        self.app = app
+        self.track_queries = track_queries
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        inflight = HTTP_INFLIGHT.labels()
+        inflight.inc()
+        stats = token = None
+        if self.track_queries:
+            stats = QueryStats()
+            token = current_queries.set(stats)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            inflight.dec()
+            if token is not None:
+                current_queries.reset(token)
+            route = route_template(scope)
+            method = scope.get("method", "")
+            HTTP_REQUEST_SECONDS.labels(method, route).observe(elapsed)
+            HTTP_REQUESTS.labels(method, route, status).inc()
+            if stats is not None:
+                HTTP_REQUEST_QUERIES.labels(method, route).observe(stats.count)
+                HTTP_REQUEST_DB_SECONDS.labels(method, route).observe(stats.seconds)
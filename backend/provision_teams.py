@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Bulk Team Provisioning for BroCode
+Creates every team in a CSV or JSON roster in one transaction, hashing
+passwords across all cores.
+
+CSV header: team_leader_usn,password[,team_name][,is_active]
+JSON: [{"team_leader_usn": ..., "password": ..., "team_name": ...}, ...]
+
+Usage:
+    python provision_teams.py roster.csv [--dry-run] [--strict] [--workers N]
+"""
+
+import argparse
+import os
+import sys
+
+# Add the current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.database import SessionLocal, init_db
+from app.services.team_provisioning import RosterError, team_provisioner
+
+
+def main():
+    parser = argparse.ArgumentParser(description="BroCode bulk team provisioning")
+    parser.add_argument("roster", help="CSV or JSON roster")
+    parser.add_argument("--dry-run", action="store_true", help="validate only, create nothing")
+    parser.add_argument("--strict", action="store_true", help="create nothing if any row has an error")
+    parser.add_argument("--workers", type=int, default=None, help="hashing processes (default: PASSWORD_HASH_WORKERS)")
+    args = parser.parse_args()
+
+    init_db()
+    db = SessionLocal()
+    try:
+        report = team_provisioner.import_file(
+            db, args.roster, dry_run=args.dry_run, strict=args.strict, workers=args.workers
+        )
+    except (RosterError, OSError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    finally:
+        db.close()
+
+    for error in report["errors"]:
+        print(f"   ⚠️  row {error['row']} ({error['team_leader_usn'] or '?'}): {error['error']}")
+    if report["dry_run"]:
+        print(f"🔍 Dry run: {report['rows'] - len(report['errors'])}/{report['rows']} rows would be created")
+    elif report["created"]:
+        print(f"👥 Created {report['created']}/{report['rows']} teams "
+              f"(hashing {report['hash_seconds']:.1f}s, insert {report['insert_seconds']:.2f}s)")
+    else:
+        print(f"ℹ️  No teams created ({len(report['errors'])} rows with errors)")
+    sys.exit(1 if report["errors"] else 0)
+
+
+if __name__ == "__main__":
+    main()
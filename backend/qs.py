@@ -1,7 +1,14 @@
-from app.database import SessionLocal
+import os
+
+from app.database import SessionLocal, init_db
 from app.models.question import Question
+from app.models.test_case import TestCase
+from app.services.test_case_store import test_case_store
+
+TEST_CASES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "test_cases.json")
 
 def populate_questions():
+    init_db()  # a fresh database has no tables until the server's first start
     db = SessionLocal()
     
     
@@ -357,8 +364,13 @@ def populate_questions():
             db.add(new_q)
     
     db.commit()
-    db.close()
     print("✅ Successfully populated questions")
 
+    # First run: the judge reads test cases from the DB, so seed them from test_cases.json
+    if db.query(TestCase).count() == 0 and os.path.exists(TEST_CASES_FILE):
+        result = test_case_store.import_file(db, TEST_CASES_FILE)
+        print(f"✅ Imported test cases for {len(result['imported'])} questions from test_cases.json")
+    db.close()
+
 if __name__ == "__main__":
     populate_questions()
\ No newline at end of file
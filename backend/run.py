@@ -1,5 +1,9 @@
 #!/usr/bin/env python3
 import uvicorn
+from decouple import config
+
+# Auto-reload for development; RELOAD=false skips the file watcher and its reloader process
+RELOAD = config("RELOAD", default=True, cast=bool)
 
 if __name__ == "__main__":
-    uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
+    uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=RELOAD)
@@ -1,24 +1,127 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-from test_runner import test_submission
+import hmac
+import os
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional
+from fastapi import Depends, FastAPI, Header, HTTPException
+from fastapi.responses import PlainTextResponse
+from pydantic import AliasChoices, BaseModel, Field
+from starlette.concurrency import run_in_threadpool
+from judge_pool import JobFailed, JudgePool, PoolBusy, PoolClosed, WorkerCrashed, DRAIN_SECONDS
+from test_runner import interpreter_startup_ms
+from tracing import judge_traces
+import metrics
 
-app = FastAPI(title="BroCode Execution API")
+# BROCODE_JUDGE_WORKERS processes x BROCODE_WORKER_CONCURRENCY jobs each
+pool = JudgePool()
+
+# shared secret for /drain and /resume. unset means nobody gets to pause this node over http
+ADMIN_TOKEN = os.environ.get("BROCODE_RUNNER_TOKEN", "")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    pool.start()
+    yield
+    # SIGTERM / Ctrl+C: finish what's queued and running before exiting
+    await pool.drain(DRAIN_SECONDS)
+
+
+app = FastAPI(title="BroCode Execution API", lifespan=lifespan)
+app.add_middleware(metrics.MetricsMiddleware)
+
+metrics.Gauge("judge_queue_depth", "Jobs waiting for a judge worker").set_function(
+    lambda: pool.stats()["queued"]
+)
+metrics.Gauge("judge_inflight", "Jobs running on judge workers").set_function(
+    lambda: pool.stats()["inflight"]
+)
+metrics.Gauge("judge_pool_capacity", "Judge workers x slots per worker").set_function(
+    lambda: pool.size * pool.concurrency
+)
+metrics.Gauge("judge_worker_restarts", "Judge workers restarted after crashing").set_function(
+    lambda: pool.restarts
+)
 
 class RunRequest(BaseModel):
     question_id: str  # e.g., "E01"
-    code: str
+    code: str = Field(validation_alias=AliasChoices("code", "code_answer"))  # the backend's JudgeService sends code_answer
+    # the backend's compiled test cases for this question (test_cases.json shape) and the
+    # snapshot version they came from. without them we judge from our own test_cases.json
+    question: Optional[Dict[str, Any]] = None
+    cases_version: Optional[int] = None
+
+def require_admin_token(authorization: str = Header(default="")):
+    """Authorization: Bearer $BROCODE_RUNNER_TOKEN."""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="BROCODE_RUNNER_TOKEN is not set on this node")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid runner token", headers={"WWW-Authenticate": "Bearer"})
 
 @app.post("/run")
 async def run_code(payload: RunRequest):
-    
-    result = test_submission(payload.question_id, payload.code)
-    
+    try:
+        result = await pool.submit(payload.question_id, payload.code, payload.question)
+    except PoolBusy as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except PoolClosed as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except WorkerCrashed as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    except JobFailed as e:
+        # a malformed question or a test_data file this node lacks: a 4xx so the
+        # backend doesn't burn the deadline retrying it on every other node
+        raise HTTPException(status_code=422, detail=f"Judging failed: {e}")
+
     if "error" in result and result["status"] == "FAIL" and "Unknown question ID" in result.get("error", ""):
          raise HTTPException(status_code=400, detail=result["error"])
-         
+
+    if "trace" in result:
+        if payload.cases_version is not None:
+            result["trace"]["cases_version"] = payload.cases_version
+        judge_traces.record(result["trace"])
+
     return result
 
+@app.get("/health")
+async def health():
+    """Worker pool status. 503 while draining, so load balancers stop sending work."""
+    stats = pool.stats()
+    if not stats["accepting"]:
+        raise HTTPException(status_code=503, detail=stats)
+    return stats
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """Prometheus text format; judge counters are summed over all pool workers."""
+    return PlainTextResponse(
+        metrics.REGISTRY.render(merge=pool.metric_snapshots()),
+        media_type=metrics.CONTENT_TYPE,
+    )
+
+@app.get("/traces")
+async def traces():
+    """Per-question breakdown of where judging time went (queue, spawn, run, compare, ...)."""
+    startup_ms = await run_in_threadpool(interpreter_startup_ms)
+    return {"interpreter_startup_ms": startup_ms, "questions": judge_traces.breakdown(startup_ms)}
+
+@app.post("/drain", dependencies=[Depends(require_admin_token)])
+async def drain():
+    """Stop taking new jobs; the ones already queued still finish. /resume undoes it."""
+    pool.accepting = False
+    return pool.stats()
+
+@app.post("/resume", dependencies=[Depends(require_admin_token)])
+async def resume():
+    """Take new jobs again after /drain."""
+    try:
+        pool.resume()
+    except PoolClosed as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return pool.stats()
+
 if __name__ == "__main__":
     import uvicorn
-   
-    uvicorn.run(app, host="0.0.0.0", port=8001)
\ No newline at end of file
+
+    # one server process is enough, the pool owns the cores
+    uvicorn.run(app, host="0.0.0.0", port=8001)
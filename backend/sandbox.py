@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+the box we put your code in. it has walls now.
+
+runs a child process with rlimits (cpu, memory, file size, process count),
+streams its output through a hard byte cap, and tells you exactly how it died.
+"""
+
+import math
+import os
+import selectors
+import signal
+import subprocess
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+import metrics
+
+try:
+    import resource
+except ImportError:  # windows. no rlimits for you.
+    resource = None
+# linux. lets us limit the child without running python in it
+HAS_PRLIMIT = hasattr(resource, "prlimit")
+
+# verdicts. learn them, you'll be seeing them a lot.
+PASS = "PASS"
+WRONG_ANSWER = "WA"
+TIME_LIMIT = "TLE"
+MEMORY_LIMIT = "MLE"
+OUTPUT_LIMIT = "OLE"
+RUNTIME_ERROR = "RE"
+
+READ_CHUNK = 64 * 1024
+WRITE_CHUNK = 64 * 1024
+# how long a SIGKILLed child gets to actually go away
+KILL_GRACE_SECONDS = 1.0
+
+# brocode prints a MemoryError as "Bro Code Error: 💀 " or "Internal Error: " -
+# str(MemoryError()) is empty, and every other error it raises says something
+_BROCODE_MEMORY_ERROR_LINES = ("Bro Code Error: \U0001f480", "Bro Code Error:", "Internal Error:")
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.environ.get(name)
+    return int(value) if value not in (None, "") else default
+
+
+@dataclass(frozen=True)
+class Limits:
+    """how much rope each submission gets. 0 means no limit."""
+    memory_mb: int = _env_int("BROCODE_MEMORY_MB", 256)
+    file_size_mb: int = _env_int("BROCODE_FILE_SIZE_MB", 1)
+    output_bytes: int = _env_int("BROCODE_OUTPUT_LIMIT_BYTES", 1024 * 1024)
+    # RLIMIT_NPROC counts every process of the user, not just the child's,
+    # so it's off unless the judge runs as a dedicated user.
+    max_processes: int = _env_int("BROCODE_MAX_PROCESSES", 0)
+
+
+DEFAULT_LIMITS = Limits()
+
+
+@dataclass
+class Execution:
+    """everything we know about how the run went."""
+    verdict: Optional[str]  # None if it exited cleanly; the caller judges the output
+    returncode: Optional[int]
+    stdout: bytes
+    stderr: bytes
+    elapsed: float
+    max_rss_kb: int = 0
+    spawn_seconds: float = 0.0  # how long fork/exec took, part of elapsed
+
+
+def _limit_values(limits: Limits, cpu_seconds: int) -> list:
+    """(resource, (soft, hard)) for every limit that's switched on."""
+    values = [(resource.RLIMIT_CORE, (0, 0))]
+    if cpu_seconds:
+        # soft limit sends SIGXCPU, the hard one a second later is SIGKILL
+        values.append((resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds + 1)))
+    if limits.memory_mb:
+        values.append((resource.RLIMIT_AS, (limits.memory_mb * 1024 * 1024,) * 2))
+    if limits.file_size_mb:
+        values.append((resource.RLIMIT_FSIZE, (limits.file_size_mb * 1024 * 1024,) * 2))
+    if limits.max_processes:
+        values.append((resource.RLIMIT_NPROC, (limits.max_processes,) * 2))
+    return values
+
+
+def _apply_limits(pid: int, limits: Limits, cpu_seconds: int):
+    """
+    sets the child's limits from out here, right after it's spawned. a
+    preexec_fn would run python in the forked child, and every caller of
+    this is multithreaded (judge pool threads, parallel cases, the backend's
+    threadpool): a fork that lands while another thread holds a lock can
+    hang the child forever. the gap before these apply is the interpreter
+    still booting, not your code.
+    """
+    for kind, value in _limit_values(limits, cpu_seconds):
+        try:
+            resource.prlimit(pid, kind, value)
+        except (ValueError, OSError):  # gone already, or a limit the os won't take
+            pass
+
+
+def _preexec_limits(limits: Limits, cpu_seconds: int):
+    """for posix without prlimit (macos): runs in the child right before exec. keep it boring."""
+    def preexec():
+        for kind, value in _limit_values(limits, cpu_seconds):
+            try:
+                resource.setrlimit(kind, value)
+            except (ValueError, OSError):
+                pass
+
+    return preexec
+
+
+def _kill_group(proc: subprocess.Popen):
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def _looks_like_oom(stderr: bytes) -> bool:
+    """
+    only on evidence: a MemoryError, ENOMEM, or brocode's way of printing a
+    MemoryError. a segfault is a segfault, and rss says nothing about an
+    address-space limit.
+    """
+    if b"MemoryError" in stderr or b"Cannot allocate memory" in stderr:
+        return True
+    lines = stderr.decode(errors="replace").strip().splitlines()
+    return bool(lines) and lines[-1].strip() in _BROCODE_MEMORY_ERROR_LINES
+
+
+def _wait(proc: subprocess.Popen, deadline: float):
+    """
+    reaps the child, giving up at deadline: closing its pipes doesn't mean it
+    stopped. returns (status, rusage), or None if it's still going.
+    """
+    delay = 0.001
+    while True:
+        pid, status, usage = os.wait4(proc.pid, os.WNOHANG)
+        if pid:
+            return status, usage
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0:
+            return None
+        time.sleep(min(delay, remaining))
+        delay = min(delay * 2, 0.05)
+
+
+def execute(
+    argv: list,
+    stdin_data=b"",
+    timeout: float = 5,
+    limits: Limits = DEFAULT_LIMITS,
+    on_stdout: Optional[Callable[[bytes], bool]] = None,
+    keep_stdout: Optional[int] = None,
+) -> Execution:
+    """
+    runs argv with stdin_data and limits applied.
+
+    stdin_data can be anything that supports the buffer protocol (an mmap is
+    fed straight from the mapping). on_stdout gets every stdout chunk; return
+    False from it to kill the child early (the verdict is then WA, the
+    callback decided that). keep_stdout caps how much stdout ends up in
+    Execution.stdout - when on_stdout already checks it, why hoard it.
+
+    raises FileNotFoundError if argv[0] doesn't exist, like subprocess does.
+    """
+    if resource is None:
+        return _execute_fallback(argv, stdin_data, timeout, limits, on_stdout, keep_stdout)
+
+    started = time.perf_counter()
+    cpu_seconds = math.ceil(timeout)
+    proc = subprocess.Popen(
+        argv,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        preexec_fn=None if HAS_PRLIMIT else _preexec_limits(limits, cpu_seconds),
+        start_new_session=True,  # own process group, so we can kill the whole family
+    )
+    if HAS_PRLIMIT:
+        _apply_limits(proc.pid, limits, cpu_seconds)
+    spawn_seconds = time.perf_counter() - started
+    metrics.SUBPROCESS_SPAWN_SECONDS.observe(spawn_seconds)
+
+    stdin_view = memoryview(stdin_data).cast("B")
+    stdin_offset = 0
+    stdout_chunks, stderr_chunks = [], []
+    output_size = 0
+    stdout_kept = 0
+    verdict = None
+    deadline = started + timeout
+
+    selector = selectors.DefaultSelector()
+    for stream in (proc.stdout, proc.stderr):
+        os.set_blocking(stream.fileno(), False)
+        selector.register(stream, selectors.EVENT_READ)
+    if len(stdin_view):
+        os.set_blocking(proc.stdin.fileno(), False)
+        selector.register(proc.stdin, selectors.EVENT_WRITE)
+    else:
+        proc.stdin.close()
+
+    drained = False
+    try:
+        while selector.get_map():
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                verdict = TIME_LIMIT
+                break
+            for key, _ in selector.select(timeout=remaining):
+                stream = key.fileobj
+                if stream is proc.stdin:
+                    try:
+                        stdin_offset += os.write(
+                            stream.fileno(), stdin_view[stdin_offset:stdin_offset + WRITE_CHUNK]
+                        )
+                    except BlockingIOError:
+                        continue
+                    except BrokenPipeError:
+                        stdin_offset = len(stdin_view)  # it stopped listening. its loss.
+                    if stdin_offset >= len(stdin_view):
+                        selector.unregister(stream)
+                        stream.close()
+                    continue
+
+                chunk = os.read(stream.fileno(), READ_CHUNK)
+                if not chunk:
+                    selector.unregister(stream)
+                    continue
+                output_size += len(chunk)
+                if limits.output_bytes and output_size > limits.output_bytes:
+                    verdict = OUTPUT_LIMIT
+                    break
+                if stream is proc.stdout:
+                    if keep_stdout is None:
+                        stdout_chunks.append(chunk)
+                    elif stdout_kept < keep_stdout:
+                        stdout_chunks.append(chunk[:keep_stdout - stdout_kept])
+                        stdout_kept += len(stdout_chunks[-1])
+                    if on_stdout is not None and on_stdout(chunk) is False:
+                        verdict = WRONG_ANSWER
+                        break
+                else:
+                    stderr_chunks.append(chunk)
+            if verdict:
+                break
+        drained = verdict is None
+    finally:
+        if not drained:
+            _kill_group(proc)
+        selector.close()
+        stdin_view.release()  # or the caller can't close its mmap
+        for stream in (proc.stdin, proc.stdout, proc.stderr):
+            if not stream.closed:
+                stream.close()
+
+    # pipes are closed, but that's all we know: it can close them and keep going
+    cpu_used = 0.0
+    try:
+        waited = _wait(proc, deadline if drained else time.perf_counter() + KILL_GRACE_SECONDS)
+        if waited is None:
+            _kill_group(proc)
+            verdict = verdict or TIME_LIMIT
+            waited = os.wait4(proc.pid, 0)[1:]
+        status, usage = waited
+        returncode = os.waitstatus_to_exitcode(status)
+        max_rss_kb = usage.ru_maxrss
+        cpu_used = usage.ru_utime + usage.ru_stime
+    except ChildProcessError:
+        returncode, max_rss_kb = proc.wait(), 0
+    proc.returncode = returncode
+    elapsed = time.perf_counter() - started
+
+    stdout = b"".join(stdout_chunks)
+    stderr = b"".join(stderr_chunks)
+
+    if verdict is None and returncode != 0:
+        # our own kills already set the verdict, so a SIGKILL here is either
+        # the hard cpu limit or somebody else (the oom killer, an admin)
+        if returncode == -signal.SIGXCPU or (returncode == -signal.SIGKILL and cpu_used >= cpu_seconds):
+            verdict = TIME_LIMIT
+        elif returncode == -signal.SIGXFSZ:
+            verdict = OUTPUT_LIMIT
+        elif _looks_like_oom(stderr):
+            verdict = MEMORY_LIMIT
+        else:
+            verdict = RUNTIME_ERROR
+
+    return Execution(verdict, returncode, stdout, stderr, elapsed, max_rss_kb, spawn_seconds)
+
+
+def _execute_fallback(
+    argv: list,
+    stdin_data,
+    timeout: float,
+    limits: Limits = DEFAULT_LIMITS,
+    on_stdout: Optional[Callable[[bytes], bool]] = None,
+    keep_stdout: Optional[int] = None,
+) -> Execution:
+    """
+    no rlimits, no streaming. it's the old way, for platforms that can't do
+    better - but the output goes through on_stdout afterwards in the same
+    chunks, so the checker (and the verdict) doesn't know the difference.
+    """
+    started = time.perf_counter()
+    try:
+        result = subprocess.run(argv, input=bytes(stdin_data), capture_output=True, timeout=timeout)
+    except subprocess.TimeoutExpired as e:
+        return Execution(TIME_LIMIT, None, e.stdout or b"", e.stderr or b"", time.perf_counter() - started)
+    elapsed = time.perf_counter() - started
+
+    verdict = None
+    stdout = result.stdout
+    if limits.output_bytes and len(stdout) + len(result.stderr) > limits.output_bytes:
+        verdict = OUTPUT_LIMIT
+    elif on_stdout is not None:
+        for offset in range(0, len(stdout), READ_CHUNK):
+            if on_stdout(stdout[offset:offset + READ_CHUNK]) is False:
+                verdict = WRONG_ANSWER
+                break
+    if verdict is None and result.returncode != 0:
+        verdict = RUNTIME_ERROR
+    if keep_stdout is not None:
+        stdout = stdout[:keep_stdout]
+    return Execution(verdict, result.returncode, stdout, result.stderr, elapsed)
@@ -6,8 +6,23 @@ import sys
 # Add the current directory to Python path for proper imports
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from app.main import app
+from app.config import API_WORKERS, DB_CREATE_TABLES
 
 if __name__ == "__main__":
     print(f"Starting server from: {os.getcwd()}")
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    if API_WORKERS > 1:
+        # Create the schema once, here, instead of having every worker race to do it
+        if DB_CREATE_TABLES:
+            from app.database import init_db
+            init_db()
+            os.environ["DB_CREATE_TABLES"] = "false"
+        uvicorn.run(
+            "app.main:app",
+            host="0.0.0.0",
+            port=8000,
+            workers=API_WORKERS,
+            app_dir=os.path.dirname(os.path.abspath(__file__)),
+        )
+    else:
+        from app.main import app
+        uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Sync test cases between the database and test_cases.json.
+
+The judge reads test cases from the `test_cases` table; test_cases.json is
+the portable copy for version control and for running test_runner.py
+standalone.
+
+Usage:
+    python test_cases_sync.py export [--file test_cases.json]
+    python test_cases_sync.py import [--file test_cases.json]
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from app.database import SessionLocal
+from app.services.test_case_store import test_case_store
+
+DEFAULT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "test_cases.json")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export or import judge test cases")
+    parser.add_argument("action", choices=["export", "import"])
+    parser.add_argument("--file", default=DEFAULT_FILE, help="JSON file (default: test_cases.json)")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if args.action == "export":
+            count = test_case_store.export_file(db, args.file)
+            print(f"✅ Exported test cases for {count} questions to {args.file}")
+        else:
+            try:
+                result = test_case_store.import_file(db, args.file)
+            except (KeyError, ValueError) as e:
+                print(f"❌ Nothing imported: {e}")
+                sys.exit(1)
+            print(f"✅ Imported test cases for {len(result['imported'])} questions from {args.file}")
+            if result["missing"]:
+                print(f"⚠️  Skipped unknown questions: {', '.join(result['missing'])}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
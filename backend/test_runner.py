@@ -3,75 +3,339 @@
 runs tests. if it breaks, it's your fault.
 """
 
+import dataclasses
 import json
-import subprocess
+import mmap
 import tempfile
 import os
+import shutil
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import ExitStack, contextmanager
 from pathlib import Path
 
+import comparator
+import metrics
+import sandbox
+
 # hardcoded paths cause why not
 SCRIPT_DIR = Path(__file__).parent
 TEST_CASES_FILE = SCRIPT_DIR / "test_cases.json"
+# big inputs/outputs live here as files ("input_file" / "expected_file" on a case) and get mmapped
+TEST_DATA_DIR = Path(os.environ.get("BROCODE_TEST_DATA_DIR") or SCRIPT_DIR / "test_data")
+
+# submissions get written to tmpfs when we have one. real disks have better things to do.
+SCRATCH_ROOT = os.environ.get("BROCODE_SCRATCH_DIR") or (
+    "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+)
+SCRATCH_PREFIX = "brocode-judge-"
+
+# per-case seconds for questions that haven't been through calibrate.py yet
+DEFAULT_TIMEOUT = 5
+_scratch_swept = False
+
+
+_test_cases_cache = (None, None)  # (mtime, parsed json)
 
 
 def load_test_cases():
-    """read the json. try not to cry."""
-    with open(TEST_CASES_FILE, "r") as f:
-        return json.load(f)
+    """read the json. try not to cry. only re-read when the file actually changed."""
+    global _test_cases_cache
+    mtime = os.path.getmtime(TEST_CASES_FILE)
+    if _test_cases_cache[0] != mtime:
+        with open(TEST_CASES_FILE, "r") as f:
+            _test_cases_cache = (mtime, json.load(f))
+    return _test_cases_cache[1]
 
 
-def run_brocode(code: str, input_data: str, timeout: int = 5) -> tuple[bool, str]:
+def _sweep_stale_scratch():
     """
-    runs the code.
-    
-    5s timeout because i have places to be.
+    a judge that died mid-run leaves its scratch dir behind.
+    dirs are tagged with the owner pid, so anything whose owner is gone gets binned.
     """
-    # dumping your garbage code into a temp file
-    with tempfile.NamedTemporaryFile(mode='w', suffix='.homie', delete=False) as f:
-        f.write(code)
-        temp_file = f.name
-    
+    global _scratch_swept
+    _scratch_swept = True
+    if os.name != "posix":
+        return
+    try:
+        entries = os.listdir(SCRATCH_ROOT)
+    except OSError:
+        return
+    for entry in entries:
+        if not entry.startswith(SCRATCH_PREFIX):
+            continue
+        try:
+            pid = int(entry[len(SCRATCH_PREFIX):].split("-", 1)[0])
+            os.kill(pid, 0)
+        except ValueError:
+            continue
+        except ProcessLookupError:
+            shutil.rmtree(os.path.join(SCRATCH_ROOT, entry), ignore_errors=True)
+        except PermissionError:
+            # alive, just not ours
+            pass
+
+
+@contextmanager
+def scratch_source(code: str):
+    """
+    writes the submission once into a private scratch dir and yields the path.
+    every test case reuses it, and the dir is gone when the block exits.
+    """
+    if not _scratch_swept:
+        _sweep_stale_scratch()
+    scratch_dir = tempfile.mkdtemp(prefix=f"{SCRATCH_PREFIX}{os.getpid()}-", dir=SCRATCH_ROOT)
+    try:
+        source_path = os.path.join(scratch_dir, "main.homie")
+        with open(source_path, "w") as f:
+            f.write(code)
+        yield source_path
+    finally:
+        # cleaning up the crime scene
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+
+
+def test_data_path(relative: str) -> Path:
+    """resolves a case file under TEST_DATA_DIR. no ../../etc/passwd, nice try."""
+    root = TEST_DATA_DIR.resolve()
+    path = (root / relative).resolve()
+    if root not in path.parents:
+        raise ValueError(f"Test data path escapes {TEST_DATA_DIR}: {relative}")
+    return path
+
+
+def _case_bytes(stack: ExitStack, case: dict, key: str):
+    file_key = f"{key}_file"
+    if not case.get(file_key):
+        return case.get(key, "").encode()
+    f = stack.enter_context(open(test_data_path(case[file_key]), "rb"))
+    if os.fstat(f.fileno()).st_size == 0:
+        return b""  # can't mmap nothing
+    return stack.enter_context(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+
+@contextmanager
+def case_data(case: dict):
+    """
+    yields (input, expected) for a case as bytes-likes.
+
+    inline cases just get encoded. file-backed ones are memory-mapped, so the
+    child's stdin is written straight from the mapping and the comparator reads
+    the answer from it too - a 50MB stress test never gets copied into us.
+    """
+    with ExitStack() as stack:
+        yield _case_bytes(stack, case, "input"), _case_bytes(stack, case, "expected")
+
+
+def expected_preview(case: dict) -> str:
+    """what to show for a failed case. nobody wants megabytes of expected output in a response."""
+    if case.get("expected_file"):
+        return f"<{case['expected_file']}>"
+    return case["expected"].strip()
+
+
+# how much of a wrong answer we keep around to show you
+OUTPUT_PREVIEW_BYTES = 64 * 1024
+
+VERDICT_MESSAGES = {
+    sandbox.TIME_LIMIT: "Time Limit Exceeded",
+    sandbox.MEMORY_LIMIT: "Memory Limit Exceeded",
+    sandbox.OUTPUT_LIMIT: "Output Limit Exceeded",
+}
+
+
+def run_case(source_path: str, input_data, timeout: int = 5, checker=None, trace: dict = None) -> tuple[str, str]:
+    """
+    runs one case inside the sandbox.
+    returns (verdict, output): verdict is None if it exited cleanly,
+    otherwise TLE / MLE / OLE / RE and output is the reason.
+
+    input_data is a str or anything bytes-like (an mmap from case_data).
+    give it a checker (comparator.make_comparator) and stdout is compared
+    while it streams: the first wrong byte kills the run with WA. the checker
+    already polices output size, so the output cap stretches to fit it
+    and we only hang on to the first bit of stdout.
+    pass a trace dict and it gets spawn_ms / run_ms.
+    """
+    if isinstance(input_data, str):
+        input_data = input_data.encode()
+    limits = sandbox.DEFAULT_LIMITS
+    on_stdout = keep_stdout = None
+    if checker is not None:
+        on_stdout = checker.feed
+        keep_stdout = OUTPUT_PREVIEW_BYTES
+        if limits.output_bytes and checker.limit > limits.output_bytes:
+            limits = dataclasses.replace(limits, output_bytes=checker.limit)
     try:
         # executing... brace for impact
-        result = subprocess.run(
-            ['brocode', temp_file],
-            input=input_data,
-            capture_output=True,
-            text=True,
-            timeout=timeout
+        run = sandbox.execute(
+            ['brocode', source_path], input_data, timeout=timeout,
+            limits=limits, on_stdout=on_stdout, keep_stdout=keep_stdout,
         )
-        
-        # trimming whitespace to save your grade
-        output = result.stdout.strip()
-        
-        if result.returncode != 0:
-            # it died. rip.
-            error_msg = result.stderr.strip() if result.stderr else "it just died"
-            return False, f"Runtime Error: {error_msg}"
-        
-        return True, output
-        
-    except subprocess.TimeoutExpired:
-        # too slow. killing it.
-        return False, "Time Limit Exceeded"
     except FileNotFoundError:
         # brocode isn't even installed. astounding.
-        return False, "BroCode interpreter not found. Install with: pipx install brocode-lang"
+        return sandbox.RUNTIME_ERROR, "BroCode interpreter not found. Install with: pipx install brocode-lang"
     except Exception as e:
         # god knows what happened here
-        return False, f"Execution Error: {str(e)}"
-    finally:
-        # cleaning up the crime scene
-        if os.path.exists(temp_file):
-            os.unlink(temp_file)
+        return sandbox.RUNTIME_ERROR, f"Execution Error: {str(e)}"
+
+    if trace is not None:
+        trace["spawn_ms"] = _ms(run.spawn_seconds)
+        trace["run_ms"] = _ms(run.elapsed - run.spawn_seconds)
 
+    if run.verdict == sandbox.RUNTIME_ERROR:
+        # it died. rip.
+        error_msg = run.stderr.decode(errors="replace").strip() or "it just died"
+        return run.verdict, f"Runtime Error: {error_msg}"
+    if run.verdict == sandbox.WRONG_ANSWER:
+        # wrong before it even finished. here's what it managed to say.
+        return run.verdict, run.stdout.decode(errors="replace").strip()
+    if run.verdict:
+        # too slow / too fat / too loud. killed it.
+        return run.verdict, VERDICT_MESSAGES[run.verdict]
 
-def test_submission(question_id: str, code: str) -> dict:
+    # trimming whitespace to save your grade
+    return None, run.stdout.decode(errors="replace").strip()
+
+
+def run_brocode(code: str, input_data: str, timeout: int = 5, source_path: str = None) -> tuple[bool, str]:
+    """
+    runs the code.
+    
+    5s timeout because i have places to be.
+    pass source_path (from scratch_source) to skip writing the code again.
+    """
+    if source_path is None:
+        with scratch_source(code) as source_path:
+            return run_brocode(code, input_data, timeout, source_path)
+
+    verdict, output = run_case(source_path, input_data, timeout)
+    return verdict is None, output
+
+
+def _ms(seconds: float) -> float:
+    return round(seconds * 1000, 3)
+
+
+class _TimedChecker:
+    """wraps a comparator and keeps count of the time spent comparing."""
+
+    def __init__(self, make):
+        started = time.perf_counter()
+        self._checker = make()
+        self.limit = self._checker.limit
+        self.seconds = time.perf_counter() - started
+
+    def feed(self, chunk: bytes) -> bool:
+        started = time.perf_counter()
+        try:
+            return self._checker.feed(chunk)
+        finally:
+            self.seconds += time.perf_counter() - started
+
+    def finish(self) -> bool:
+        started = time.perf_counter()
+        try:
+            return self._checker.finish()
+        finally:
+            self.seconds += time.perf_counter() - started
+
+
+def judge_case(source_path: str, case: dict, compare_mode: str, timeout, trace: dict = None) -> tuple[str, str]:
+    """
+    one case, start to verdict. returns (verdict, actual) with verdict PASS / WA / TLE / ...
+    pass a trace dict and it gets load_ms / spawn_ms / run_ms / compare_ms for the case.
+    """
+    started = time.perf_counter()
+    case_trace = {} if trace is None else trace
+    with metrics.JUDGE_CASE_SECONDS.time():
+        with case_data(case) as (input_data, expected_data):
+            loaded = time.perf_counter()
+            checker = _TimedChecker(lambda: comparator.make_comparator(expected_data, compare_mode))
+            verdict, actual = run_case(source_path, input_data, timeout=timeout, checker=checker, trace=case_trace)
+            if verdict is None:
+                verdict = sandbox.PASS if checker.finish() else sandbox.WRONG_ANSWER
+    metrics.JUDGE_CASES.labels(verdict).inc()
+    if trace is not None:
+        # the comparing happens while the output streams in, so it's inside run_ms until we take it out
+        trace["verdict"] = verdict
+        trace["load_ms"] = _ms(loaded - started)
+        trace["compare_ms"] = _ms(checker.seconds)
+        trace["spawn_ms"] = trace.get("spawn_ms", 0.0)
+        trace["run_ms"] = round(max(0.0, trace.get("run_ms", 0.0) - trace["compare_ms"]), 3)
+    return verdict, actual
+
+
+def _judge_cases(source_path: str, cases: list, compare_mode: str, timeout, fail_fast: bool, workers: int) -> dict:
+    """case index -> (verdict, actual, case trace) for every case that ran."""
+
+    def judge(i, case):
+        trace = {"case": i + 1}
+        return judge_case(source_path, case, compare_mode, timeout, trace) + (trace,)
+
+    verdicts = {}
+    if workers <= 1:
+        for i, case in enumerate(cases):
+            verdicts[i] = judge(i, case)
+            if fail_fast and verdicts[i][0] != sandbox.PASS:
+                break
+        return verdicts
+
+    # the cases are subprocesses, so threads are plenty
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(judge, i, case): i
+            for i, case in enumerate(cases)
+        }
+        for future in as_completed(futures):
+            if future.cancelled():
+                continue
+            verdicts[futures[future]] = future.result()
+            if fail_fast and verdicts[futures[future]][0] != sandbox.PASS:
+                # the queued ones never start; the running ones get to finish
+                for pending in futures:
+                    pending.cancel()
+    return verdicts
+
+
+_startup_ms = None
+
+
+def interpreter_startup_ms(runs: int = 3) -> float:
+    """
+    what starting brocode costs before any of your code runs: the best of
+    a few runs of an empty program. measured once per process.
+    """
+    global _startup_ms
+    if _startup_ms is None:
+        with scratch_source("sup {\n}\n") as source_path:
+            samples = []
+            for _ in range(runs):
+                trace = {}
+                run_case(source_path, b"", timeout=DEFAULT_TIMEOUT, trace=trace)
+                samples.append(trace.get("run_ms", 0.0))
+        _startup_ms = min(samples)
+    return _startup_ms
+
+
+def test_submission(question_id: str, code: str, test_cases=None, fail_fast: bool = False, workers: int = 1) -> dict:
     """
     judgement day.
+
+    test_cases: {question_id: question} in the test_cases.json shape.
+    the backend passes its DB snapshot here; standalone we read the json.
+    fail_fast stops at the first failing case (the rest never run, so they
+    aren't in details). workers > 1 runs that many cases at once; the
+    report comes out in case order either way.
+
+    the result carries a "trace": where the time went (loading cases,
+    writing the source, spawning, running, comparing), per case and summed.
     """
-    test_cases = load_test_cases()
+    started = time.perf_counter()
+    if test_cases is None:
+        test_cases = load_test_cases()
+    loaded = time.perf_counter()
     
     # basic sanity check
     question_id = question_id.upper()
@@ -84,33 +348,53 @@ def test_submission(question_id: str, code: str) -> dict:
     
     question = test_cases[question_id]
     cases = question["test_cases"]
+    compare_mode = question.get("compare", comparator.EXACT)
+    timeout = question.get("time_limit", DEFAULT_TIMEOUT)
     
     passed = 0
     failed = 0
     results = []
     
     # testing each case. hope you prayed.
+    with scratch_source(code) as source_path:
+        written = time.perf_counter()
+        verdicts = _judge_cases(source_path, cases, compare_mode, timeout, fail_fast, workers)
+
+    case_traces = [verdicts[i][2] for i in sorted(verdicts)]
+    trace = {
+        "question": question_id,
+        "load_ms": round(_ms(loaded - started) + sum(c["load_ms"] for c in case_traces), 3),
+        "write_ms": _ms(written - loaded),
+        **{
+            f"{phase}_ms": round(sum(c[f"{phase}_ms"] for c in case_traces), 3)
+            for phase in ("spawn", "run", "compare")
+        },
+        "total_ms": _ms(time.perf_counter() - started),
+        "cases": case_traces,
+    }
+
     for i, case in enumerate(cases):
-        input_data = case["input"]
-        expected = case["expected"].strip()
-        
-        success, actual = run_brocode(code, input_data)
-        
-        if success and actual == expected:
+        if i not in verdicts:
+            continue  # fail-fast never got to it
+        verdict, actual, _ = verdicts[i]
+        if verdict == sandbox.PASS:
             # a miracle happened
             passed += 1
-            results.append({"case": i + 1, "status": "PASS"})
+            results.append({"case": i + 1, "status": "PASS", "verdict": sandbox.PASS})
         else:
             # as expected. failure.
             failed += 1
             results.append({
                 "case": i + 1,
                 "status": "FAIL",
-                "expected": expected,
+                "verdict": verdict,
+                "expected": expected_preview(case),
                 "actual": actual
             })
     
     # did you survive?
+    first_failure = next((r["verdict"] for r in results if r["status"] == "FAIL"), sandbox.PASS)
+    metrics.JUDGE_SUBMISSIONS.labels(first_failure).inc()
     if failed == 0:
         return {
             "status": "PASS",
@@ -118,7 +402,8 @@ def test_submission(question_id: str, code: str) -> dict:
             "name": question["name"],
             "points": question["points"],
             "tests_passed": passed,
-            "tests_total": len(cases)
+            "tests_total": len(cases),
+            "trace": trace
         }
     else:
         # disappoint your parents properly
@@ -129,7 +414,8 @@ def test_submission(question_id: str, code: str) -> dict:
             "points": 0,
             "tests_passed": passed,
             "tests_total": len(cases),
-            "details": results
+            "details": results,
+            "trace": trace
         }
 
 
@@ -0,0 +1,67 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# the judge modules (test_runner, comparator, sandbox) live at the top of backend/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# before anything imports app.config: never point the tests at a real brocode.db
+_scratch = tempfile.mkdtemp(prefix="brocode-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_scratch}/test.db"
+os.environ["UPLOAD_DIR"] = os.path.join(_scratch, "uploads")
+os.environ["SHARED_STATE_URL"] = "memory://"
+
+
+@pytest.fixture
+def db():
+    """A session on a freshly created, empty schema."""
+    from app.database import Base, SessionLocal, engine, init_db
+
+    Base.metadata.drop_all(bind=engine)
+    init_db()
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def question(db):
+    """E01 (a + b) with two test cases in the DB."""
+    from app.models import Question
+    from app.services.test_case_store import test_case_store
+
+    question = Question(question_id="E01", title="The Vibe Check (Sum)", description="a + b", points=2)
+    db.add(question)
+    db.commit()
+    test_case_store.import_json(db, {"E01": {"test_cases": [
+        {"input": "10\n20", "expected": "30"},
+        {"input": "-5\n10", "expected": "5"},
+    ]}})
+    return question
+
+
+@pytest.fixture
+def client(db):
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def team_client(client, question, db):
+    """`client`, logged in as team TEAM1 with a challenge session started."""
+    import hashlib
+    from app.models import Team
+
+    db.add(Team(team_leader_usn="TEAM1", password=hashlib.sha256(b"testpass").hexdigest(), team_name="Team 1"))
+    db.commit()
+    token = client.post("/api/auth/login", json={"team_leader_usn": "TEAM1", "password": "testpass"}).json()
+    client.headers["Authorization"] = "Bearer " + token["access_token"]
+    assert client.post("/api/challenge/start").status_code == 200
+    return client
@@ -0,0 +1,109 @@
+import asyncio
+
+import pytest
+
+from app.services.admission_service import AdmissionController, AdmissionRejected
+from app.services.shared_state import MemoryState, SQLiteState
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def shared(request, tmp_path):
+    return MemoryState() if request.param == "memory" else SQLiteState(str(tmp_path / "state.db"))
+
+
+def test_incr_floor(shared):
+    assert shared.incr("n", -1) == -1  # no floor: a plain counter
+    assert shared.incr("n", -1, floor=0) == 0
+    assert shared.incr("m", -3, floor=0) == 0  # missing key
+    assert shared.incr("m", 2, floor=0) == 2
+
+
+def test_unlease_after_lease_lapsed_does_not_go_negative(tmp_path):
+    # two API workers sharing one store
+    first, second = (
+        AdmissionController(per_team=1, shared=SQLiteState(str(tmp_path / "state.db"))) for _ in range(2)
+    )
+    first.lease_ttl = 0.05
+
+    async def scenario():
+        async with first.slot(7):
+            await asyncio.sleep(0.1)  # the lease key expires mid-run
+        assert first.shared.get("admission:team:7") == "0"
+        # a counter left at -1 would let the other worker admit a second execution
+        async with first.slot(7):
+            with pytest.raises(AdmissionRejected):
+                async with second.slot(7):
+                    pass
+
+    asyncio.run(scenario())
+
+
+def test_free_slots_go_round_robin_across_teams():
+    admission = AdmissionController(max_inflight=1, per_team=3, max_queued=10, shared=MemoryState())
+    admitted = []
+
+    async def execute(team_id):
+        await admission.acquire(team_id)
+        admitted.append(team_id)
+
+    async def scenario():
+        await admission.acquire("a")  # holds the only slot
+        # a fires two more before b and c get one in
+        waiters = [asyncio.create_task(execute(team)) for team in ("a", "a", "b", "c")]
+        await asyncio.sleep(0)
+        assert admission.stats()["queued"] == 4
+        holder = "a"
+        for turn in range(1, 5):
+            admission.release(holder)
+            while len(admitted) < turn:
+                await asyncio.sleep(0)
+            holder = admitted[-1]
+        await asyncio.gather(*waiters)
+
+    asyncio.run(scenario())
+    assert admitted == ["a", "b", "c", "a"]  # a's second request waits behind the other teams
+
+
+def test_team_over_its_share_is_rejected_with_a_retry_hint():
+    admission = AdmissionController(max_inflight=4, per_team=1, shared=MemoryState())
+
+    async def scenario():
+        await admission.acquire(1)
+        with pytest.raises(AdmissionRejected) as rejected:
+            await admission.acquire(1)
+        assert rejected.value.retry_after >= 1
+        await admission.acquire(2)  # other teams are unaffected
+
+    asyncio.run(scenario())
+    assert admission.rejected == 1
+
+
+def test_full_queue_and_queue_timeout_are_rejected():
+    admission = AdmissionController(max_inflight=1, per_team=2, max_queued=1, queue_timeout=0.05, shared=MemoryState())
+
+    async def scenario():
+        await admission.acquire(1)
+        waiter = asyncio.create_task(admission.acquire(2))
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected):
+            await admission.acquire(3)  # queue full
+        with pytest.raises(AdmissionRejected):
+            await waiter  # nobody released in time
+        assert admission.stats()["queued"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_execute_answers_429_with_retry_after(team_client, question, db, monkeypatch):
+    from app.models import Submission
+    from app.services.admission_service import admission_controller
+
+    monkeypatch.setattr(admission_controller, "max_inflight", 0)
+    monkeypatch.setattr(admission_controller, "max_queued", 0)
+    response = team_client.post(f"/api/challenge/execute/{question.id}", json={"code_answer": "sup {}"})
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+
+    # turned away before judging, so it didn't cost an attempt
+    submission = db.query(Submission).filter(Submission.question_id == question.id).one()
+    assert submission.attempts == 0
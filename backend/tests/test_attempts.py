@@ -0,0 +1,102 @@
+import threading
+
+from app.database import SessionLocal
+from app.models import ChallengeSession, Submission, Team
+from app.services.attempt_service import record_verdict, refund_attempt, reserve_attempt
+
+
+def _submission(db) -> Submission:
+    team = Team(team_leader_usn="T1", password="x")
+    db.add(team)
+    db.flush()
+    session = ChallengeSession(team_id=team.id)
+    db.add(session)
+    db.flush()
+    submission = Submission(challenge_session_id=session.id, question_id=1)
+    db.add(submission)
+    db.commit()
+    return submission
+
+
+def _race(count, work):
+    """Run work(session) on `count` threads, each with its own session, all at once."""
+    start = threading.Barrier(count)
+    results = []
+
+    def worker():
+        session = SessionLocal()
+        try:
+            start.wait()
+            results.append(work(session))
+        finally:
+            session.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_concurrent_reserves_never_exceed_the_limit(db):
+    submission_id = _submission(db).id
+    results = _race(12, lambda session: reserve_attempt(session, submission_id, max_attempts=5))
+
+    claimed = [count for count in results if count is not None]
+    assert len(claimed) == 5
+    assert results.count(None) == 7
+    db.expire_all()
+    assert db.get(Submission, submission_id).attempts == 5
+
+
+def test_concurrent_refunds_give_back_exactly_what_was_reserved(db):
+    submission_id = _submission(db).id
+    for _ in range(3):
+        reserve_attempt(db, submission_id)
+    _race(3, lambda session: refund_attempt(session, submission_id))
+    refund_attempt(db, submission_id)  # one too many: stays at 0
+
+    db.expire_all()
+    assert db.get(Submission, submission_id).attempts == 0
+
+
+def test_locked_submission_takes_no_attempts(db):
+    submission = _submission(db)
+    submission.is_locked = True
+    db.commit()
+    assert reserve_attempt(db, submission.id) is None
+    db.refresh(submission)
+    assert submission.attempts == 0
+
+
+def test_late_wrong_verdict_does_not_unlock(db):
+    submission = _submission(db)
+    reserve_attempt(db, submission.id)
+    reserve_attempt(db, submission.id)
+
+    record_verdict(db, submission, "sup { spit(1); }", True)
+    record_verdict(db, submission, "sup { spit(2); }", False)
+
+    assert submission.is_locked and submission.is_correct and submission.last_result == 1
+    assert submission.attempts == 2
+
+
+def test_execute_without_a_verdict_refunds_the_attempt(team_client, question, db, monkeypatch):
+    from fastapi import HTTPException
+    from app.routers import challenge
+
+    async def judge_down(*args):
+        raise HTTPException(status_code=503, detail="Judge service unavailable", headers={"Retry-After": "1"})
+
+    async def judge_wrong(*args):
+        return False
+
+    monkeypatch.setattr(challenge, "_run_judge", judge_down)
+    response = team_client.post(f"/api/challenge/execute/{question.id}", json={"code_answer": "sup {}"})
+    assert response.status_code == 503
+
+    monkeypatch.setattr(challenge, "_run_judge", judge_wrong)
+    response = team_client.post(f"/api/challenge/execute/{question.id}", json={"code_answer": "sup { }"})
+    assert response.status_code == 200
+    assert response.json()["attempts"] == 1  # only the judged one counts
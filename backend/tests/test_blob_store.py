@@ -0,0 +1,77 @@
+import asyncio
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from app.database import SessionLocal, engine
+from app.models import Blob, ChallengeSession, Submission, Team
+from app.routers.admin import get_session_results
+from app.services.blob_store import blob_store
+from app.services.revision_service import set_submission_code
+
+
+def _session_with_submissions(db, count):
+    team = Team(team_leader_usn="T1", password="x")
+    db.add(team)
+    db.flush()
+    session = ChallengeSession(team_id=team.id)
+    db.add(session)
+    db.flush()
+    for question_id in range(1, count + 1):
+        submission = Submission(challenge_session_id=session.id, question_id=question_id)
+        db.add(submission)
+        set_submission_code(db, submission, f"sup {{\n spit({question_id});\n}}\n")
+    db.commit()
+    return session
+
+
+def test_gc_spares_a_blob_reused_while_it_runs(db):
+    data = b"sup {\n spit(1);\n}\n"
+    blob_hash = blob_store.put(db, data)
+    db.query(Blob).update({Blob.last_used_at: datetime.utcnow() - timedelta(hours=1)})
+    db.commit()  # an old, unreferenced revision: a GC candidate
+
+    # a save that reuses it has put() it but not yet repointed and committed
+    saver = SessionLocal()
+    assert blob_store.put(saver, data) == blob_hash
+    collected = []
+    gc = threading.Thread(target=lambda: collected.append(blob_store.collect_garbage(SessionLocal())))
+    gc.start()
+    time.sleep(0.2)
+    blob_store.repoint(saver, None, blob_hash)
+    saver.commit()
+    saver.close()
+    gc.join()
+
+    db.expire_all()
+    assert collected == [0]
+    assert blob_store.get(db, blob_hash).refcount == 1
+
+
+def test_gc_deletes_old_orphans(db):
+    blob_store.put(db, b"old")
+    db.query(Blob).update({Blob.last_used_at: datetime.utcnow() - timedelta(hours=1)})
+    blob_store.put(db, b"fresh")
+    db.commit()
+
+    assert blob_store.collect_garbage(db) == 1
+    assert [blob.content for blob in db.query(Blob)] == [b"fresh"]
+
+
+def test_session_results_load_code_in_a_fixed_number_of_queries(db):
+    session_id = _session_with_submissions(db, 20).id
+    db.expire_all()
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        results = asyncio.run(get_session_results(session_id, db=db, current_admin=None))
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+
+    assert [s.code_answer for s in results["submissions"]] == [
+        f"sup {{\n spit({i});\n}}\n" for i in range(1, 21)
+    ]
+    assert len(statements) <= 3  # the session, its submissions, their blobs: not one per row
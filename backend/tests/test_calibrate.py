@@ -0,0 +1,51 @@
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+import calibrate
+from app.models import Question
+from app.services.test_case_store import test_case_store
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SUM = "sup {\nvar a = int(listen());\nvar b = int(listen());\nspit(a + b);\n}\n"
+DIFFERENCE = SUM.replace("a + b", "a - b")
+
+needs_brocode = pytest.mark.skipif(shutil.which("brocode") is None, reason="needs the brocode interpreter")
+
+
+def test_p95_is_nearest_rank():
+    assert calibrate.p95([0.5]) == 0.5
+    assert calibrate.p95(list(range(1, 21))) == 19
+    assert calibrate.p95([3, 1, 2]) == 3
+
+
+@needs_brocode
+def test_measure_times_every_case_every_run(db, question):
+    compiled = test_case_store.export_json(db)["E01"]
+    assert len(calibrate.measure(SUM, compiled, runs=2)) == 4
+
+
+@needs_brocode
+def test_measure_refuses_a_wrong_reference(db, question):
+    compiled = test_case_store.export_json(db)["E01"]
+    with pytest.raises(ValueError, match="case 1"):
+        calibrate.measure(DIFFERENCE, compiled, runs=1)
+
+
+@needs_brocode
+def test_calibrated_limit_reaches_the_running_app(db, question, tmp_path):
+    assert "time_limit" not in test_case_store.snapshot(db).questions["E01"]
+    (tmp_path / "E01.homie").write_text(SUM)
+
+    subprocess.run(
+        [sys.executable, "calibrate.py", "--solutions", str(tmp_path), "--runs", "1", "--floor", "2", "--ceiling", "4"],
+        cwd=BACKEND, check=True, capture_output=True,
+    )
+
+    db.rollback()
+    limit = db.query(Question.time_limit_seconds).scalar()
+    assert 2 <= limit <= 4
+    assert test_case_store.snapshot(db).questions["E01"]["time_limit"] == limit
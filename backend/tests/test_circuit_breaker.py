@@ -0,0 +1,67 @@
+import time
+
+from app.services import circuit_breaker
+from app.services.circuit_breaker import CircuitBreaker
+from test_judge_service import _first_choice, _hangs, _host, _judge, _ok, _other, _service
+
+
+def _breaker(**kwargs) -> CircuitBreaker:
+    options = dict(window=4, min_calls=2, error_rate=0.5, slow_seconds=1.0, slow_rate=0.5, cooldown=0.05)
+    options.update(kwargs)
+    return CircuitBreaker("node", **options)
+
+
+def test_breaker_opens_on_errors_and_closes_after_a_good_probe():
+    breaker = _breaker()
+    breaker.record(True)
+    breaker.record(False)
+    assert breaker.state == circuit_breaker.OPEN
+    assert not breaker.begin()
+    assert breaker.retry_after() > 0
+
+    time.sleep(0.06)
+    assert breaker.begin()
+    assert breaker.state == circuit_breaker.HALF_OPEN
+    assert not breaker.begin()  # one probe at a time
+    breaker.record(True, 0.01)
+    assert breaker.state == circuit_breaker.CLOSED
+
+
+def test_breaker_opens_on_slow_calls_and_a_bad_probe_reopens_it():
+    breaker = _breaker()
+    breaker.record(True, 2.0)
+    breaker.record(True, 2.0)
+    assert breaker.state == circuit_breaker.OPEN
+
+    time.sleep(0.06)
+    assert breaker.begin()
+    breaker.record(False)
+    assert breaker.state == circuit_breaker.OPEN
+    assert breaker.times_opened == 2
+
+
+def test_released_probe_lets_the_next_call_probe():
+    breaker = _breaker(cooldown=60)
+    breaker.record(False)
+    breaker.record(False)
+    breaker.opened_at -= 60
+    assert breaker.begin()
+    breaker.release()
+    assert breaker.state == circuit_breaker.OPEN
+    assert breaker.begin()  # not another 60 seconds of HALF_OPEN with nobody probing
+
+
+# ----- hedging -----
+
+def test_cancelled_hedge_loser_does_not_strand_its_probe():
+    first = _first_choice(_service({}))
+    service = _service({_host(first): _hangs, _host(_other(first)): _ok}, hedge_enabled=True)
+    slow = service.nodes[first].breaker
+    slow._open()
+    slow.opened_at -= slow.cooldown  # due a probe: this request is it
+
+    service._latencies.extend([0.05] * 20)  # hedge after 50 ms
+    assert _judge(service) == 1
+    assert service.hedges_won == 1
+    assert slow.state == circuit_breaker.OPEN
+    assert slow.available()
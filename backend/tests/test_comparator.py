@@ -0,0 +1,94 @@
+import sys
+import time
+
+import pytest
+from pydantic import ValidationError
+
+import comparator
+import sandbox
+from app.models import TestCase
+from app.schemas.question import QuestionCreate, QuestionUpdate
+from app.services.test_case_store import test_case_store
+
+
+def _compare(expected: bytes, output: bytes, mode: str, chunk: int = 0) -> bool:
+    checker = comparator.make_comparator(expected, mode)
+    step = chunk or max(1, len(output))
+    for offset in range(0, len(output), step):
+        if not checker.feed(output[offset:offset + step]):
+            return False
+    return checker.finish()
+
+
+CASES = [
+    # mode, expected, output, accepted
+    (comparator.EXACT, b"30\n", b"30", True),
+    (comparator.EXACT, b"30", b"  30 \n\n", True),
+    (comparator.EXACT, b"30", b"300", False),
+    (comparator.EXACT, b"3 0", b"3  0", False),
+    (comparator.EXACT, b"30", b"30\n31", False),
+    (comparator.TRAILING, b"a\nb", b"a  \nb\n\n", True),
+    (comparator.TRAILING, b"a\nb", b" a\nb", False),
+    (comparator.TRAILING, b"a\nb", b"a\nb\nc", False),
+    (comparator.TRAILING, b"a\nb\nc", b"a\nb", False),
+    (comparator.TOKENS, b"1 2 3", b"1  2\n\n3\n", True),
+    (comparator.TOKENS, b"1 2 3", b"1 2", False),
+    (comparator.TOKENS, b"1 2 3", b"1 23", False),
+    (comparator.TOKENS, b"1 2 3", b"1 2 3 4", False),
+]
+
+
+@pytest.mark.parametrize("mode, expected, output, accepted", CASES)
+@pytest.mark.parametrize("chunk", [0, 1, 3])
+def test_modes(mode, expected, output, accepted, chunk):
+    assert _compare(expected, output, mode, chunk) is accepted
+
+
+@pytest.mark.parametrize("mode", comparator.MODES)
+def test_stops_at_the_first_mismatch(mode):
+    checker = comparator.make_comparator(b"1\n2\n3\n", mode)
+    assert checker.feed(b"1\n") is True
+    assert checker.feed(b"9\n") is False
+    # once wrong, always wrong: the rest isn't even looked at
+    assert checker.feed(b"3\n") is False
+    assert checker.finish() is False
+
+
+def test_output_far_past_the_expected_is_cut_off():
+    checker = comparator.make_comparator(b"1", comparator.TOKENS, slack=10)
+    assert checker.feed(b"1" + b" " * 10) is True
+    assert checker.feed(b" ") is False
+
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        comparator.make_comparator(b"1", "token")
+
+
+@pytest.mark.skipif(sandbox.resource is None, reason="needs rlimits")
+def test_wrong_first_line_kills_the_run():
+    checker = comparator.make_comparator(b"1\n2\n", comparator.EXACT)
+    started = time.perf_counter()
+    run = sandbox.execute(
+        [sys.executable, "-c", "import time\nprint(9, flush=True)\ntime.sleep(60)"],
+        timeout=10, on_stdout=checker.feed,
+    )
+    assert run.verdict == sandbox.WRONG_ANSWER
+    assert time.perf_counter() - started < 5
+
+
+def test_schemas_only_take_known_modes():
+    base = {"question_id": "E01", "title": "t", "description": "d"}
+    assert QuestionCreate(**base, compare_mode="tokens").compare_mode == "tokens"
+    with pytest.raises(ValidationError):
+        QuestionCreate(**base, compare_mode="token")
+    with pytest.raises(ValidationError):
+        QuestionUpdate(compare_mode="Exact")
+
+
+def test_import_rejects_unknown_mode_before_touching_cases(db, question):
+    with pytest.raises(ValueError):
+        test_case_store.import_json(db, {"E01": {"compare": "token", "test_cases": []}})
+    db.rollback()
+    assert db.query(TestCase).count() == 2
+    assert question.compare_mode == "exact"
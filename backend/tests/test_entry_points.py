@@ -0,0 +1,27 @@
+import os
+import sqlite3
+import subprocess
+import sys
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _run(tmp_path, *argv):
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{tmp_path}/fresh.db", UPLOAD_DIR=str(tmp_path / "uploads"))
+    return subprocess.run([sys.executable, *argv], cwd=BACKEND, env=env, capture_output=True, text=True, timeout=120)
+
+
+def test_qs_seeds_a_fresh_database(tmp_path):
+    result = _run(tmp_path, "qs.py")
+    assert result.returncode == 0, result.stderr
+    with sqlite3.connect(tmp_path / "fresh.db") as db:
+        assert db.execute("SELECT count(*) FROM questions").fetchone()[0] > 0
+        assert db.execute("SELECT count(*) FROM test_cases").fetchone()[0] > 0
+
+
+def test_loadtest_runs_in_process_from_scratch(tmp_path):
+    # its own throwaway database, and the lifespan never runs under ASGITransport
+    result = _run(tmp_path, "loadtest.py", "--teams", "2", "--questions", "1", "--saves", "1",
+                  "--stub-latency", "0", "--think", "0", "--projectors", "0")
+    assert result.returncode == 0, result.stderr
+    assert "POST /api/challenge/execute/{id}" in result.stdout
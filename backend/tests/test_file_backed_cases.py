@@ -0,0 +1,39 @@
+import mmap
+
+import comparator
+import sandbox
+import test_runner
+
+# 5000 tokens, so a wrong answer stops the comparison long before the end of the file
+EXPECTED = " ".join(str(i) for i in range(5000)) + "\n"
+
+
+def _question(compare_mode):
+    return {
+        "T01": {
+            "name": "file-backed",
+            "points": 1,
+            "compare": compare_mode,
+            "test_cases": [{"input": "", "expected_file": "big.txt"}],
+        }
+    }
+
+
+def test_token_comparator_releases_mmap_after_early_mismatch(tmp_path):
+    path = tmp_path / "big.txt"
+    path.write_text(EXPECTED)
+    with open(path, "rb") as f:
+        expected = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        checker = comparator.make_comparator(expected, comparator.TOKENS)
+        assert checker.feed(b"0 1 30\n") is False
+        expected.close()  # BufferError if the comparator still holds an export
+
+
+def test_tokens_wrong_answer_on_file_backed_case_is_a_verdict(tmp_path, monkeypatch):
+    (tmp_path / "big.txt").write_text(EXPECTED)
+    monkeypatch.setattr(test_runner, "TEST_DATA_DIR", tmp_path)
+
+    result = test_runner.test_submission("T01", "sup {\n spit(30);\n}\n", test_cases=_question(comparator.TOKENS))
+
+    assert result["status"] == "FAIL"
+    assert result["details"][0]["verdict"] == sandbox.WRONG_ANSWER
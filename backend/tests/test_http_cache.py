@@ -0,0 +1,38 @@
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.services.http_cache import CachedBody, HttpCacheMiddleware
+
+BODY = CachedBody(b'{"questions":"' + b"x" * 4096 + b'"}')
+
+
+def _client(policies: str, compression: bool) -> TestClient:
+    app = FastAPI()
+
+    @app.get("/catalog")
+    def catalog(request: Request):
+        return BODY.response(request)
+
+    app.add_middleware(HttpCacheMiddleware, policies=policies, compression=compression)
+    return TestClient(app)
+
+
+def test_cached_body_honours_compression_setting():
+    on = _client("", compression=True).get("/catalog", headers={"Accept-Encoding": "gzip"})
+    assert on.headers["content-encoding"] == "gzip"
+    assert on.content == BODY.body  # decoded by the client
+
+    off = _client("", compression=False).get("/catalog", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in off.headers
+    assert off.content == BODY.body
+
+
+def test_cached_body_etag_follows_route_policy():
+    plain = _client("/catalog=public, max-age=30", compression=False)
+    response = plain.get("/catalog", headers={"If-None-Match": BODY.etag})
+    assert response.status_code == 200
+    assert "etag" not in response.headers
+
+    tagged = _client("/catalog=public, max-age=30, etag", compression=False)
+    assert tagged.get("/catalog").headers["etag"] == BODY.etag
+    assert tagged.get("/catalog", headers={"If-None-Match": BODY.etag}).status_code == 304
@@ -0,0 +1,30 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.services.idempotency_service import RequestDeduplicator
+from app.services.shared_state import MemoryState, SQLiteState
+
+
+def _run(dedup, key, fingerprint, result):
+    async def compute():
+        return result
+    return dedup.run([("code", fingerprint)], compute, remember=key, fingerprint=fingerprint)
+
+
+@pytest.mark.parametrize("distributed", [False, True])
+def test_same_key_different_payload_is_rejected(tmp_path, distributed):
+    shared = SQLiteState(str(tmp_path / "state.db")) if distributed else MemoryState()
+    first = RequestDeduplicator(shared=shared)
+    # a retry landing on another worker only sees what's in shared state
+    other = RequestDeduplicator(shared=shared) if distributed else first
+
+    async def scenario():
+        assert await _run(first, "k1", "aaa", {"verdict": 1}) == {"verdict": 1}
+        assert await _run(other, "k1", "aaa", {"verdict": 2}) == {"verdict": 1}
+        with pytest.raises(HTTPException) as e:
+            await _run(other, "k1", "bbb", {"verdict": 3})
+        assert e.value.status_code == 422
+
+    asyncio.run(scenario())
@@ -0,0 +1,160 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from app.services.judge_service import (
+    ROUTING_HASH,
+    ROUTING_LEAST_OUTSTANDING,
+    JudgeService,
+    JudgeUnavailableError,
+)
+from app.services.shared_state import MemoryState
+
+A = "http://judge-a:8001/run"
+B = "http://judge-b:8001/run"
+
+
+def _service(behaviour: dict, routing=ROUTING_HASH, **attrs) -> JudgeService:
+    """A JudgeService whose nodes answer with behaviour[host](request) (async)."""
+    async def handler(request: httpx.Request):
+        return await behaviour[request.url.host](request)
+
+    service = JudgeService(urls=[A, B], routing=routing, shared=MemoryState())
+    service._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    for name, value in attrs.items():
+        setattr(service, name, value)
+    return service
+
+
+def _first_choice(service: JudgeService, question_id: str = "E01") -> str:
+    return service._candidates(question_id)[0].url
+
+
+def _other(url: str) -> str:
+    return B if url == A else A
+
+
+async def _ok(request):
+    return httpx.Response(200, json={"result": 1})
+
+
+async def _down(request):
+    return httpx.Response(500, json={"detail": "boom"})
+
+
+async def _rejects(request):
+    return httpx.Response(422, json={"detail": "Judging failed"})
+
+
+async def _hangs(request):
+    # MockTransport doesn't enforce timeouts; do what the real transport would
+    await asyncio.sleep(request.extensions["timeout"]["read"])
+    raise httpx.ReadTimeout("timed out", request=request)
+
+
+def _judge(service: JudgeService, question_id: str = "E01"):
+    async def run():
+        try:
+            return await service.judge_submission(question_id, "sup {}")
+        finally:
+            await service.close()
+    return asyncio.run(run())
+
+
+def _host(url: str) -> str:
+    return httpx.URL(url).host
+
+
+# ----- routing -----
+
+def test_hash_routing_keeps_a_question_on_one_node():
+    service = _service({})
+    first = _first_choice(service, "E01")
+    assert all(_first_choice(service, "e01") == first for _ in range(20))
+    # and the questions spread over both nodes
+    assert {_first_choice(service, f"Q{i:02}") for i in range(50)} == {A, B}
+
+
+def test_least_outstanding_prefers_the_idle_node():
+    service = _service({}, routing=ROUTING_LEAST_OUTSTANDING)
+    service.nodes[A].outstanding = 3
+    assert all(_first_choice(service) == B for _ in range(20))
+
+
+def test_ejected_and_open_nodes_are_skipped():
+    service = _service({})
+    service.nodes[A].healthy = False
+    assert [node.url for node in service._candidates("E01")] == [B]
+    service.nodes[A].healthy = True
+    service.nodes[B].breaker._open()
+    assert [node.url for node in service._candidates("E01")] == [A]
+
+
+# ----- failover -----
+
+def test_server_error_fails_over_to_the_next_node():
+    first = _first_choice(_service({}))
+    service = _service({_host(first): _down, _host(_other(first)): _ok})
+    assert _judge(service) == 1
+    assert service.nodes[first].consecutive_failures == 1
+    assert service.nodes[_other(first)].total_requests == 1
+
+
+def test_rejection_is_final():
+    first = _first_choice(_service({}))
+    service = _service({_host(first): _rejects, _host(_other(first)): _ok})
+    with pytest.raises(Exception, match="422") as raised:
+        _judge(service)
+    assert not isinstance(raised.value, JudgeUnavailableError)
+    assert service.nodes[_other(first)].total_requests == 0
+
+
+def test_hung_node_gets_its_share_not_the_whole_deadline():
+    first = _first_choice(_service({}))
+    service = _service({_host(first): _hangs, _host(_other(first)): _ok}, timeout=10.0, node_timeout=0.3)
+    started = time.monotonic()
+    assert _judge(service) == 1
+    assert time.monotonic() - started < 2
+    assert service.nodes[first].last_error == "timeout"
+
+
+def test_every_node_failing_is_unavailable():
+    service = _service({_host(A): _down, _host(B): _down})
+    with pytest.raises(JudgeUnavailableError):
+        _judge(service)
+
+
+def test_every_circuit_open_fails_fast_with_retry_after():
+    service = _service({_host(A): _ok, _host(B): _ok})
+    for node in service.nodes.values():
+        node.breaker._open()
+    with pytest.raises(JudgeUnavailableError) as raised:
+        _judge(service)
+    assert raised.value.retry_after > 0
+    assert all(node.total_requests == 0 for node in service.nodes.values())
+
+
+# ----- health checks -----
+
+def test_health_checks_eject_and_restore_a_node():
+    healthy = {"ok": False}
+
+    async def health(request):
+        assert request.url.path == "/health"
+        return httpx.Response(200 if healthy["ok"] else 503)
+
+    service = _service({_host(A): health, _host(B): health})
+    node = service.nodes[A]
+
+    async def check(times):
+        for _ in range(times):
+            await service.check_node(node)
+
+    asyncio.run(check(3))
+    assert not node.healthy
+    assert node.last_error.startswith("health check")
+    healthy["ok"] = True
+    asyncio.run(check(1))
+    assert node.healthy and node.consecutive_failures == 0
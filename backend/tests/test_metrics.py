@@ -0,0 +1,37 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import metrics
+
+
+def _app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    def item(item_id: int):
+        return {"id": item_id}
+
+    app.add_middleware(metrics.MetricsMiddleware, track_queries=True)
+    return app
+
+
+def _served(route: str) -> int:
+    return sum(
+        count for labels, count in metrics.HTTP_REQUESTS.state().items() if labels[1] == route
+    )
+
+
+def test_building_the_app_twice_shares_the_metrics():
+    before = _served("/items/{item_id}")
+    for _ in range(2):
+        with TestClient(_app()) as client:
+            assert client.get("/items/1").status_code == 200
+            assert client.get("/items/2").status_code == 200
+    # labelled by template, not by path
+    assert _served("/items/{item_id}") == before + 4
+
+
+def test_render_lists_each_metric_once():
+    _app()
+    rendered = metrics.REGISTRY.render()
+    assert rendered.count("# TYPE http_requests_total counter") == 1
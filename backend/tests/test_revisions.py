@@ -0,0 +1,59 @@
+import pytest
+
+from app.models import Blob
+from app.services.revision_service import PatchError, apply_patch, hash_code
+
+CODE = "sup {\n spit(1);\n}\n"
+
+
+def test_apply_patch_replaces_ranges_of_the_base():
+    patched = apply_patch(CODE, [{"start": 12, "end": 13, "text": "42"}, {"start": 16, "end": 17, "text": "} "}])
+    assert patched == "sup {\n spit(42);\n} \n"
+
+
+@pytest.mark.parametrize("edits", [
+    [{"start": 5, "end": 3, "text": ""}],  # backwards
+    [{"start": 0, "end": len(CODE) + 1, "text": ""}],  # past the end
+    [{"start": 4, "end": 8, "text": ""}, {"start": 6, "end": 9, "text": ""}],  # overlapping
+])
+def test_apply_patch_rejects_bad_ranges(edits):
+    with pytest.raises(PatchError):
+        apply_patch(CODE, edits)
+
+
+def _save(client, question, **body):
+    return client.put(f"/api/challenge/submission/{question.id}", json=body)
+
+
+def test_patch_save_against_the_current_revision(team_client, question):
+    base = _save(team_client, question, code_answer=CODE).json()["code_hash"]
+    patch = [{"start": 12, "end": 13, "text": "2"}]
+
+    response = _save(team_client, question, base_hash=base, patch=patch, code_hash=hash_code(CODE.replace("1", "2")))
+    assert response.status_code == 200
+    assert response.json()["code_hash"] == hash_code(CODE.replace("1", "2"))
+
+
+def test_patch_conflicts_are_409(team_client, question):
+    base = _save(team_client, question, code_answer=CODE).json()["code_hash"]
+    patch = [{"start": 12, "end": 13, "text": "2"}]
+
+    assert _save(team_client, question, base_hash="0" * 64, patch=patch).status_code == 409
+    assert _save(team_client, question, base_hash=base, patch=[{"start": 0, "end": 999, "text": ""}]).status_code == 409
+    assert _save(team_client, question, base_hash=base, patch=patch, code_hash="0" * 64).status_code == 409
+    # a replaced revision is gone, so it's no longer a base
+    _save(team_client, question, base_hash=base, patch=patch)
+    assert _save(team_client, question, base_hash=base, patch=patch).status_code == 409
+
+
+def test_repeated_patch_saves_keep_one_revision(team_client, question, db):
+    code = CODE
+    base = _save(team_client, question, code_answer=code).json()["code_hash"]
+    for i in range(30):
+        patch = [{"start": len(code), "end": len(code), "text": f"# {i}\n"}]
+        code += f"# {i}\n"
+        response = _save(team_client, question, base_hash=base, patch=patch)
+        assert response.status_code == 200
+        base = response.json()["code_hash"]
+
+    assert [blob.hash for blob in db.query(Blob)] == [hash_code(code)]
@@ -0,0 +1,29 @@
+import os
+
+os.environ.setdefault("BROCODE_JUDGE_WORKERS", "1")
+
+import pytest
+from fastapi.testclient import TestClient
+
+import runner_service
+
+SUM = "sup {\nvar a = int(listen());\nvar b = int(listen());\nspit(a + b);\n}\n"
+
+
+@pytest.fixture(scope="module")
+def runner():
+    with TestClient(runner_service.app) as client:
+        yield client
+
+
+def test_failed_job_is_a_structured_4xx(runner):
+    # a file-backed case this node doesn't have: test_runner raises in the worker
+    question = {"name": "x", "points": 1, "test_cases": [{"input": "", "expected_file": "nope/missing.out"}]}
+    response = runner.post("/run", json={"question_id": "X01", "code": SUM, "question": question})
+    assert response.status_code == 422
+    assert response.json()["detail"].startswith("Judging failed: ")
+
+
+def test_unknown_question_is_400(runner):
+    response = runner.post("/run", json={"question_id": "NOPE", "code": SUM})
+    assert response.status_code == 400
@@ -0,0 +1,63 @@
+import sys
+import time
+
+import pytest
+
+import sandbox
+
+pytestmark = pytest.mark.skipif(sandbox.resource is None, reason="needs rlimits")
+
+
+def _run(code, stdin=b"", timeout=2, **kwargs):
+    return sandbox.execute([sys.executable, "-c", code], stdin, timeout=timeout, **kwargs)
+
+
+def test_clean_exit_leaves_the_verdict_to_the_caller():
+    run = _run("print(int(input()) * 2)", b"21\n")
+    assert (run.verdict, run.returncode, run.stdout) == (None, 0, b"42\n")
+
+
+@pytest.mark.parametrize("code", [
+    "raise SystemExit('boom')",
+    "import sys; sys.stderr.write('Error:\\n'); sys.exit(1)",  # a colon and nothing after it isn't an OOM
+    "import os, signal; os.kill(os.getpid(), signal.SIGSEGV)",
+    "import os; os.abort()",
+    "import os, signal; os.kill(os.getpid(), signal.SIGKILL)",  # killed, but not by a deadline
+])
+def test_runtime_errors(code):
+    assert _run(code).verdict == sandbox.RUNTIME_ERROR
+
+
+def test_memory_error_is_mle():
+    limits = sandbox.Limits(memory_mb=256)
+    assert _run("x = bytearray(1 << 34)", limits=limits).verdict == sandbox.MEMORY_LIMIT
+
+
+def test_brocode_memory_error_line_is_mle():
+    code = "import sys; sys.stderr.write('Bro Code Error: \\U0001f480 \\n'); sys.exit(1)"
+    assert _run(code).verdict == sandbox.MEMORY_LIMIT
+
+
+def test_busy_loop_is_tle():
+    run = _run("while True: pass", timeout=1)
+    assert run.verdict == sandbox.TIME_LIMIT
+    assert run.elapsed < 3
+
+
+def test_closing_the_pipes_does_not_escape_the_deadline():
+    started = time.perf_counter()
+    run = _run("import os, time; os.close(1); os.close(2); time.sleep(60)", timeout=1)
+    assert run.verdict == sandbox.TIME_LIMIT
+    assert time.perf_counter() - started < 5
+
+
+def test_output_flood_is_ole():
+    limits = sandbox.Limits(output_bytes=1024)
+    assert _run("print('x' * 100000)", limits=limits).verdict == sandbox.OUTPUT_LIMIT
+
+
+def test_checker_rejection_is_wa_and_stops_the_run():
+    started = time.perf_counter()
+    run = _run("import time\nprint('wrong', flush=True)\ntime.sleep(60)", timeout=5, on_stdout=lambda chunk: False)
+    assert run.verdict == sandbox.WRONG_ANSWER
+    assert time.perf_counter() - started < 3
@@ -0,0 +1,41 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from app.services import shared_state
+from app.services.shared_state import MemoryState, SQLiteState
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+pytestmark = pytest.mark.skipif(shared_state.fcntl is None, reason="needs flock")
+
+
+def test_second_memory_process_on_one_database_refuses_to_start(tmp_path):
+    scope = f"sqlite:///{tmp_path}/brocode.db"
+    server = MemoryState()  # held for the whole test, like the app's singleton
+    server.claim(scope)
+
+    other = subprocess.run(
+        [sys.executable, "-c", f"from app.services.shared_state import MemoryState; MemoryState().claim({scope!r})"],
+        cwd=BACKEND, capture_output=True, text=True,
+    )
+    assert other.returncode != 0
+    assert "SharedStateError" in other.stderr
+    assert f"pid {os.getpid()}" in other.stderr
+
+
+def test_claims_on_other_databases_and_shared_stores_are_fine(tmp_path):
+    first, second = MemoryState(), MemoryState()
+    first.claim(f"sqlite:///{tmp_path}/a.db")
+    second.claim(f"sqlite:///{tmp_path}/b.db")
+    SQLiteState(str(tmp_path / "shared.db")).claim(f"sqlite:///{tmp_path}/a.db")
+
+
+def test_claim_is_released_when_the_process_exits(tmp_path):
+    scope = f"sqlite:///{tmp_path}/brocode.db"
+    code = f"from app.services.shared_state import MemoryState; MemoryState().claim({scope!r})"
+    for _ in range(2):
+        subprocess.run([sys.executable, "-c", code], cwd=BACKEND, check=True)
+    MemoryState().claim(scope)  # the last holder is gone, so this one gets it
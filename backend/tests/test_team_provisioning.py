@@ -0,0 +1,89 @@
+import json
+
+import bcrypt
+import pytest
+
+from app.models import Team
+from app.services import team_provisioning
+from app.services.team_provisioning import RosterError, TeamProvisioner, parse_roster
+from app.services.shared_state import MemoryState
+
+
+def _import(db, rows, **options):
+    return TeamProvisioner(shared=MemoryState()).import_rows(db, rows, workers=1, **options)
+
+
+def test_csv_roster():
+    content = "\ufeff Team_Leader_USN , Password,team_name\n1ab01 , secret1 ,Alpha\n1AB02,secret2,\n".encode()
+    assert parse_roster(content, "teams.csv") == [
+        {"team_leader_usn": "1ab01", "password": "secret1", "team_name": "Alpha"},
+        {"team_leader_usn": "1AB02", "password": "secret2"},  # blank team_name counts as missing
+    ]
+
+
+@pytest.mark.parametrize("data", [
+    [{"team_leader_usn": "1AB01", "password": "p", "is_active": False}],
+    {"teams": [{"team_leader_usn": "1AB01", "password": "p", "is_active": False}]},
+])
+def test_json_roster(data):
+    assert parse_roster(json.dumps(data).encode()) == [{"team_leader_usn": "1AB01", "password": "p", "is_active": False}]
+
+
+@pytest.mark.parametrize("content, filename, message", [
+    (b"\xff\xfe", "teams.csv", "UTF-8"),
+    (b"[{", "teams.json", "Invalid JSON"),
+    (b'{"rows": []}', "teams.json", "list of team objects"),
+    (b"", "teams.csv", "empty"),
+    (b"usn,password\n1AB01,p\n", "teams.csv", "missing columns: team_leader_usn"),
+])
+def test_unusable_rosters(content, filename, message):
+    with pytest.raises(RosterError, match=message):
+        parse_roster(content, filename)
+
+
+def test_roster_row_limit(monkeypatch):
+    monkeypatch.setattr(team_provisioning, "TEAM_ROSTER_MAX_ROWS", 2)
+    with pytest.raises(RosterError, match="limit is 2"):
+        parse_roster(b"team_leader_usn,password\nA,p\nB,p\nC,p\n")
+
+
+def test_bad_rows_are_reported_and_the_rest_created(db):
+    db.add(Team(team_leader_usn="TAKEN", password="x"))
+    db.commit()
+    rows = [
+        {"team_leader_usn": "1ab01", "password": "secret1", "team_name": "Alpha"},
+        {"team_leader_usn": "1AB02"},
+        {"team_leader_usn": "1AB01", "password": "again"},
+        {"team_leader_usn": "taken", "password": "secret"},
+        {"team_leader_usn": "1AB05", "password": "x" * 73},
+        {"team_leader_usn": "1AB06", "password": "secret6"},
+    ]
+    report = _import(db, rows)
+
+    assert report["created"] == 2
+    assert [(error["row"], error["team_leader_usn"]) for error in report["errors"]] == [
+        (2, "1AB02"), (3, "1AB01"), (4, "TAKEN"), (5, "1AB05"),
+    ]
+    assert "password" in report["errors"][0]["error"]
+    assert report["errors"][1]["error"] == "Duplicate USN in roster"
+    assert report["errors"][2]["error"] == "Team with this USN already exists"
+
+    alpha = db.query(Team).filter(Team.team_leader_usn == "1AB01").one()
+    assert alpha.team_name == "Alpha"
+    assert bcrypt.checkpw(b"secret1", alpha.password.encode())
+
+
+@pytest.mark.parametrize("options", [{"dry_run": True}, {"strict": True}])
+def test_dry_run_and_strict_create_nothing(db, options):
+    rows = [{"team_leader_usn": "1AB01", "password": "p"}, {"team_leader_usn": "1AB02"}]
+    report = _import(db, rows, **options)
+    assert report["created"] == 0
+    assert len(report["errors"]) == 1
+    assert db.query(Team).count() == 0
+
+
+def test_provisioned_team_can_log_in(client, db):
+    _import(db, [{"team_leader_usn": "1AB01", "password": "secret1"}])
+    response = client.post("/api/auth/login", json={"team_leader_usn": "1AB01", "password": "secret1"})
+    assert response.status_code == 200
+    assert "access_token" in response.json()
@@ -0,0 +1,47 @@
+import json
+import os
+import subprocess
+import sys
+
+from app.models import Question
+from app.services.test_case_store import test_case_store
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_admin_edit_recompiles_only_that_question(db, question):
+    before = test_case_store.snapshot(db)
+    assert [case["expected"] for case in before.questions["E01"]["test_cases"]] == ["30", "5"]
+    assert test_case_store.snapshot(db) is before  # nothing changed: no rebuild, no copy
+
+    question.compare_mode = "tokens"
+    db.commit()
+    test_case_store.invalidate(question.id)
+    assert test_case_store.snapshot(db).questions["E01"]["compare"] == "tokens"
+
+
+def test_cli_import_reaches_the_running_app(db, question, tmp_path):
+    assert len(test_case_store.snapshot(db).questions["E01"]["test_cases"]) == 2
+
+    path = tmp_path / "test_cases.json"
+    path.write_text(json.dumps({"E01": {"compare": "trailing", "test_cases": [{"input": "1\n2", "expected": "3"}]}}))
+    # a different process: its invalidate() can't reach this one's memory:// state
+    subprocess.run(
+        [sys.executable, "test_cases_sync.py", "import", "--file", str(path)],
+        cwd=BACKEND, check=True, capture_output=True,
+    )
+
+    db.rollback()  # end the test's read transaction, as a new request would
+    compiled = test_case_store.snapshot(db).questions["E01"]
+    assert compiled["compare"] == "trailing"
+    assert [dict(case) for case in compiled["test_cases"]] == [{"input": "1\n2", "expected": "3"}]
+
+
+def test_rejected_import_changes_nothing(db, question):
+    before = test_case_store.snapshot(db)
+    try:
+        test_case_store.import_json(db, {"E01": {"test_cases": [{"input": "1"}]}})
+    except KeyError:
+        db.rollback()
+    assert test_case_store.snapshot(db) is before
+    assert db.query(Question).one().compare_mode == "exact"
@@ -0,0 +1,99 @@
+"""
+where judging time goes, per question.
+
+test_submission hands back a "trace" with every result (case loading,
+writing the source, spawning, running, comparing; judge_pool adds the
+queue wait, the backend adds admission wait, the judge round trip and the
+db write). whoever ends up with the finished trace calls
+judge_traces.record(trace): it lands in a per-question window, in the
+judge_phase_seconds histogram on /metrics and, with BROCODE_TRACE_LOG
+set, as one json line per submission.
+
+run_ms includes starting the interpreter. interpreter_startup_ms() times an
+empty program, so the breakdown can split run_ms into interpreter startup
+and the submission's own code.
+"""
+
+import collections
+import json
+import logging
+import math
+import os
+import threading
+
+import metrics
+
+# in the order they happen
+PHASES = ("admission_wait", "queue", "load", "write", "spawn", "run", "compare", "judge", "db_write", "total")
+WINDOW = 500  # traces kept per question
+
+PHASE_SECONDS = metrics.Histogram("judge_phase_seconds", "Judging time by phase", ("phase",))
+
+trace_log = logging.getLogger("brocode.trace")
+_log_target = os.environ.get("BROCODE_TRACE_LOG", "")  # "-" for stderr, or a file to append json lines to
+if _log_target:
+    _handler = logging.StreamHandler() if _log_target == "-" else logging.FileHandler(_log_target)
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    trace_log.addHandler(_handler)
+    trace_log.setLevel(logging.INFO)
+    trace_log.propagate = False
+
+
+def _percentile(ordered: list, q: float) -> float:
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+
+class TraceAggregator:
+    def __init__(self, window: int = WINDOW):
+        self.window = window
+        self._lock = threading.Lock()
+        self._traces = {}  # question_id -> deque of ({phase: ms}, cases judged)
+
+    def record(self, trace: dict):
+        phases = {p: trace[f"{p}_ms"] for p in PHASES if trace.get(f"{p}_ms") is not None}
+        for phase, ms in phases.items():
+            PHASE_SECONDS.labels(phase).observe(ms / 1000)
+        question_id = trace.get("question", "?")
+        with self._lock:
+            if question_id not in self._traces:
+                self._traces[question_id] = collections.deque(maxlen=self.window)
+            self._traces[question_id].append((phases, len(trace.get("cases", ()))))
+        if trace_log.isEnabledFor(logging.INFO):
+            trace_log.info(json.dumps(trace, separators=(",", ":")))
+
+    def breakdown(self, startup_ms: float = None) -> dict:
+        """
+        question -> phase -> mean / p50 / p95 ms over the recent window.
+        with startup_ms (per case), run is also split into interpreter startup and the code itself.
+        """
+        with self._lock:
+            snapshot = {q: list(traces) for q, traces in self._traces.items()}
+        report = {}
+        for question_id, traces in sorted(snapshot.items()):
+            samples = collections.defaultdict(list)
+            for phases, cases in traces:
+                for phase, ms in phases.items():
+                    samples[phase].append(ms)
+                if startup_ms is not None and "run" in phases:
+                    startup = min(phases["run"], startup_ms * cases)
+                    samples["interpreter_startup"].append(startup)
+                    samples["user_code"].append(phases["run"] - startup)
+            breakdown = {}
+            for phase in PHASES + ("interpreter_startup", "user_code"):
+                values = sorted(samples.get(phase, ()))
+                if values:
+                    breakdown[phase] = {
+                        "mean_ms": round(sum(values) / len(values), 2),
+                        "p50_ms": round(_percentile(values, 0.50), 2),
+                        "p95_ms": round(_percentile(values, 0.95), 2),
+                    }
+            report[question_id] = {"submissions": len(traces), "phases": breakdown}
+        return report
+
+    def clear(self):
+        with self._lock:
+            self._traces.clear()
+
+
+# Singleton instance
+judge_traces = TraceAggregator()
@@ -39,6 +39,9 @@ const getAdminAuthHeaders = () => {
   return token ? { Authorization: `Bearer ${token}` } : {};
 };
 
+// Network-level retries for executes (safe thanks to the Idempotency-Key)
+const EXECUTE_NETWORK_RETRIES = 2;
+
 // Generic API call function
 const apiCall = async (endpoint, options = {}) => {
   const url = `${API_BASE_URL}${endpoint}`;
@@ -56,7 +59,9 @@ const apiCall = async (endpoint, options = {}) => {
 
     if (!response.ok) {
       const errorData = await response.json().catch(() => ({}));
-      throw new Error(errorData.detail || `HTTP error! status: ${response.status}`);
+      const error = new Error(errorData.detail || `HTTP error! status: ${response.status}`);
+      error.status = response.status;
+      throw error;
     }
 
     return await response.json();
@@ -106,6 +111,32 @@ export const questionsAPI = {
   },
 };
 
+// Last code revision the server acknowledged, per question: { hash, code }
+const savedRevisions = new Map();
+
+const rememberRevisions = (submissions = []) => {
+  submissions.forEach((s) => {
+    if (s.code_hash && s.code_answer != null) {
+      savedRevisions.set(s.question_id, { hash: s.code_hash, code: s.code_answer });
+    }
+  });
+};
+
+// Single-edit diff (common prefix/suffix) in code points, matching the backend patch format
+const diffCode = (base, code) => {
+  const a = Array.from(base);
+  const b = Array.from(code);
+  let start = 0;
+  while (start < a.length && start < b.length && a[start] === b[start]) start++;
+  let endA = a.length;
+  let endB = b.length;
+  while (endA > start && endB > start && a[endA - 1] === b[endB - 1]) {
+    endA--;
+    endB--;
+  }
+  return [{ start, end: endA, text: b.slice(start, endB).join('') }];
+};
+
 // Challenge API
 export const challengeAPI = {
   startChallenge: async () => {
@@ -115,21 +146,64 @@ export const challengeAPI = {
   },
 
   getChallengeStatus: async () => {
-    return await apiCall('/challenge/status');
+    const status = await apiCall('/challenge/status');
+    rememberRevisions(status.submissions);
+    return status;
   },
 
   updateSubmission: async (questionId, data) => {
-    return await apiCall(`/challenge/submission/${questionId}`, {
+    const put = (body) => apiCall(`/challenge/submission/${questionId}`, {
       method: 'PUT',
-      body: JSON.stringify(data),
+      body: JSON.stringify(body),
     });
+    const base = savedRevisions.get(questionId);
+    const code = data.code_answer;
+
+    let response;
+    if (base && typeof code === 'string') {
+      // Send only the changed span; fall back to the full body if the server lost our base
+      const { code_answer, ...rest } = data;
+      try {
+        response = await put({ ...rest, base_hash: base.hash, patch: diffCode(base.code, code) });
+      } catch (error) {
+        if (error.status !== 409) throw error;
+        response = await put(data);
+      }
+    } else {
+      response = await put(data);
+    }
+
+    if (response.code_hash && typeof code === 'string') {
+      savedRevisions.set(questionId, { hash: response.code_hash, code });
+    }
+    return response;
   },
 
   executeSubmission: async (questionId, code_answer) => {
-    return await apiCall(`/challenge/execute/${questionId}`, {
+    // One key per click: if the LAN drops the response, retrying with the same key
+    // gets the original verdict back instead of judging (and counting) it again.
+    // crypto.randomUUID needs a secure context, which plain-http LAN setups aren't.
+    const idempotencyKey = `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+    const execute = () => apiCall(`/challenge/execute/${questionId}`, {
       method: 'POST',
+      // options.headers replaces apiCall's defaults wholesale, so restate them
+      headers: {
+        'Content-Type': 'application/json',
+        ...getAuthHeaders(),
+        'Idempotency-Key': idempotencyKey,
+      },
       body: JSON.stringify({ code_answer }),
     });
+
+    for (let retry = 0; ; retry++) {
+      try {
+        return await execute();
+      } catch (error) {
+        // error.status is only set when the server answered; no status means the network failed
+        if (error.status !== undefined || retry >= EXECUTE_NETWORK_RETRIES) throw error;
+        await new Promise((resolve) => setTimeout(resolve, 500 * (retry + 1)));
+      }
+    }
   },
 
   uploadFile: async (questionId, file) => {